@@ -62,12 +62,16 @@ INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 
 MIDDLEWARE = [
+    'books.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'books.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'books.db_routers.ReadReplicaMiddleware',
+    'books.deadlines.DeadlineMiddleware',
 ]
 
 ROOT_URLCONF = 'book_management.urls'
@@ -105,6 +109,30 @@ DATABASES = {
     }
 }
 
+# Read replicas, as a comma-separated list of hosts sharing the primary's credentials
+DATABASE_REPLICAS = []
+for index, host in enumerate(filter(None, os.environ.get('POSTGRES_REPLICA_HOSTS', '').split(',')), 1):
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        'HOST': host.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica_{index}')
+
+DATABASE_ROUTERS = ['books.db_routers.PrimaryReplicaRouter']
+
+# After a write, a client's reads stay on the primary for this long
+READ_YOUR_WRITES_SECONDS = 5
+
+# Shared by every worker process, so the LLM admission limits and read-your-writes
+# pins hold across the whole deployment; create the table with `manage.py createcachetable`
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'django_cache',
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -166,6 +194,10 @@ SPECTACULAR_SETTINGS = {
     'SERVE_INCLUDE_SCHEMA': False,
 }
 
+# Prebuilt schema artifacts (see books.schema); only generate live when developing locally
+OPENAPI_SCHEMA_DIR = os.environ.get('OPENAPI_SCHEMA_DIR', os.path.join(BASE_DIR, 'var', 'schema'))
+OPENAPI_SCHEMA_LIVE_FALLBACK = DEBUG
+
 # JWT settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
@@ -177,3 +209,161 @@ SIMPLE_JWT = {
 
 # CSRF settings
 CSRF_TRUSTED_ORIGINS = ['http://localhost:8000']
+
+# Ollama servers, comma-separated; requests are balanced across them (see books.api.v1.ollama_pool)
+OLLAMA_BACKENDS = [
+    url.strip() for url in os.environ.get('OLLAMA_BACKENDS', 'http://ollama:11434').split(',') if url.strip()
+]
+OLLAMA_POOL = {
+    'EJECT_AFTER_FAILURES': int(os.environ.get('OLLAMA_EJECT_AFTER_FAILURES', 3)),
+    'EJECT_SECONDS': float(os.environ.get('OLLAMA_EJECT_SECONDS', 30)),
+    'KEEP_ALIVE_SECONDS': int(os.environ.get('OLLAMA_KEEP_ALIVE_SECONDS', 1800)),
+    'PS_REFRESH_SECONDS': 30,
+}
+
+# Model warmup and keep-alive pings (see books.api.v1.model_lifecycle)
+OLLAMA_LIFECYCLE = {
+    'ENABLED': os.environ.get('OLLAMA_WARMUP_ENABLED', '1') == '1',
+    'PING_SECONDS': 600,
+}
+
+# Request deadlines (see books.deadlines); clients may send X-Request-Timeout in seconds
+REQUEST_DEADLINES = {
+    'DEFAULT_SECONDS': float(os.environ.get('REQUEST_DEADLINE_SECONDS', 30)),
+    'MAX_SECONDS': 300,
+    'ENDPOINTS': {
+        'books:book-generate-summary': 240,
+        'books:book-generate-content-summary': 240,
+        'books:book-batch': 120,
+        'books:multiplex': 120,
+    },
+}
+
+# LLM admission control (see books.api.v1.throttling)
+LLM_ADMISSION = {
+    # Two generations per Ollama server by default.
+    'MAX_CONCURRENT': int(os.environ.get('LLM_MAX_CONCURRENT', 2 * len(OLLAMA_BACKENDS))),
+    'MAX_QUEUE': int(os.environ.get('LLM_MAX_QUEUE', 4)),
+    'QUEUE_TIMEOUT': float(os.environ.get('LLM_QUEUE_TIMEOUT', 5)),
+    'RETRY_AFTER': 10,
+    'USER_BURST': int(os.environ.get('LLM_USER_BURST', 5)),
+    'USER_RATE_PER_MINUTE': float(os.environ.get('LLM_USER_RATE_PER_MINUTE', 6)),
+}
+
+# Semantic search embeddings (see books.api.v1.embeddings)
+EMBEDDINGS = {
+    'BACKEND': os.environ.get('EMBEDDINGS_BACKEND', 'ollama'),
+    'MODEL': os.environ.get('EMBEDDINGS_MODEL', 'nomic-embed-text'),
+    'INDEX_DIR': os.environ.get('EMBEDDINGS_INDEX_DIR', os.path.join(BASE_DIR, 'var', 'embeddings')),
+}
+
+# Single-flight coordination of summary generation (see books.api.v1.singleflight)
+SUMMARY_SINGLE_FLIGHT = {
+    'LEASE_TTL': 300,
+    'RESULT_TTL': 10,
+    'POLL_INTERVAL': 0.25,
+}
+
+# Response compression (see books.middleware.CompressionMiddleware)
+RESPONSE_COMPRESSION = {
+    'MIN_SIZE': 1024,
+    'GZIP_LEVEL': 6,
+    'BROTLI_QUALITY': 5,
+}
+
+# List responses with at least this many rows are streamed element by element
+STREAMING_LIST_THRESHOLD = 1000
+
+# Typeahead index kept in each worker (see books.api.v1.autocomplete)
+AUTOCOMPLETE = {
+    'REFRESH_SECONDS': 2,
+    'FUZZY_THRESHOLD': 0.25,
+}
+
+# Trending shelf (see books.api.v1.trending): review activity loses half its weight every HALF_LIFE_HOURS
+TRENDING = {
+    'HALF_LIFE_HOURS': float(os.environ.get('TRENDING_HALF_LIFE_HOURS', 72)),
+}
+
+# Review digests (see books.api.v1.digests); run `manage.py update_review_digests` periodically
+REVIEW_DIGESTS = {
+    'CHUNK_CHARS': 6000,
+    'DRIFT_THRESHOLD': float(os.environ.get('REVIEW_DIGEST_DRIFT_THRESHOLD', 0.2)),
+}
+
+# Background summaries of new and changed descriptions (see books.api.v1.summary_jobs);
+# run ./manage.py run_summary_jobs alongside the web workers
+SUMMARY_PRECOMPUTE = {
+    'ENABLED': os.environ.get('SUMMARY_PRECOMPUTE_ENABLED', '1') == '1',
+    'DEBOUNCE_SECONDS': int(os.environ.get('SUMMARY_DEBOUNCE_SECONDS', 30)),
+    'MAX_DELAY_SECONDS': 300,
+}
+
+# Near-duplicate detection (see books.api.v1.duplicates); CHECK_ON_CREATE is 'warn', 'reject' or 'off'
+DUPLICATES = {
+    'THRESHOLD': float(os.environ.get('DUPLICATE_THRESHOLD', 0.7)),
+    'CHECK_ON_CREATE': os.environ.get('DUPLICATE_CHECK_ON_CREATE', 'warn'),
+}
+
+# Columnar catalog snapshot kept in each worker for recommendations and the leaderboard (see books.api.v1.catalog)
+CATALOG_SNAPSHOT = {
+    'REFRESH_SECONDS': 2,
+}
+
+# Change feed (see books.api.v1.changes); run `manage.py prune_tombstones` daily
+CHANGE_FEED = {
+    'PAGE_SIZE': 500,
+    'MAX_PAGE_SIZE': 5000,
+    'SAFETY_LAG_SECONDS': 5,
+    'TOMBSTONE_RETENTION_DAYS': int(os.environ.get('CHANGE_FEED_TOMBSTONE_RETENTION_DAYS', 30)),
+}
+
+# Largest accepted POST /books/batch/ request
+MAX_BATCH_OPERATIONS = int(os.environ.get('MAX_BATCH_OPERATIONS', 1000))
+
+# Most ids accepted by GET /books/?ids=... and sub-requests accepted by POST /multi/
+MAX_BULK_IDS = int(os.environ.get('MAX_BULK_IDS', 500))
+MAX_MULTIPLEX_REQUESTS = int(os.environ.get('MAX_MULTIPLEX_REQUESTS', 20))
+
+# On-demand request profiling (see books.profiling); send the token in X-Profile-Token
+REQUEST_PROFILING = {
+    'HEADER_TOKEN': os.environ.get('PROFILING_TOKEN', ''),
+    'SAMPLE_RATE': float(os.environ.get('PROFILING_SAMPLE_RATE', 0)),
+    'DIR': os.environ.get('PROFILING_DIR', os.path.join(BASE_DIR, 'var', 'profiles')),
+    'MAX_PROFILES': 200,
+}
+
+# Summary model routing (see books.api.v1.utils.route_summary_request); the first matching route wins
+SUMMARY_ROUTES = [
+    {
+        'name': 'short',
+        'model': os.environ.get('SUMMARY_SMALL_MODEL', 'phi3:mini'),
+        'max_input_chars': 2000,
+        'min_tokens': 48,
+        'max_tokens': 120,
+        'tokens_per_1k_chars': 40,
+        'temperature': 0.3,
+        'timeout': 60,
+    },
+    {
+        'name': 'long-interactive',
+        'model': os.environ.get('SUMMARY_LARGE_MODEL', 'mistral'),
+        'max_input_chars': None,
+        'priorities': ['interactive'],
+        'min_tokens': 120,
+        'max_tokens': 256,
+        'tokens_per_1k_chars': 10,
+        'temperature': 0.7,
+        'timeout': 120,
+    },
+    {
+        'name': 'long',
+        'model': os.environ.get('SUMMARY_LARGE_MODEL', 'mistral'),
+        'max_input_chars': None,
+        'min_tokens': 150,
+        'max_tokens': 512,
+        'tokens_per_1k_chars': 10,
+        'temperature': 0.7,
+        'timeout': 180,
+    },
+]
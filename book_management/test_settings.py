@@ -0,0 +1,29 @@
+"""
+Settings for running the tests without PostgreSQL.
+
+Two SQLite files stand in for the primary and a read replica. As with
+``POSTGRES_REPLICA_HOSTS``, the replica mirrors the primary during tests, so
+both connections see the same data; tests that route reads to it enable it
+with ``override_settings(DATABASE_REPLICAS=['replica'])``, since most test
+cases only allow queries on ``default``.
+
+    ./manage.py test --settings=book_management.test_settings
+"""
+
+from book_management.settings import *  # noqa: F401,F403
+from book_management.settings import BASE_DIR
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db_replica.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+DATABASE_REPLICAS = []
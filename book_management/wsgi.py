@@ -14,3 +14,16 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'book_management.settings')
 
 application = get_wsgi_application()
+
+# Load the Ollama models now rather than on the first summary request.
+from books.api.v1.model_lifecycle import start_model_keeper  # noqa: E402
+
+start_model_keeper()
+
+# Build the per-worker indexes now rather than in the first request that needs them. Each
+# gunicorn worker scans the catalog here, unless it runs with --preload.
+from books.api.v1.autocomplete import start_autocomplete_index  # noqa: E402
+from books.api.v1.duplicates import start_duplicate_index  # noqa: E402
+
+start_autocomplete_index()
+start_duplicate_index()
@@ -0,0 +1,362 @@
+"""
+Typeahead autocomplete over book titles and authors.
+
+``AutocompleteIndex`` keeps, per worker, a sorted array of normalized terms
+(every word-start suffix of each title and author, so "gat" finds "The Great
+Gatsby") with a parallel array of book ids. A lookup is a binary search to
+the first term with the prefix followed by a scan of the matching range, and
+results are ranked by rating and review count. An optional trigram index
+over the distinct words fills in fuzzy matches for misspelled queries.
+
+The index is built once per worker from the database, when the web process
+starts (see book_management.wsgi), and then kept up to date incrementally.
+Every ``REFRESH_SECONDS`` it re-reads only the books whose ``updated_at``
+moved (through the ``(updated_at, id)`` index) and the book tombstones
+written since the last refresh, and merges their terms into the sorted
+arrays in a single copy. Adding or deleting a review saves its book, so
+ratings and review counts follow.
+"""
+
+import heapq
+import logging
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Count
+from django.utils import timezone
+
+from books.models import Book, Tombstone
+
+logger = logging.getLogger(__name__)
+
+NON_WORD_RE = re.compile(r'[^a-z0-9]+')
+
+
+def get_autocomplete_settings():
+    """Return the autocomplete settings merged over the defaults."""
+    defaults = {
+        'REFRESH_SECONDS': 2,
+        'REFRESH_OVERLAP_SECONDS': 10,
+        'MAX_RESULTS': 20,
+        'SHORT_PREFIX_LENGTH': 2,
+        'FUZZY_THRESHOLD': 0.25,
+    }
+    defaults.update(getattr(settings, 'AUTOCOMPLETE', {}))
+    return defaults
+
+
+def normalize_text(text):
+    """Lowercase, strip accents and collapse everything but letters and digits to single spaces."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return NON_WORD_RE.sub(' ', text.lower()).strip()
+
+
+def word_suffixes(text):
+    """``"the great gatsby"`` -> ``["the great gatsby", "great gatsby", "gatsby"]``."""
+    words = text.split()
+    return [' '.join(words[i:]) for i in range(len(words))]
+
+
+def trigrams(text):
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class AutocompleteIndex:
+    """Sorted prefix index plus trigram postings over book titles and authors."""
+
+    def __init__(self, conf=None):
+        self.conf = conf or get_autocomplete_settings()
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self.terms = []
+        self.term_ids = []
+        self.books = {}
+        self.word_books = {}
+        self.word_trigrams = {}
+        self.gram_words = {}
+        self._short_cache = {}
+        self.book_watermark = None
+        self.tombstone_watermark = None
+        self.refreshed_at = 0.0
+
+    # Maintenance
+
+    def _book_words(self, title, author):
+        return set(normalize_text(f'{title} {author}').split())
+
+    def _book_terms(self, title, author):
+        terms = set(word_suffixes(normalize_text(title)))
+        terms.update(word_suffixes(normalize_text(author)))
+        return terms
+
+    def _add(self, book_id, title, author, rating, review_count):
+        self.books[book_id] = (title, author, rating or 0.0, review_count or 0)
+        for word in self._book_words(title, author):
+            books = self.word_books.get(word)
+            if books is None:
+                books = self.word_books[word] = set()
+                self._add_word_grams(word)
+            books.add(book_id)
+
+    def _add_word_grams(self, word):
+        grams = trigrams(word)
+        self.word_trigrams[word] = len(grams)
+        for gram in grams:
+            self.gram_words.setdefault(gram, set()).add(word)
+
+    def _remove(self, book_id):
+        entry = self.books.pop(book_id, None)
+        if entry is None:
+            return
+        title, author = entry[0], entry[1]
+        for word in self._book_words(title, author):
+            books = self.word_books.get(word)
+            if books is None:
+                continue
+            books.discard(book_id)
+            if not books:
+                del self.word_books[word]
+                del self.word_trigrams[word]
+                for gram in trigrams(word):
+                    words = self.gram_words[gram]
+                    words.discard(word)
+                    if not words:
+                        del self.gram_words[gram]
+
+    def _position(self, term, book_id):
+        """Where ``(term, book_id)`` is, or belongs, in the sorted term arrays."""
+        position = bisect_left(self.terms, term)
+        while position < len(self.terms) and self.terms[position] == term and self.term_ids[position] < book_id:
+            position += 1
+        return position
+
+    def _merge_terms(self, removed, added):
+        """
+        Return new term arrays without the terms of the ``removed`` book ids
+        and with the ``added`` ``(term, book_id)`` pairs.
+
+        Each edit is located with a binary search and the arrays are copied
+        once, slice by slice, so a refresh costs one copy however many books
+        changed instead of a ``list.insert`` per term.
+        """
+        edits = []
+        for book_id in removed:
+            title, author = self.books[book_id][:2]
+            for term in self._book_terms(title, author):
+                position = self._position(term, book_id)
+                if position < len(self.terms) and self.term_ids[position] == book_id:
+                    edits.append((position, 1, term, book_id))
+        # At the same position insertions go first, in (term, id) order, then the removal skips the old entry.
+        edits.extend((self._position(term, book_id), 0, term, book_id) for term, book_id in added)
+        edits.sort()
+
+        terms, term_ids, start = [], [], 0
+        for position, removal, term, book_id in edits:
+            terms.extend(self.terms[start:position])
+            term_ids.extend(self.term_ids[start:position])
+            if removal:
+                start = position + 1
+            else:
+                terms.append(term)
+                term_ids.append(book_id)
+                start = position
+        terms.extend(self.terms[start:])
+        term_ids.extend(self.term_ids[start:])
+        return terms, term_ids
+
+    def _rows(self, queryset):
+        return queryset.annotate(review_count=Count('reviews')).values_list(
+            'id', 'title', 'author', 'rating', 'review_count', 'updated_at'
+        )
+
+    def build(self):
+        """Load every book in one pass; faster than inserting into the sorted arrays one by one."""
+        started = timezone.now()
+        pairs = []
+        books, word_books = {}, {}
+        watermark = None
+        for book_id, title, author, rating, review_count, updated_at in self._rows(Book.objects.all()).iterator():
+            books[book_id] = (title, author, rating or 0.0, review_count or 0)
+            pairs.extend((term, book_id) for term in self._book_terms(title, author))
+            for word in self._book_words(title, author):
+                word_books.setdefault(word, set()).add(book_id)
+            watermark = updated_at if watermark is None or updated_at > watermark else watermark
+        pairs.sort()
+
+        with self._lock:
+            self.terms = [term for term, _ in pairs]
+            self.term_ids = [book_id for _, book_id in pairs]
+            self.books, self.word_books = books, word_books
+            self.word_trigrams, self.gram_words = {}, {}
+            for word in word_books:
+                self._add_word_grams(word)
+            self._short_cache = {}
+            self.book_watermark = watermark or started
+            self.tombstone_watermark = started
+            self.refreshed_at = time.monotonic()
+
+    def refresh(self, force=False):
+        """Apply book changes and deletions since the last refresh."""
+        if not force and time.monotonic() - self.refreshed_at < self.conf['REFRESH_SECONDS']:
+            return
+        # One thread refreshes; the others keep answering from the current state.
+        if not self._refresh_lock.acquire(blocking=force):
+            return
+        try:
+            self._refresh()
+        finally:
+            self._refresh_lock.release()
+
+    def _refresh(self):
+        overlap = timedelta(seconds=self.conf['REFRESH_OVERLAP_SECONDS'])
+        now = timezone.now()
+        # Re-reading an overlapping window is harmless (updates are idempotent) and
+        # catches rows from transactions that committed after a later one.
+        changed = list(self._rows(Book.objects.filter(updated_at__gt=self.book_watermark - overlap)))
+        deleted = set(Tombstone.objects.filter(
+            model=Tombstone.MODEL_BOOK,
+            deleted_at__gt=self.tombstone_watermark - overlap
+        ).values_list('object_id', flat=True))
+
+        # Only the refreshing thread changes the index, so it can read it without the lock.
+        updates = {
+            book_id: (title, author, rating, review_count)
+            for book_id, title, author, rating, review_count, _ in changed
+            if self.books.get(book_id) != (title, author, rating or 0.0, review_count or 0)
+        }
+        removed = {book_id for book_id in [*updates, *deleted] if book_id in self.books}
+        added = sorted(
+            (term, book_id)
+            for book_id, (title, author, _, _) in updates.items() if book_id not in deleted
+            for term in self._book_terms(title, author)
+        )
+        terms = self._merge_terms(removed, added) if removed or added else None
+
+        with self._lock:
+            for book_id in removed:
+                self._remove(book_id)
+            for book_id, (title, author, rating, review_count) in updates.items():
+                if book_id not in deleted:
+                    self._add(book_id, title, author, rating, review_count)
+            if terms is not None:
+                self.terms, self.term_ids = terms
+                self._short_cache = {}
+            for *_, updated_at in changed:
+                self.book_watermark = max(self.book_watermark, updated_at)
+            self.tombstone_watermark = now
+            self.refreshed_at = time.monotonic()
+
+    # Queries
+
+    def _rank_key(self, book_id):
+        _, _, rating, review_count = self.books[book_id]
+        return rating, review_count, -book_id
+
+    def _prefix_ids(self, prefix, limit):
+        if len(prefix) <= self.conf['SHORT_PREFIX_LENGTH']:
+            # Short prefixes match large ranges; their rankings are cached until the next change.
+            cached = self._short_cache.get(prefix)
+            if cached is None or len(cached) < limit:
+                cached = self._scan(prefix, max(limit, self.conf['MAX_RESULTS']))
+                self._short_cache[prefix] = cached
+            return cached[:limit]
+        return self._scan(prefix, limit)
+
+    def _scan(self, prefix, limit):
+        start = bisect_left(self.terms, prefix)
+        ids = set()
+        for position in range(start, len(self.terms)):
+            if not self.terms[position].startswith(prefix):
+                break
+            ids.add(self.term_ids[position])
+        return heapq.nlargest(limit, ids, key=self._rank_key)
+
+    def _similar_words(self, word):
+        """Indexed words whose trigram Jaccard similarity to ``word`` reaches the threshold."""
+        grams = trigrams(word)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.gram_words.get(gram, ()))
+        threshold = self.conf['FUZZY_THRESHOLD']
+        similar = {}
+        for candidate, count in shared.items():
+            similarity = count / (len(grams) + self.word_trigrams[candidate] - count)
+            if similarity >= threshold:
+                similar[candidate] = similarity
+        return similar
+
+    def _fuzzy_ids(self, query, limit, exclude):
+        # Every query word must resemble some word of the book; books score the mean of their best matches.
+        scores = None
+        for word in query.split():
+            best = {}
+            for candidate, similarity in self._similar_words(word).items():
+                for book_id in self.word_books[candidate]:
+                    if similarity > best.get(book_id, 0):
+                        best[book_id] = similarity
+            if scores is None:
+                scores = best
+            else:
+                scores = {book_id: scores[book_id] + score for book_id, score in best.items() if book_id in scores}
+        scored = [
+            (score, self._rank_key(book_id), book_id)
+            for book_id, score in (scores or {}).items() if book_id not in exclude
+        ]
+        return [book_id for *_, book_id in heapq.nlargest(limit, scored)]
+
+    def search(self, query, limit=10, fuzzy=False):
+        """Return up to ``limit`` ``(book_id, title, author, rating, review_count)`` tuples."""
+        query = normalize_text(query)
+        if not query:
+            return []
+        with self._lock:
+            ids = self._prefix_ids(query, limit)
+            if fuzzy and len(ids) < limit:
+                ids = ids + self._fuzzy_ids(query, limit - len(ids), set(ids))
+            return [(book_id, *self.books[book_id]) for book_id in ids]
+
+
+_index_lock = threading.Lock()
+_index = None
+
+
+def get_autocomplete_index():
+    """
+    Return this worker's index, refreshing it as books change.
+
+    Web processes build it at startup with ``start_autocomplete_index``;
+    other processes build it on first use.
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            index = AutocompleteIndex()
+            index.build()
+            _index = index
+    _index.refresh()
+    return _index
+
+
+def start_autocomplete_index():
+    """Build this process's index now; return it, or None if the database is not ready."""
+    try:
+        return get_autocomplete_index()
+    except DatabaseError as e:
+        logger.warning(f"Could not build the autocomplete index at startup, deferring to the first lookup: {e}")
+        return None
+
+
+def reset_autocomplete_index():
+    """Drop this worker's index so the next lookup rebuilds it (used by tests)."""
+    global _index
+    with _index_lock:
+        _index = None
@@ -0,0 +1,147 @@
+"""
+Batched book mutations.
+
+``apply_book_batch`` validates a list of create/update/delete operations
+with ``BookSerializer`` and applies them in one transaction with one
+``bulk_create``, one ``bulk_update`` and one ``DELETE``, instead of one
+request, transaction and response per book. A batch is all or nothing: if
+any operation is invalid, nothing is written.
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers, status
+
+from books.api.v1.duplicates import DuplicateBook
+from books.api.v1.summary_jobs import schedule_summaries
+from books.models import Book
+from books.signals import deferred_tombstones
+
+OP_CREATE = 'create'
+OP_UPDATE = 'update'
+OP_DELETE = 'delete'
+
+
+def get_max_batch_operations():
+    return getattr(settings, 'MAX_BATCH_OPERATIONS', 1000)
+
+
+class BatchOperationSerializer(serializers.Serializer):
+    op = serializers.ChoiceField(choices=(OP_CREATE, OP_UPDATE, OP_DELETE))
+    id = serializers.IntegerField(required=False, min_value=1)
+    data = serializers.DictField(required=False)
+
+    def validate(self, attrs):
+        if attrs['op'] in (OP_UPDATE, OP_DELETE) and 'id' not in attrs:
+            raise serializers.ValidationError({'id': f"Required for '{attrs['op']}'."})
+        if attrs['op'] in (OP_CREATE, OP_UPDATE) and 'data' not in attrs:
+            raise serializers.ValidationError({'data': f"Required for '{attrs['op']}'."})
+        return attrs
+
+
+class BookBatchSerializer(serializers.Serializer):
+    operations = BatchOperationSerializer(many=True, allow_empty=False)
+
+    def validate_operations(self, operations):
+        limit = get_max_batch_operations()
+        if len(operations) > limit:
+            raise serializers.ValidationError(f"At most {limit} operations per batch.")
+        return operations
+
+
+def apply_book_batch(operations, serializer_class, context=None, check_duplicates=None):
+    """
+    Validate and apply ``operations``, returning ``(applied, results)``.
+
+    ``results`` has one entry per operation, in order, with the HTTP status
+    the operation would have had as a single request. When ``applied`` is
+    false the transaction was rolled back; operations that were valid are
+    then reported with status 424.
+
+    ``check_duplicates`` is an optional ``DuplicateCheck``; creates it
+    rejects fail with 409 and the near-duplicates it only warns about are
+    listed under ``possible_duplicates``.
+    """
+    targets = {op['id'] for op in operations if 'id' in op}
+    results = [None] * len(operations)
+    to_create, to_update, to_delete = [], [], []
+    update_fields = set()
+    duplicates = {}
+
+    with transaction.atomic():
+        books = Book.objects.select_for_update().in_bulk(targets)
+        seen = set()
+        for index, op in enumerate(operations):
+            book_id = op.get('id')
+            if book_id is not None:
+                if book_id in seen:
+                    results[index] = _error(op, status.HTTP_409_CONFLICT, "Book appears in more than one operation.")
+                    continue
+                seen.add(book_id)
+                if book_id not in books:
+                    results[index] = _error(op, status.HTTP_404_NOT_FOUND, "Not found.")
+                    continue
+
+            if op['op'] == OP_DELETE:
+                to_delete.append((index, book_id))
+                continue
+
+            serializer = serializer_class(
+                books.get(book_id), data=op['data'], partial=op['op'] == OP_UPDATE, context=context
+            )
+            if not serializer.is_valid():
+                results[index] = _error(op, status.HTTP_400_BAD_REQUEST, serializer.errors)
+                continue
+            if op['op'] == OP_CREATE:
+                if check_duplicates is not None:
+                    try:
+                        duplicates[index] = check_duplicates(serializer.validated_data, key=index)
+                    except DuplicateBook as exc:
+                        results[index] = _error(op, status.HTTP_409_CONFLICT, exc.detail)
+                        results[index]['duplicates'] = exc.duplicates
+                        continue
+                to_create.append((index, Book(**serializer.validated_data)))
+            else:
+                book = books[book_id]
+                for field, value in serializer.validated_data.items():
+                    setattr(book, field, value)
+                update_fields.update(serializer.validated_data)
+                to_update.append((index, book))
+
+        if any(result is not None for result in results):
+            transaction.set_rollback(True)
+            for index, op in enumerate(operations):
+                if results[index] is None:
+                    results[index] = _error(op, status.HTTP_424_FAILED_DEPENDENCY, "Not applied; the batch has errors.")
+            return False, results
+
+        now = timezone.now()
+        if to_create:
+            created = Book.objects.bulk_create([book for _, book in to_create])
+            for (index, _), book in zip(to_create, created):
+                results[index] = {'op': OP_CREATE, 'id': book.pk, 'status': status.HTTP_201_CREATED}
+                if duplicates.get(index):
+                    results[index]['possible_duplicates'] = duplicates[index]
+        if to_update:
+            # bulk_update() bypasses save(), so auto_now is applied by hand.
+            for _, book in to_update:
+                book.updated_at = now
+            Book.objects.bulk_update([book for _, book in to_update], sorted(update_fields | {'updated_at'}))
+            for index, book in to_update:
+                results[index] = {'op': OP_UPDATE, 'id': book.pk, 'status': status.HTTP_200_OK}
+        if to_delete:
+            with deferred_tombstones():
+                Book.objects.filter(pk__in=[book_id for _, book_id in to_delete]).delete()
+            for index, book_id in to_delete:
+                results[index] = {'op': OP_DELETE, 'id': book_id, 'status': status.HTTP_204_NO_CONTENT}
+        # bulk_create() and bulk_update() send no post_save, so summaries are scheduled here.
+        schedule_summaries(
+            [book for _, book in to_create]
+            + ([book for _, book in to_update] if 'description' in update_fields else [])
+        )
+    return True, results
+
+
+def _error(op, code, errors):
+    return {'op': op['op'], 'id': op.get('id'), 'status': code, 'errors': errors}
@@ -0,0 +1,242 @@
+"""
+Read-only, column-oriented snapshot of the catalog kept in each worker.
+
+Candidate generation for recommendations and the leaderboard needs a few
+numbers per book (rating, average review rating, review count, genre,
+author) for many books, but not their text. ``CatalogSnapshot`` keeps just
+those as numpy arrays sorted by id, with genres and authors interned to
+integer codes: 28 bytes per book, so under 30 MB for a million books
+instead of gigabytes of model instances. Filtering and sorting are
+vectorized over the arrays; only the final page of ids goes to the
+database.
+
+Like the autocomplete index, the snapshot is built in one query and then
+refreshed every ``REFRESH_SECONDS`` from the books whose ``updated_at``
+moved and from book tombstones. Adding or deleting a review saves its
+book, so ratings and counts follow. Each refresh publishes a new set of arrays, so readers never see
+a half-applied update.
+"""
+
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Avg, Count
+from django.utils import timezone
+
+from books.models import Book, Tombstone
+
+NO_CODE = -1
+ORDER_FIELDS = ('rating', 'average_rating', 'review_count', 'id')
+
+
+def get_snapshot_settings():
+    """Return the catalog snapshot settings merged over the defaults."""
+    defaults = {
+        'REFRESH_SECONDS': 2,
+        'REFRESH_OVERLAP_SECONDS': 10,
+    }
+    defaults.update(getattr(settings, 'CATALOG_SNAPSHOT', {}))
+    return defaults
+
+
+class Interner:
+    """Maps strings to dense integer codes and back."""
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def code(self, value):
+        if value is None:
+            return NO_CODE
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def lookup(self, value):
+        """Code of an existing value, or ``None`` if no book has it."""
+        return self.codes.get(value)
+
+
+class Columns:
+    """One immutable generation of the snapshot arrays, sorted by id."""
+
+    def __init__(self, ids, rating, average_rating, review_count, genre, author):
+        self.ids = ids
+        self.rating = rating
+        self.average_rating = average_rating
+        self.review_count = review_count
+        self.genre = genre
+        self.author = author
+
+    @classmethod
+    def empty(cls):
+        return cls.from_rows([], Interner(), Interner())
+
+    @classmethod
+    def from_rows(cls, rows, genres, authors):
+        """Columns for ``(id, rating, average_rating, review_count, genre, author)`` rows."""
+        count = len(rows)
+        ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=count)
+        columns = cls(
+            ids,
+            np.fromiter((row[1] or 0.0 for row in rows), dtype=np.float32, count=count),
+            np.fromiter((np.nan if row[2] is None else row[2] for row in rows), dtype=np.float32, count=count),
+            np.fromiter((row[3] or 0 for row in rows), dtype=np.int32, count=count),
+            np.fromiter((genres.code(row[4]) for row in rows), dtype=np.int32, count=count),
+            np.fromiter((authors.code(row[5]) for row in rows), dtype=np.int32, count=count),
+        )
+        return columns.take(np.argsort(ids, kind='stable'))
+
+    def arrays(self):
+        return [getattr(self, name) for name in ('ids', 'rating', 'average_rating', 'review_count', 'genre', 'author')]
+
+    def take(self, positions):
+        return Columns(*(array[positions] for array in self.arrays()))
+
+    def concat(self, other):
+        merged = Columns(*(np.concatenate([a, b]) for a, b in zip(self.arrays(), other.arrays())))
+        return merged.take(np.argsort(merged.ids, kind='stable'))
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in self.arrays())
+
+
+class CatalogSnapshot:
+    """Per-worker columnar copy of the numeric and categorical book fields."""
+
+    def __init__(self, conf=None):
+        self.conf = conf or get_snapshot_settings()
+        self._refresh_lock = threading.Lock()
+        self.genres = Interner()
+        self.authors = Interner()
+        self.columns = Columns.empty()
+        self.book_watermark = None
+        self.tombstone_watermark = None
+        self.refreshed_at = 0.0
+
+    def __len__(self):
+        return len(self.columns)
+
+    def _rows(self, queryset):
+        return queryset.annotate(
+            average_rating=Avg('reviews__rating'),
+            review_count=Count('reviews')
+        ).values_list('id', 'rating', 'average_rating', 'review_count', 'genre', 'author', 'updated_at')
+
+    def build(self):
+        """Load the whole catalog with one query."""
+        started = timezone.now()
+        rows = list(self._rows(Book.objects.all()).iterator())
+        watermark = max((row[6] for row in rows), default=None)
+        with self._refresh_lock:
+            self.columns = Columns.from_rows(rows, self.genres, self.authors)
+            self.book_watermark = watermark or started
+            self.tombstone_watermark = started
+            self.refreshed_at = time.monotonic()
+
+    def refresh(self, force=False):
+        """Apply book changes and deletions since the last refresh."""
+        if not force and time.monotonic() - self.refreshed_at < self.conf['REFRESH_SECONDS']:
+            return
+        # One thread refreshes; the others keep reading the current columns.
+        if not self._refresh_lock.acquire(blocking=force):
+            return
+        try:
+            self._refresh()
+        finally:
+            self._refresh_lock.release()
+
+    def _refresh(self):
+        overlap = timedelta(seconds=self.conf['REFRESH_OVERLAP_SECONDS'])
+        now = timezone.now()
+        changed = list(self._rows(Book.objects.filter(updated_at__gt=self.book_watermark - overlap)))
+        deleted = list(Tombstone.objects.filter(
+            model=Tombstone.MODEL_BOOK,
+            deleted_at__gt=self.tombstone_watermark - overlap
+        ).values_list('object_id', flat=True))
+
+        if changed or deleted:
+            replaced = np.fromiter((row[0] for row in changed), dtype=np.int64, count=len(changed))
+            removed = np.concatenate([replaced, np.asarray(deleted, dtype=np.int64)])
+            current = self.columns
+            kept = current.take(~np.isin(current.ids, removed))
+            self.columns = kept.concat(Columns.from_rows(changed, self.genres, self.authors))
+            self.book_watermark = max([self.book_watermark] + [row[6] for row in changed])
+        self.tombstone_watermark = now
+        self.refreshed_at = time.monotonic()
+
+    def query(self, genre=None, author=None, min_rating=None, min_average_rating=None,
+              exclude_ids=None, order_by='-rating', limit=None):
+        """
+        Ids of the books matching the filters, sorted by ``order_by``.
+
+        ``order_by`` is one of ``ORDER_FIELDS``, optionally prefixed with
+        ``-`` for descending order. Ties are broken by ascending id and books
+        without reviews sort last by ``average_rating``.
+        """
+        columns = self.columns
+        mask = np.ones(len(columns), dtype=bool)
+        for interner, column, value in ((self.genres, columns.genre, genre), (self.authors, columns.author, author)):
+            if value is not None:
+                code = interner.lookup(value)
+                if code is None:
+                    return np.empty(0, dtype=np.int64)
+                mask &= column == code
+        if min_rating is not None:
+            mask &= columns.rating >= min_rating
+        if min_average_rating is not None:
+            mask &= columns.average_rating >= min_average_rating
+        if exclude_ids:
+            mask &= ~np.isin(columns.ids, np.fromiter(exclude_ids, dtype=np.int64))
+        positions = np.flatnonzero(mask)
+
+        descending = order_by.startswith('-')
+        field = order_by.lstrip('-')
+        if field not in ORDER_FIELDS:
+            raise ValueError(f"Cannot order by {field!r}; choose from {', '.join(ORDER_FIELDS)}.")
+        keys = getattr(columns, field)[positions].astype(np.float64)
+        keys = np.where(np.isnan(keys), -np.inf if descending else np.inf, keys)
+        if descending:
+            keys = -keys
+        if limit is not None and limit < len(positions):
+            # Partial selection first, so only ``limit`` rows are fully sorted.
+            nearest = np.argpartition(keys, limit - 1)[:limit]
+            threshold = keys[nearest].max()
+            candidates = np.flatnonzero(keys <= threshold)
+            positions, keys = positions[candidates], keys[candidates]
+        order = np.lexsort((columns.ids[positions], keys))
+        result = columns.ids[positions[order]]
+        return result if limit is None else result[:limit]
+
+
+_snapshot_lock = threading.Lock()
+_snapshot = None
+
+
+def get_catalog_snapshot():
+    """Return this worker's snapshot, building it on first use and refreshing it as books change."""
+    global _snapshot
+    with _snapshot_lock:
+        if _snapshot is None:
+            snapshot = CatalogSnapshot()
+            snapshot.build()
+            _snapshot = snapshot
+    _snapshot.refresh()
+    return _snapshot
+
+
+def reset_catalog_snapshot():
+    """Drop this worker's snapshot so the next read rebuilds it (used by tests)."""
+    global _snapshot
+    with _snapshot_lock:
+        _snapshot = None
@@ -0,0 +1,155 @@
+"""
+Incremental "what readers say" digests of book reviews.
+
+Summarizing every review of a popular book on every change would cost LLM
+time proportional to the total number of reviews. Instead each
+``BookReviewDigest`` keeps a high-water mark on ``(Review.created_at, id)``
+and ``update_review_digest`` folds only reviews past the mark into the
+existing digest, one prompt per chunk of new reviews.
+
+Edits and deletions of reviews already folded in cannot be subtracted from
+a digest. They are counted as drift, and once drift exceeds
+``DRIFT_THRESHOLD`` of the digested reviews the digest is rebuilt from
+scratch by folding all reviews into an empty digest.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from books.api.v1.utils import PRIORITY_BATCH, generate_summary
+from books.models import BookReviewDigest, Review
+
+logger = logging.getLogger(__name__)
+
+DIGEST_UNCHANGED = 'unchanged'
+DIGEST_UPDATED = 'updated'
+DIGEST_REBUILT = 'rebuilt'
+
+START_INSTRUCTION = (
+    "Below are reader reviews of a book. Write a short digest of what readers say: "
+    "what they praise, what they criticize and the overall sentiment. Use at most 150 words."
+)
+FOLD_INSTRUCTION = (
+    "Below is a digest of what readers say about a book, followed by new reader reviews. "
+    "Rewrite the digest so that it also reflects the new reviews, weighing them against the "
+    "readers already covered. Use at most 150 words and reply with the digest only."
+)
+
+
+def get_digest_settings():
+    """Return the review digest settings merged over the defaults."""
+    defaults = {
+        'CHUNK_CHARS': 6000,
+        'MAX_REVIEW_CHARS': 1000,
+        'DRIFT_THRESHOLD': 0.2,
+        'SAFETY_LAG_SECONDS': 5,
+    }
+    defaults.update(getattr(settings, 'REVIEW_DIGESTS', {}))
+    return defaults
+
+
+def review_chunks(rows, conf):
+    """Group ``(rating, comment)`` rows into prompt-sized lists of lines."""
+    chunk, size = [], 0
+    for rating, comment in rows:
+        line = f"- ({rating}/5) {' '.join(comment[:conf['MAX_REVIEW_CHARS']].split())}"
+        if chunk and size + len(line) > conf['CHUNK_CHARS']:
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(line)
+        size += len(line) + 1
+    if chunk:
+        yield chunk
+
+
+def fold_reviews(digest, lines):
+    """Return ``digest`` updated with the reviews in ``lines``; raises on LLM errors."""
+    reviews = "\n".join(lines)
+    if not digest:
+        return generate_summary(reviews, priority=PRIORITY_BATCH, instruction=START_INSTRUCTION, raise_errors=True)
+    return generate_summary(
+        f"Current digest:\n{digest}\n\nNew reviews:\n{reviews}",
+        priority=PRIORITY_BATCH,
+        instruction=FOLD_INSTRUCTION,
+        raise_errors=True
+    )
+
+
+def _up_to(created_at, review_id):
+    return Q(created_at__lt=created_at) | Q(created_at=created_at, id__lte=review_id)
+
+
+def update_review_digest(book, rebuild=False, conf=None):
+    """
+    Fold the book's new reviews into its digest.
+
+    Returns ``(digest, outcome)`` where outcome is one of ``DIGEST_UNCHANGED``,
+    ``DIGEST_UPDATED`` or ``DIGEST_REBUILT``. Reviews newer than
+    ``SAFETY_LAG_SECONDS`` wait for the next run, so a review committed late
+    by a slow transaction is never skipped by the high-water mark. LLM errors
+    propagate and leave the stored digest untouched.
+    """
+    conf = conf or get_digest_settings()
+    now = timezone.now()
+    horizon = now - timedelta(seconds=conf['SAFETY_LAG_SECONDS'])
+    digest, _ = BookReviewDigest.objects.get_or_create(book=book)
+    reviews = Review.objects.filter(book=book, created_at__lte=horizon)
+
+    drift, folded = 0, 0
+    if digest.last_review_at is not None:
+        folded_reviews = Review.objects.filter(_up_to(digest.last_review_at, digest.last_review_id), book=book)
+        folded = folded_reviews.count()
+        edited = folded_reviews.filter(updated_at__gt=digest.folded_at).count()
+        drift = digest.drift_count + max(digest.review_count - folded, 0) + edited
+    rebuild = rebuild or (digest.review_count > 0 and drift > conf['DRIFT_THRESHOLD'] * digest.review_count)
+
+    if rebuild:
+        base, folded, drift = '', 0, 0
+    else:
+        base = digest.digest
+        if digest.last_review_at is not None:
+            reviews = reviews.exclude(_up_to(digest.last_review_at, digest.last_review_id))
+    rows = list(reviews.order_by('created_at', 'id').values_list('id', 'created_at', 'rating', 'comment'))
+    if not rows and not rebuild:
+        return digest, DIGEST_UNCHANGED
+
+    text = base
+    for chunk in review_chunks(((rating, comment) for _, _, rating, comment in rows), conf):
+        text = fold_reviews(text, chunk)
+
+    previous_fold = digest.folded_at
+    digest.digest = text
+    if rows:
+        digest.last_review_id, digest.last_review_at = rows[-1][0], rows[-1][1]
+    elif rebuild:
+        digest.last_review_id, digest.last_review_at = 0, None
+    digest.review_count = folded + len(rows)
+    digest.drift_count = drift
+    digest.folded_at = now
+    if rebuild:
+        digest.rebuilt_at = now
+    # A concurrent run may have folded the same reviews while the LLM was busy; keep its result.
+    fields = ['digest', 'last_review_id', 'last_review_at', 'review_count', 'drift_count', 'folded_at', 'rebuilt_at']
+    values = {field: getattr(digest, field) for field in fields}
+    if not BookReviewDigest.objects.filter(pk=digest.pk, folded_at=previous_fold).update(updated_at=now, **values):
+        digest.refresh_from_db()
+        return digest, DIGEST_UNCHANGED
+    logger.info(f"Review digest of book {book.pk}: folded {len(rows)} review(s), rebuild={rebuild}")
+    return digest, DIGEST_REBUILT if rebuild else DIGEST_UPDATED
+
+
+def books_needing_digest(queryset):
+    """
+    Books with reviews created or edited since their digest was last updated.
+
+    Deletions alone do not select a book; they are counted as drift on its
+    next update.
+    """
+    return queryset.filter(
+        Q(review_digest__folded_at__isnull=True, reviews__isnull=False)
+        | Q(reviews__updated_at__gt=F('review_digest__folded_at'))
+    ).distinct()
@@ -0,0 +1,502 @@
+"""
+Near-duplicate book detection with MinHash and locality-sensitive hashing.
+
+Each book is reduced to the set of word shingles of its normalized title,
+author and description, and that set to a MinHash signature: for each of
+``NUM_PERM`` hash functions, the smallest hash of any shingle. Two
+signatures agree in a position with probability equal to the Jaccard
+similarity of the sets, so the fraction of agreeing positions estimates it.
+
+The signature is cut into ``BANDS`` bands. Books sharing any whole band land
+in the same bucket and become candidates, and only candidates are compared,
+which replaces the O(n²) pairwise comparison with a lookup per band. With
+32 bands of 4 rows, a pair at similarity s becomes a candidate with
+probability 1 - (1 - s⁴)³²: above 0.999 at 0.7, about 0.87 at 0.5, 0.23 at
+0.3 and 0.05 at 0.2. Candidates below ``THRESHOLD`` are dropped once their
+signatures are compared.
+
+Signatures keep only the lowest byte of each minimum (b-bit MinHash): two
+bytes also agree by chance 1 time in 256, which the estimate corrects for,
+and a band of 4 rows packs into a single uint32 key.
+
+The index over the catalog is a set of flat numpy arrays: book ids (8
+bytes), signatures (``NUM_PERM`` bytes) and, per band, the band keys in
+sorted order (``NUM_PERM / BANDS`` bytes each) with the row they belong to
+(4 bytes), searched with a binary search. At the defaults that is
+8 + 128 + 32 × (4 + 4) = 392 bytes per book, about 400 MB per million
+books, in a few large buffers that a preloading server shares copy-on-write
+between its workers. Like the autocomplete index it is built in one pass over
+the catalog when the web process starts (see book_management.wsgi). Without
+``--preload`` that happens in every gunicorn worker as it imports the
+application, so each worker reads the whole catalog before it serves its
+first request; with it the master builds the index once before forking.
+It is then refreshed incrementally from ``updated_at`` and book tombstones:
+changed and new books go to small per-band buckets that are merged into the
+arrays once they hold ``MERGE_ROWS`` books.
+"""
+
+import logging
+import threading
+import time
+import zlib
+from array import array
+from datetime import timedelta
+from itertools import combinations
+
+import numpy as np
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from books.api.v1.autocomplete import normalize_text
+from books.models import Book, Tombstone
+
+logger = logging.getLogger(__name__)
+
+# Universal hashing (a * x + b) mod p with a Mersenne prime; 32-bit inputs and
+# 31-bit coefficients keep every intermediate below 2**63.
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+SIGNATURE_DTYPE = np.uint8
+# Probability that the lowest bytes of two different minima agree.
+CHANCE_AGREEMENT = 1 / 256
+# Band keys by rows per band: the band's signature bytes read as one integer.
+BAND_KEY_DTYPES = {1: np.dtype('<u1'), 2: np.dtype('<u2'), 4: np.dtype('<u4'), 8: np.dtype('<u8')}
+
+CHECK_OFF = 'off'
+CHECK_WARN = 'warn'
+CHECK_REJECT = 'reject'
+
+
+def get_duplicate_settings():
+    """Return the duplicate detection settings merged over the defaults."""
+    defaults = {
+        'NUM_PERM': 128,
+        'BANDS': 32,
+        'SHINGLE_SIZE': 3,
+        'THRESHOLD': 0.7,
+        'SEED': 1,
+        'CHECK_ON_CREATE': CHECK_WARN,
+        'REFRESH_SECONDS': 2,
+        'REFRESH_OVERLAP_SECONDS': 10,
+        # Changed books held in buckets before they are merged into the arrays.
+        'MERGE_ROWS': 10000,
+    }
+    defaults.update(getattr(settings, 'DUPLICATES', {}))
+    return defaults
+
+
+class DuplicateBook(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'A near-duplicate of this book already exists.'
+    default_code = 'duplicate'
+
+    def __init__(self, duplicates):
+        super().__init__()
+        self.duplicates = duplicates
+
+
+def book_text(title, author, description):
+    return normalize_text(f'{title} {author} {description}')
+
+
+def shingles(text, size):
+    """Hashes of the word ``size``-grams of ``text`` (the whole text if it is shorter)."""
+    words = text.split()
+    if len(words) <= size:
+        return {zlib.crc32(text.encode())} if text else set()
+    return {zlib.crc32(' '.join(words[i:i + size]).encode()) for i in range(len(words) - size + 1)}
+
+
+class MinHasher:
+    """Computes MinHash signatures with ``num_perm`` seeded hash functions."""
+
+    def __init__(self, num_perm=128, seed=1):
+        generator = np.random.default_rng(seed)
+        self.a = generator.integers(1, 1 << 31, size=num_perm, dtype=np.uint64)
+        self.b = generator.integers(0, 1 << 31, size=num_perm, dtype=np.uint64)
+
+    def signature(self, hashes):
+        """The lowest byte of each minimum, as ``num_perm`` uint8 values."""
+        if not hashes:
+            return np.full(len(self.a), MAX_HASH & 0xFF, dtype=SIGNATURE_DTYPE)
+        values = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+        permuted = (np.outer(values, self.a) + self.b) % MERSENNE_PRIME & MAX_HASH
+        return (permuted.min(axis=0) & 0xFF).astype(SIGNATURE_DTYPE)
+
+
+def similarities(signatures, signature):
+    """Estimated Jaccard similarity of ``signature`` to each row of ``signatures``."""
+    agreement = np.count_nonzero(signatures == signature, axis=-1) / signature.shape[-1]
+    return np.clip((agreement - CHANCE_AGREEMENT) / (1 - CHANCE_AGREEMENT), 0.0, 1.0)
+
+
+def similarity(first, second):
+    """Estimated Jaccard similarity of the sets behind two signatures."""
+    return float(similarities(first, second))
+
+
+def band_key_dtype(num_perm, bands):
+    if num_perm % bands or num_perm // bands not in BAND_KEY_DTYPES:
+        raise ValueError('NUM_PERM must be BANDS times 1, 2, 4 or 8.')
+    return BAND_KEY_DTYPES[num_perm // bands]
+
+
+def band_keys(signatures, bands):
+    """The ``bands`` band keys of a signature, or of each row of a signature matrix."""
+    return np.ascontiguousarray(signatures).view(band_key_dtype(signatures.shape[-1], bands))
+
+
+class MinHashLSH:
+    """Band buckets over MinHash signatures, for a changing set of a few thousand."""
+
+    def __init__(self, num_perm, bands):
+        band_key_dtype(num_perm, bands)
+        self.bands = bands
+        self.buckets = [{} for _ in range(bands)]
+        self.signatures = {}
+
+    def _keys(self, signature):
+        return band_keys(signature, self.bands).tolist()
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def insert(self, key, signature):
+        self.remove(key)
+        self.signatures[key] = signature
+        for buckets, band_key in zip(self.buckets, self._keys(signature)):
+            buckets.setdefault(band_key, set()).add(key)
+
+    def remove(self, key):
+        signature = self.signatures.pop(key, None)
+        if signature is None:
+            return
+        for buckets, band_key in zip(self.buckets, self._keys(signature)):
+            members = buckets[band_key]
+            members.discard(key)
+            if not members:
+                del buckets[band_key]
+
+    def query(self, signature, threshold):
+        """Return ``(key, similarity)`` for candidates at or above ``threshold``, most similar first."""
+        candidates = set()
+        for buckets, band_key in zip(self.buckets, self._keys(signature)):
+            candidates.update(buckets.get(band_key, ()))
+        matches = [(key, similarity(signature, self.signatures[key])) for key in candidates]
+        return sorted(
+            ((key, score) for key, score in matches if score >= threshold),
+            key=lambda match: (-match[1], match[0])
+        )
+
+    def candidate_pairs(self):
+        """Every pair of keys sharing at least one bucket, each pair once."""
+        pairs = set()
+        for buckets in self.buckets:
+            for members in buckets.values():
+                if len(members) > 1:
+                    ordered = sorted(members)
+                    pairs.update((a, b) for i, a in enumerate(ordered) for b in ordered[i + 1:])
+        return pairs
+
+
+class FrozenLSH:
+    """
+    Band index over many signatures in flat numpy arrays, built once.
+
+    Row ``i`` is book ``ids[i]`` (ascending) with signature
+    ``signatures[i]``. For each band, ``keys[band]`` holds every row's band
+    key in sorted order and ``rows[band]`` the row it came from.
+    """
+
+    def __init__(self, ids, signatures, bands):
+        order = np.argsort(ids, kind='stable')
+        self.ids = np.asarray(ids, dtype=np.int64)[order]
+        self.signatures = np.ascontiguousarray(signatures[order])
+        keys = band_keys(self.signatures, bands)
+        rows = np.argsort(keys, axis=0, kind='stable')
+        self.rows = np.ascontiguousarray(rows.T, dtype=np.int32)
+        self.keys = np.ascontiguousarray(np.take_along_axis(keys, rows, axis=0).T)
+
+    @classmethod
+    def empty(cls, num_perm, bands):
+        return cls(np.zeros(0, dtype=np.int64), np.zeros((0, num_perm), dtype=SIGNATURE_DTYPE), bands)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def row(self, key):
+        """Row of book ``key``, or None."""
+        row = int(np.searchsorted(self.ids, key))
+        return row if row < len(self.ids) and self.ids[row] == key else None
+
+    def query(self, signature, threshold, exclude=()):
+        """Return ``(key, similarity)`` for candidates at or above ``threshold`` not in ``exclude``."""
+        found = []
+        for keys, rows, key in zip(self.keys, self.rows, band_keys(signature, len(self.keys))):
+            start, end = np.searchsorted(keys, key, side='left'), np.searchsorted(keys, key, side='right')
+            if end > start:
+                found.append(rows[start:end])
+        if not found:
+            return []
+        candidates = np.unique(np.concatenate(found))
+        scores = similarities(self.signatures[candidates], signature)
+        return [
+            (int(key), float(score))
+            for key, score in zip(self.ids[candidates], scores)
+            if score >= threshold and int(key) not in exclude
+        ]
+
+    def candidate_pairs(self):
+        """Every pair of rows sharing a band key, each pair once and ordered."""
+        pairs = set()
+        for keys, rows in zip(self.keys, self.rows):
+            if len(keys) < 2:
+                continue
+            starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+            ends = np.append(starts[1:], len(keys))
+            for start, end in zip(starts[ends - starts > 1], ends[ends - starts > 1]):
+                pairs.update(combinations(sorted(rows[start:end].tolist()), 2))
+        return pairs
+
+
+class DuplicateIndex:
+    """MinHash LSH index over the catalog, kept up to date incrementally."""
+
+    def __init__(self, conf=None):
+        self.conf = conf or get_duplicate_settings()
+        self.hasher = MinHasher(self.conf['NUM_PERM'], self.conf['SEED'])
+        # Books as of the last build or merge, books changed since then, and the superseded rows of ``base``.
+        self.base = FrozenLSH.empty(self.conf['NUM_PERM'], self.conf['BANDS'])
+        self.lsh = MinHashLSH(self.conf['NUM_PERM'], self.conf['BANDS'])
+        self.stale = set()
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self.book_watermark = None
+        self.tombstone_watermark = None
+        self.refreshed_at = 0.0
+
+    def __len__(self):
+        return len(self.base) - len(self.stale) + len(self.lsh)
+
+    def signature(self, title, author, description):
+        return self.hasher.signature(shingles(book_text(title, author, description), self.conf['SHINGLE_SIZE']))
+
+    def _rows(self, queryset):
+        return queryset.values_list('id', 'title', 'author', 'description', 'updated_at')
+
+    def build(self):
+        """Index every book in a single pass over the catalog."""
+        started = timezone.now()
+        ids, signatures = array('q'), bytearray()
+        watermark = None
+        for book_id, title, author, description, updated_at in self._rows(Book.objects.all()).iterator():
+            ids.append(book_id)
+            signatures += self.signature(title, author, description).tobytes()
+            watermark = updated_at if watermark is None or updated_at > watermark else watermark
+        base = FrozenLSH(
+            np.frombuffer(ids, dtype=np.int64),
+            np.frombuffer(signatures, dtype=SIGNATURE_DTYPE).reshape(len(ids), self.conf['NUM_PERM']),
+            self.conf['BANDS']
+        )
+
+        with self._lock:
+            self.base = base
+            self.lsh = MinHashLSH(self.conf['NUM_PERM'], self.conf['BANDS'])
+            self.stale = set()
+            self.book_watermark = watermark or started
+            self.tombstone_watermark = started
+            self.refreshed_at = time.monotonic()
+
+    def refresh(self, force=False):
+        """Apply book changes and deletions since the last refresh."""
+        if not force and time.monotonic() - self.refreshed_at < self.conf['REFRESH_SECONDS']:
+            return
+        if not self._refresh_lock.acquire(blocking=force):
+            return
+        try:
+            self._refresh()
+            if len(self.lsh) >= self.conf['MERGE_ROWS']:
+                self._merge()
+        finally:
+            self._refresh_lock.release()
+
+    def _current(self, book_id):
+        if book_id in self.lsh.signatures:
+            return self.lsh.signatures[book_id]
+        row = self.base.row(book_id)
+        return None if row is None or book_id in self.stale else self.base.signatures[row]
+
+    def _supersede(self, book_id):
+        if self.base.row(book_id) is not None:
+            self.stale.add(book_id)
+
+    def _refresh(self):
+        overlap = timedelta(seconds=self.conf['REFRESH_OVERLAP_SECONDS'])
+        now = timezone.now()
+        changed = [
+            (book_id, self.signature(title, author, description), updated_at)
+            for book_id, title, author, description, updated_at
+            in self._rows(Book.objects.filter(updated_at__gt=self.book_watermark - overlap))
+        ]
+        deleted = list(Tombstone.objects.filter(
+            model=Tombstone.MODEL_BOOK,
+            deleted_at__gt=self.tombstone_watermark - overlap
+        ).values_list('object_id', flat=True))
+
+        with self._lock:
+            for book_id, signature, updated_at in changed:
+                current = self._current(book_id)
+                if current is None or not np.array_equal(current, signature):
+                    self.lsh.insert(book_id, signature)
+                    self._supersede(book_id)
+                self.book_watermark = max(self.book_watermark, updated_at)
+            for book_id in deleted:
+                self.lsh.remove(book_id)
+                self._supersede(book_id)
+            self.tombstone_watermark = now
+            self.refreshed_at = time.monotonic()
+
+    def _merged(self):
+        """The live books of ``base`` and ``lsh`` in one ``FrozenLSH``."""
+        live = ~np.isin(self.base.ids, np.fromiter(self.stale, dtype=np.int64, count=len(self.stale)))
+        changed = list(self.lsh.signatures.items())
+        ids = np.concatenate((self.base.ids[live], np.array([key for key, _ in changed], dtype=np.int64)))
+        signatures = np.concatenate((
+            self.base.signatures[live],
+            np.array([signature for _, signature in changed], dtype=SIGNATURE_DTYPE).reshape(-1, self.conf['NUM_PERM'])
+        ))
+        return FrozenLSH(ids, signatures, self.conf['BANDS'])
+
+    def _merge(self):
+        # Only the refreshing thread changes the index, so the arrays can be rebuilt without blocking lookups.
+        base = self._merged()
+        with self._lock:
+            self.base = base
+            self.lsh = MinHashLSH(self.conf['NUM_PERM'], self.conf['BANDS'])
+            self.stale = set()
+
+    def find(self, title, author, description, threshold=None, exclude=None):
+        """Return ``(book_id, similarity)`` for indexed books resembling the given one."""
+        signature = self.signature(title, author, description)
+        threshold = self.conf['THRESHOLD'] if threshold is None else threshold
+        with self._lock:
+            matches = self.base.query(signature, threshold, exclude=self.stale) + self.lsh.query(signature, threshold)
+        return sorted(
+            ((book_id, score) for book_id, score in matches if book_id != exclude),
+            key=lambda match: (-match[1], match[0])
+        )
+
+    def clusters(self, threshold=None):
+        """
+        Group the catalog into clusters of near-duplicates.
+
+        Candidate pairs from the buckets are verified against the signatures
+        and joined with union-find, so A~B and B~C put A, B and C together.
+        Returns lists of book ids, largest cluster first.
+        """
+        threshold = self.conf['THRESHOLD'] if threshold is None else threshold
+        parent = {}
+
+        def root(key):
+            parent.setdefault(key, key)
+            while parent[key] != key:
+                parent[key] = parent[parent[key]]
+                key = parent[key]
+            return key
+
+        with self._lock:
+            lsh = self._merged()
+        for a, b in lsh.candidate_pairs():
+            if similarity(lsh.signatures[a], lsh.signatures[b]) >= threshold:
+                parent[root(int(lsh.ids[b]))] = root(int(lsh.ids[a]))
+
+        groups = {}
+        for key in parent:
+            groups.setdefault(root(key), []).append(key)
+        return sorted((sorted(group) for group in groups.values()), key=lambda group: (-len(group), group[0]))
+
+
+class DuplicateCheck:
+    """
+    Checks books about to be created against the catalog and each other.
+
+    One instance is used per request, so a batch import also catches
+    near-duplicates among its own new rows.
+    """
+
+    def __init__(self, index=None, mode=None):
+        conf = get_duplicate_settings()
+        self.mode = conf['CHECK_ON_CREATE'] if mode is None else mode
+        self.threshold = conf['THRESHOLD']
+        self.index = index
+        if self.mode != CHECK_OFF and self.index is None:
+            self.index = get_duplicate_index()
+        self.pending = MinHashLSH(conf['NUM_PERM'], conf['BANDS'])
+
+    def __call__(self, data, key=None):
+        """
+        Return the near-duplicates of ``data`` (validated book fields).
+
+        Each match is ``{"id": ..., "similarity": ...}`` for an existing book
+        or ``{"operation": key, ...}`` for an earlier book in the same
+        request. In reject mode matches raise ``DuplicateBook`` instead.
+        """
+        if self.mode == CHECK_OFF:
+            return []
+        fields = data.get('title', ''), data.get('author', ''), data.get('description', '')
+        signature = self.index.signature(*fields)
+        matches = [
+            {'id': book_id, 'similarity': round(score, 3)}
+            for book_id, score in self.index.find(*fields, threshold=self.threshold)
+        ]
+        matches.extend(
+            {'operation': other, 'similarity': round(score, 3)}
+            for other, score in self.pending.query(signature, self.threshold)
+        )
+        if matches and self.mode == CHECK_REJECT:
+            raise DuplicateBook(matches)
+        if key is not None:
+            self.pending.insert(key, signature)
+        return matches
+
+
+_index_lock = threading.Lock()
+_index = None
+
+
+def get_duplicate_index():
+    """
+    Return this worker's index, refreshing it as books change.
+
+    Web processes build it at startup with ``start_duplicate_index``; other
+    processes build it on first use.
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            index = DuplicateIndex()
+            index.build()
+            _index = index
+    _index.refresh()
+    return _index
+
+
+def start_duplicate_index():
+    """Build this process's index now, unless the create check is off; return it or None."""
+    if get_duplicate_settings()['CHECK_ON_CREATE'] == CHECK_OFF:
+        return None
+    try:
+        return get_duplicate_index()
+    except DatabaseError as e:
+        logger.warning(f"Could not build the duplicate index at startup, deferring to the first check: {e}")
+        return None
+
+
+def reset_duplicate_index():
+    """Drop this worker's index so the next check rebuilds it (used by tests)."""
+    global _index
+    with _index_lock:
+        _index = None
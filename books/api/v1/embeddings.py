@@ -0,0 +1,277 @@
+"""
+Embedding generation and the in-process vector index for semantic search.
+
+Book embeddings are produced through Ollama's embeddings API (or a
+deterministic hashing embedder used in tests and offline setups), stored as
+float32 blobs on ``BookEmbedding`` and exported to a pair of ``.npy`` files.
+Workers memory-map those files read-only, so the operating system keeps a
+single copy of the matrix in the page cache for all of them.
+
+Each build writes a new version directory and then points ``CURRENT`` at
+it with a single atomic rename, so a worker always loads ids and vectors
+from the same build. Older versions stay on disk for workers still mapping
+them until ``KEEP_VERSIONS`` newer ones exist.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+from books.api.v1.ollama_pool import get_ollama_pool, keep_alive
+from books.api.v1.utils import content_hash
+
+logger = logging.getLogger(__name__)
+
+VECTOR_DTYPE = np.dtype('<f4')
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+CURRENT_NAME = 'CURRENT'
+KEEP_VERSIONS = 3
+
+
+class IndexUnavailable(Exception):
+    """Raised when the semantic index has not been built or does not match the embedder."""
+
+
+def get_embedding_settings():
+    """Return the embedding settings merged over the defaults."""
+    defaults = {
+        'BACKEND': 'ollama',
+        'MODEL': 'nomic-embed-text',
+        'DIMENSIONS': 256,
+        'INDEX_DIR': os.path.join(settings.BASE_DIR, 'var', 'embeddings'),
+        'TIMEOUT': 30,
+    }
+    defaults.update(getattr(settings, 'EMBEDDINGS', {}))
+    return defaults
+
+
+def normalize(vector):
+    """Return the vector as unit-length float32 so dot product equals cosine similarity."""
+    vector = np.asarray(vector, dtype=VECTOR_DTYPE)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class OllamaEmbedder:
+    """Embeds text through the Ollama embeddings API."""
+
+    def __init__(self, model, timeout=30):
+        self.model = model
+        self.timeout = timeout
+
+    def embed(self, text):
+        response = get_ollama_pool().post(
+            "/api/embeddings",
+            model=self.model,
+            json={"model": self.model, "prompt": text, "keep_alive": keep_alive()},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        return normalize(response.json()["embedding"])
+
+
+class HashingEmbedder:
+    """
+    Deterministic local embedder based on the hashing trick.
+
+    Words and word bigrams are hashed into a fixed number of signed buckets.
+    It needs no model server, which makes it suitable for tests.
+    """
+
+    def __init__(self, dimensions=256):
+        self.dimensions = dimensions
+        self.model = f'hashing-{dimensions}'
+
+    def _bucket(self, feature):
+        digest = hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest()
+        value = int.from_bytes(digest, 'little')
+        return value % self.dimensions, 1.0 if value >> 63 else -1.0
+
+    def embed(self, text):
+        vector = np.zeros(self.dimensions, dtype=VECTOR_DTYPE)
+        tokens = TOKEN_RE.findall(text.lower())
+        features = tokens + [f'{a} {b}' for a, b in zip(tokens, tokens[1:])]
+        for feature in features:
+            index, sign = self._bucket(feature)
+            vector[index] += sign
+        return normalize(vector)
+
+
+def get_embedder():
+    """Return the embedder configured in ``settings.EMBEDDINGS``."""
+    conf = get_embedding_settings()
+    if conf['BACKEND'] == 'hashing':
+        return HashingEmbedder(conf['DIMENSIONS'])
+    return OllamaEmbedder(conf['MODEL'], timeout=conf['TIMEOUT'])
+
+
+def book_embedding_text(book):
+    """Text that represents a book in embedding space."""
+    parts = [book.title, f"by {book.author}"]
+    if book.genre:
+        parts.append(book.genre)
+    parts.append(book.description)
+    return "\n".join(parts)
+
+
+def embed_books(books, embedder, force=False):
+    """
+    Create or refresh embeddings for the given books.
+
+    Books whose text and model are unchanged since the last run are skipped
+    unless ``force`` is set. Returns the number of books embedded.
+    """
+    from books.models import BookEmbedding
+
+    embedded = 0
+    for book in books.select_related('embedding'):
+        text = book_embedding_text(book)
+        digest = content_hash(text)
+        current = getattr(book, 'embedding', None)
+        if not force and current and current.content_hash == digest and current.model == embedder.model:
+            continue
+
+        vector = embedder.embed(text)
+        BookEmbedding.objects.update_or_create(
+            book=book,
+            defaults={
+                'model': embedder.model,
+                'dimensions': vector.shape[0],
+                'vector': vector.astype(VECTOR_DTYPE).tobytes(),
+                'content_hash': digest,
+            }
+        )
+        embedded += 1
+    return embedded
+
+
+class VectorIndex:
+    """
+    Brute-force cosine similarity index over a memory-mapped float32 matrix.
+
+    Each version directory holds ``vectors.npy`` (n x d), ``ids.npy`` (n) and
+    ``meta.json``; ``CURRENT`` names the live one. An exact matrix-vector product stays in the low
+    milliseconds for catalogs of a few hundred thousand books.
+    """
+
+    def __init__(self, ids, vectors, meta):
+        self.ids = ids
+        self.vectors = vectors
+        self.meta = meta
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, directory, model):
+        """Export every stored embedding for ``model`` into ``directory``."""
+        from books.models import BookEmbedding
+
+        rows = BookEmbedding.objects.filter(model=model).order_by('book_id').values_list(
+            'book_id', 'dimensions', 'vector'
+        )
+        ids, vectors, dimensions = [], [], None
+        for book_id, dims, blob in rows:
+            if dimensions is None:
+                dimensions = dims
+            if dims != dimensions:
+                logger.warning(f"Skipping embedding of book {book_id}: {dims}d != {dimensions}d")
+                continue
+            ids.append(book_id)
+            vectors.append(np.frombuffer(bytes(blob), dtype=VECTOR_DTYPE))
+
+        dimensions = dimensions or 0
+        matrix = np.vstack(vectors) if vectors else np.zeros((0, dimensions), dtype=VECTOR_DTYPE)
+        meta = {'model': model, 'dimensions': dimensions, 'count': len(ids)}
+
+        directory = Path(directory)
+        version = f'v{time.time_ns()}'
+        target = directory / version
+        target.mkdir(parents=True)
+        np.save(target / 'ids.npy', np.asarray(ids, dtype='<i8'))
+        np.save(target / 'vectors.npy', matrix)
+        (target / 'meta.json').write_text(json.dumps(meta))
+
+        # Readers switch to the complete new version with a single rename.
+        tmp = directory / f'{CURRENT_NAME}.tmp'
+        tmp.write_text(version)
+        os.replace(tmp, directory / CURRENT_NAME)
+        cls._prune(directory)
+        return cls.load(directory)
+
+    @staticmethod
+    def _prune(directory):
+        """Delete all but the ``KEEP_VERSIONS`` most recent versions; workers keep theirs mapped."""
+        versions = sorted(path for path in directory.glob('v*') if path.is_dir())
+        for path in versions[:-KEEP_VERSIONS]:
+            shutil.rmtree(path, ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory):
+        directory = Path(directory)
+        try:
+            target = directory / (directory / CURRENT_NAME).read_text().strip()
+            meta = json.loads((target / 'meta.json').read_text())
+            ids = np.load(target / 'ids.npy', mmap_mode='r')
+            vectors = np.load(target / 'vectors.npy', mmap_mode='r')
+        except FileNotFoundError as e:
+            raise IndexUnavailable(f"Semantic index not found in {directory}") from e
+        return cls(ids, vectors, meta)
+
+    def search(self, query, k=10):
+        """Return up to ``k`` ``(book_id, score)`` pairs, best match first."""
+        if not len(self):
+            return []
+        query = normalize(query)
+        if query.shape[0] != self.vectors.shape[1]:
+            raise IndexUnavailable("Query embedding does not match the index dimensions")
+
+        scores = self.vectors @ query
+        k = min(k, scores.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(int(self.ids[i]), float(scores[i])) for i in top]
+
+
+_index_lock = threading.Lock()
+_index_cache = {}
+
+
+def get_index():
+    """
+    Return the shared index, reloading it when a build switches ``CURRENT``.
+
+    The mtime check costs a single ``stat`` per search.
+    """
+    directory = Path(get_embedding_settings()['INDEX_DIR'])
+    try:
+        mtime = (directory / CURRENT_NAME).stat().st_mtime_ns
+    except FileNotFoundError as e:
+        raise IndexUnavailable(f"Semantic index not found in {directory}") from e
+
+    key = (str(directory), mtime)
+    with _index_lock:
+        if _index_cache.get('key') != key:
+            _index_cache['index'] = VectorIndex.load(directory)
+            _index_cache['key'] = key
+        return _index_cache['index']
+
+
+def semantic_search(query, k=10):
+    """Embed ``query`` with the configured embedder and return the top ``k`` matches."""
+    index = get_index()
+    embedder = get_embedder()
+    if index.meta.get('model') != embedder.model:
+        raise IndexUnavailable(
+            f"Index was built with {index.meta.get('model')}, but the embedder is {embedder.model}"
+        )
+    return index.search(embedder.embed(query), k=k)
@@ -0,0 +1,158 @@
+"""
+Keeps the summary and embedding models loaded on every Ollama server.
+
+Ollama unloads a model ``keep_alive`` after the last request that used it
+and the next request pays the load, which takes seconds to tens of seconds
+for a 7B model. ``ModelKeeper`` loads the managed models on each backend
+when a web process starts and then checks every ``CHECK_SECONDS``:
+
+* a model missing from the backend's ``/api/ps`` (unloaded, or the server
+  restarted) is loaded again with an empty prompt, which loads without
+  generating;
+* a loaded model that has not served a request for ``PING_SECONDS`` gets
+  the same empty request, renewing its ``keep_alive``.
+
+All model requests carry ``keep_alive`` (see ``ollama_pool.keep_alive``),
+so ``PING_SECONDS`` plus ``CHECK_SECONDS`` only has to stay below
+``KEEP_ALIVE_SECONDS``. Summary samples record Ollama's ``load_duration``,
+and ``manage.py summary_route_report`` shows cold starts apart from warm
+latency.
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+
+import requests
+from django.conf import settings
+
+from books.api.v1.embeddings import get_embedding_settings
+from books.api.v1.ollama_pool import get_ollama_pool, keep_alive, normalize_model
+from books.api.v1.utils import DEFAULT_SUMMARY_ROUTES
+
+logger = logging.getLogger(__name__)
+
+
+def get_lifecycle_settings():
+    """Return the model lifecycle settings merged over the defaults."""
+    defaults = {
+        # Start a ModelKeeper in each web process (see book_management.wsgi).
+        'ENABLED': True,
+        # Generation models to keep loaded; None means every model in SUMMARY_ROUTES.
+        'MODELS': None,
+        'CHECK_SECONDS': 30,
+        'PING_SECONDS': 600,
+        'WARMUP_TIMEOUT': 300,
+        # Samples whose model load took longer than this count as cold starts.
+        'COLD_LOAD_MS': 500,
+    }
+    defaults.update(getattr(settings, 'OLLAMA_LIFECYCLE', {}))
+    return defaults
+
+
+def managed_models(conf=None):
+    """``{model: endpoint}`` of the models to keep loaded, including the embedding model."""
+    conf = conf or get_lifecycle_settings()
+    names = conf['MODELS']
+    if names is None:
+        routes = getattr(settings, 'SUMMARY_ROUTES', None) or DEFAULT_SUMMARY_ROUTES
+        names = [route['model'] for route in routes]
+    models = {normalize_model(name): '/api/generate' for name in names}
+    embeddings = get_embedding_settings()
+    if embeddings['BACKEND'] == 'ollama':
+        models.setdefault(normalize_model(embeddings['MODEL']), '/api/embeddings')
+    return models
+
+
+@dataclass
+class ModelUpkeep:
+    """What the keeper did for one model on one backend."""
+    loads: int = 0
+    pings: int = 0
+    failures: int = 0
+    last_load_ms: float = None
+
+
+class ModelKeeper:
+    """Loads the managed models on every backend of a pool and keeps them resident."""
+
+    def __init__(self, pool=None, models=None, conf=None):
+        self.conf = conf or get_lifecycle_settings()
+        self.pool = pool or get_ollama_pool()
+        self.models = models if models is not None else managed_models(self.conf)
+        self.upkeep = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def load(self, backend, model, endpoint):
+        """Send ``model`` an empty request on ``backend``; return how long it took in seconds."""
+        body = {'model': model, 'prompt': '', 'keep_alive': keep_alive()}
+        if endpoint == '/api/generate':
+            body['stream'] = False
+        started = time.perf_counter()
+        response = self.pool.send(
+            backend, 'POST', endpoint, model=model, json=body, timeout=self.conf['WARMUP_TIMEOUT']
+        )
+        response.raise_for_status()
+        return time.perf_counter() - started
+
+    def check(self):
+        """Load the models missing from each backend and renew the ones left idle."""
+        for backend in self.pool.backends:
+            now = time.monotonic()
+            if backend.is_ejected(now):
+                continue
+            self.pool.refresh_loaded_models(backend, now)
+            for model, endpoint in self.models.items():
+                loaded = backend.has_model(model, now)
+                if loaded and now - backend.used_at.get(model, float('-inf')) < self.conf['PING_SECONDS']:
+                    continue
+                upkeep = self.upkeep.setdefault((backend.url, model), ModelUpkeep())
+                try:
+                    seconds = self.load(backend, model, endpoint)
+                except requests.exceptions.RequestException as e:
+                    upkeep.failures += 1
+                    logger.warning(f"Could not load {model} on {backend.url}: {e}")
+                    continue
+                if loaded:
+                    upkeep.pings += 1
+                else:
+                    upkeep.loads += 1
+                    upkeep.last_load_ms = seconds * 1000
+                    logger.info(f"Loaded {model} on {backend.url} in {seconds * 1000:.0f}ms")
+        return self.upkeep
+
+    def run(self):
+        while not self._stop.is_set():
+            try:
+                self.check()
+            except Exception:
+                logger.exception("Model upkeep failed")
+            self._stop.wait(self.conf['CHECK_SECONDS'])
+
+    def start(self):
+        """Check now and then every ``CHECK_SECONDS`` in a daemon thread."""
+        self._thread = threading.Thread(target=self.run, name='ollama-model-keeper', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+_keeper_lock = threading.Lock()
+_keeper = None
+
+
+def start_model_keeper():
+    """Start the process-wide keeper once, if ``OLLAMA_LIFECYCLE['ENABLED']``; return it or None."""
+    global _keeper
+    if not get_lifecycle_settings()['ENABLED']:
+        return None
+    with _keeper_lock:
+        if _keeper is None:
+            _keeper = ModelKeeper().start()
+        return _keeper
@@ -0,0 +1,148 @@
+"""
+Several API calls in one HTTP round trip.
+
+A page that needs a book, its summary, its reviews and the user's
+recommendations otherwise pays one network round trip per call, which
+dominates load time on high-latency mobile connections. ``run_subrequests``
+resolves each sub-request to its view and calls it directly in the current
+thread, so they share the outer request's database connection and deadline.
+The outer request is authenticated once and sub-requests reuse its user and
+token instead of decoding the JWT again.
+
+Sub-requests bypass the middleware stack (compression, profiling, deadlines
+are applied once, to the outer request) but not DRF: permissions,
+throttles and validation run as usual. Database routing follows the
+sub-requests, so a batch of reads is served by the replicas.
+"""
+
+import logging
+from io import BytesIO
+from urllib.parse import urlsplit
+
+import orjson
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework import serializers, status
+from rest_framework.response import Response
+
+from books.db_routers import get_routing_state
+from books.deadlines import DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+SUBREQUEST_METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+
+
+def get_max_subrequests():
+    return getattr(settings, 'MAX_MULTIPLEX_REQUESTS', 20)
+
+
+class SubRequestSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(choices=SUBREQUEST_METHODS, default='GET')
+    path = serializers.CharField()
+    body = serializers.JSONField(required=False)
+
+    def validate_path(self, path):
+        if not path.startswith('/'):
+            raise serializers.ValidationError("Must be an absolute path, e.g. '/books/api/v1/books/1/'.")
+        return path
+
+
+class MultiplexSerializer(serializers.Serializer):
+    requests = SubRequestSerializer(many=True, allow_empty=False)
+
+    def validate_requests(self, requests):
+        limit = get_max_subrequests()
+        if len(requests) > limit:
+            raise serializers.ValidationError(f"At most {limit} requests per call.")
+        return requests
+
+
+def build_subrequest(request, method, path, body=None):
+    """An ``HttpRequest`` for one sub-request, carrying the outer request's identity."""
+    url = urlsplit(path)
+    payload = b'' if body is None else orjson.dumps(body)
+
+    sub = HttpRequest()
+    sub.method = method
+    sub.path = sub.path_info = url.path
+    sub.META = {
+        **request.META,
+        'REQUEST_METHOD': method,
+        'PATH_INFO': url.path,
+        'QUERY_STRING': url.query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(payload)),
+        'HTTP_ACCEPT': 'application/json',
+    }
+    sub.GET = QueryDict(url.query)
+    sub.COOKIES = request.COOKIES
+    sub._stream = BytesIO(payload)
+    sub._read_started = False
+    # DRF uses these instead of running the authentication classes again.
+    sub.user = request.user
+    sub._force_auth_user = request.user
+    sub._force_auth_token = request.auth
+    return sub
+
+
+def response_body(response):
+    """The JSON-compatible body of a sub-response."""
+    if isinstance(response, Response):
+        return response.data
+    content = b''.join(response.streaming_content) if response.streaming else response.content
+    if not content:
+        return None
+    try:
+        return orjson.loads(content)
+    except orjson.JSONDecodeError:
+        return content.decode(response.charset or 'utf-8', errors='replace')
+
+
+def run_subrequests(request, items, exclude_view=None):
+    """
+    Run ``items`` (validated ``SubRequestSerializer`` data) in order.
+
+    Returns one ``{"status", "body"}`` per item. A sub-request failing, even
+    with an exception, does not stop the others; as with separate calls,
+    there is no transaction across them. ``exclude_view`` is the
+    multiplexing view itself, which cannot be nested.
+    """
+    routing = get_routing_state()
+    if routing is not None:
+        routing.start_batch()
+
+    results = []
+    for item in items:
+        sub = build_subrequest(request, item['method'], item['path'], item.get('body'))
+        try:
+            match = resolve(sub.path_info)
+        except Resolver404:
+            results.append({'status': status.HTTP_404_NOT_FOUND, 'body': {'detail': 'Not found.'}})
+            continue
+        if exclude_view is not None and getattr(match.func, 'view_class', None) is exclude_view:
+            results.append({'status': status.HTTP_400_BAD_REQUEST, 'body': {'detail': 'Requests cannot be nested.'}})
+            continue
+
+        sub.resolver_match = match
+        if routing is not None:
+            routing.route_subrequest(item['method'])
+        try:
+            response = match.func(sub, *match.args, **match.kwargs)
+        except DeadlineExceeded:
+            # The whole call is out of time; the outer request answers 504.
+            raise
+        except Http404:
+            results.append({'status': status.HTTP_404_NOT_FOUND, 'body': {'detail': 'Not found.'}})
+            continue
+        except PermissionDenied:
+            results.append({'status': status.HTTP_403_FORBIDDEN, 'body': {'detail': 'Permission denied.'}})
+            continue
+        except Exception:
+            logger.exception(f"Sub-request {item['method']} {item['path']} failed")
+            results.append({'status': status.HTTP_500_INTERNAL_SERVER_ERROR, 'body': {'detail': 'Server error.'}})
+            continue
+        results.append({'status': response.status_code, 'body': response_body(response)})
+    return results
@@ -0,0 +1,247 @@
+"""
+Client-side load balancing over a pool of Ollama servers.
+
+Requests go to the healthy backend with the fewest requests in flight,
+preferring backends that already have the requested model loaded so that
+no request pays a model load while a warm server is available. Backends
+that keep failing are ejected for a cool-down period, and connection
+failures are retried on the next backend.
+"""
+
+import logging
+import random
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from books.deadlines import clamp_timeout
+
+logger = logging.getLogger(__name__)
+
+
+def get_pool_settings():
+    """Return the Ollama pool settings merged over the defaults."""
+    defaults = {
+        'EJECT_AFTER_FAILURES': 3,
+        'EJECT_SECONDS': 30,
+        'KEEP_ALIVE_SECONDS': 1800,
+        # How long a model is assumed to stay loaded after a request; defaults to KEEP_ALIVE_SECONDS.
+        'MODEL_RESIDENCY_SECONDS': None,
+        'PS_REFRESH_SECONDS': 30,
+        'PS_TIMEOUT': 2,
+        'MAX_WARM_IMBALANCE': 2,
+    }
+    defaults.update(getattr(settings, 'OLLAMA_POOL', {}))
+    if defaults['MODEL_RESIDENCY_SECONDS'] is None:
+        defaults['MODEL_RESIDENCY_SECONDS'] = defaults['KEEP_ALIVE_SECONDS']
+    return defaults
+
+
+def keep_alive():
+    """
+    The ``keep_alive`` to send with model requests, in seconds.
+
+    Ollama unloads a model this long after the last request that used it;
+    a request without it resets the timer to the server default (5 minutes).
+    """
+    return get_pool_settings()['KEEP_ALIVE_SECONDS']
+
+
+def normalize_model(name):
+    """Ollama reports ``mistral`` as ``mistral:latest``; compare on the tagged form."""
+    return name if ':' in name else f'{name}:latest'
+
+
+def build_session():
+    """Session for pool traffic: failover is handled by the pool, so no status retries."""
+    session = requests.Session()
+    adapter = HTTPAdapter(max_retries=Retry(total=1, connect=1, read=0, status=0, backoff_factor=0.2))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class OllamaBackend:
+    """Routing state of one Ollama server."""
+
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+        self.outstanding = 0
+        self.failures = 0
+        self.ejected_until = 0.0
+        self.loaded_models = {}
+        self.models_checked_at = None
+        self.used_at = {}
+
+    def __repr__(self):
+        return f"<OllamaBackend {self.url} outstanding={self.outstanding}>"
+
+    def is_ejected(self, now):
+        return self.ejected_until > now
+
+    def has_model(self, model, now):
+        return self.loaded_models.get(normalize_model(model), 0) > now
+
+
+class OllamaPool:
+    """Least-outstanding-requests balancer with ejection and model-aware placement."""
+
+    def __init__(self, urls, session=None, conf=None):
+        if not urls:
+            raise ValueError("OllamaPool needs at least one backend URL")
+        self.backends = [OllamaBackend(url) for url in urls]
+        self.session = session or build_session()
+        self.conf = conf or get_pool_settings()
+        self._lock = threading.Lock()
+
+    def refresh_loaded_models(self, backend, now=None):
+        """Ask a backend which models it has in memory (``GET /api/ps``)."""
+        now = now if now is not None else time.monotonic()
+        backend.models_checked_at = now
+        try:
+            response = self.session.get(f"{backend.url}/api/ps", timeout=self.conf['PS_TIMEOUT'])
+            response.raise_for_status()
+            models = response.json().get('models', [])
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.debug(f"Could not list loaded models on {backend.url}: {e}")
+            return
+        resident_until = now + self.conf['MODEL_RESIDENCY_SECONDS']
+        backend.loaded_models = {
+            normalize_model(item.get('model') or item.get('name', '')): resident_until for item in models
+        }
+
+    def _refresh_stale(self, now):
+        for backend in self.backends:
+            checked = backend.models_checked_at
+            if not backend.is_ejected(now) and (checked is None or now - checked > self.conf['PS_REFRESH_SECONDS']):
+                self.refresh_loaded_models(backend, now)
+
+    def choose(self, model=None, exclude=()):
+        """Reserve the best backend for a request, or return None if all were excluded."""
+        now = time.monotonic()
+        if model is not None:
+            self._refresh_stale(now)
+
+        with self._lock:
+            candidates = [b for b in self.backends if b not in exclude]
+            if not candidates:
+                return None
+            healthy = [b for b in candidates if not b.is_ejected(now)]
+            if not healthy:
+                # Everything is ejected: probe the backend whose cool-down ends first.
+                healthy = [min(candidates, key=lambda b: b.ejected_until)]
+
+            least = min(b.outstanding for b in healthy)
+            pool = healthy
+            if model is not None:
+                warm = [b for b in healthy if b.has_model(model, now)]
+                if warm and min(b.outstanding for b in warm) <= least + self.conf['MAX_WARM_IMBALANCE']:
+                    pool = warm
+            least = min(b.outstanding for b in pool)
+            backend = random.choice([b for b in pool if b.outstanding == least])
+            backend.outstanding += 1
+            return backend
+
+    def release(self, backend, ok, model=None):
+        """Return a reserved backend, updating its health and model residency."""
+        now = time.monotonic()
+        with self._lock:
+            backend.outstanding -= 1
+            if ok:
+                backend.failures = 0
+                backend.ejected_until = 0.0
+                if model is not None:
+                    backend.loaded_models[normalize_model(model)] = now + self.conf['MODEL_RESIDENCY_SECONDS']
+                    backend.used_at[normalize_model(model)] = now
+                return
+            backend.failures += 1
+            if backend.failures >= self.conf['EJECT_AFTER_FAILURES']:
+                backend.ejected_until = now + self.conf['EJECT_SECONDS']
+                backend.failures = 0
+                logger.warning(f"Ejecting Ollama backend {backend.url} for {self.conf['EJECT_SECONDS']}s")
+
+    def is_warm(self, model):
+        """Whether ``model`` is known to be loaded on a backend that is not ejected."""
+        now = time.monotonic()
+        return any(not b.is_ejected(now) and b.has_model(model, now) for b in self.backends)
+
+    def send(self, backend, method, path, model=None, **kwargs):
+        """
+        Send a request to ``backend`` itself rather than the best one, for
+        upkeep that must reach every server, such as loading a model.
+        """
+        with self._lock:
+            backend.outstanding += 1
+        try:
+            response = self.session.request(method, f"{backend.url}{path}", **kwargs)
+        except requests.exceptions.RequestException:
+            self.release(backend, ok=False)
+            raise
+        self.release(backend, ok=response.status_code < 500, model=model if 200 <= response.status_code < 300 else None)
+        return response
+
+    def request(self, method, path, model=None, **kwargs):
+        """
+        Send a request to the best backend.
+
+        Connection errors and 5xx answers are retried once on each other
+        backend; timeouts are not, since the first server may still be
+        working on the request. Each attempt's timeout is cut to what is left
+        of the request deadline.
+        """
+        tried = []
+        last_error = None
+        last_response = None
+        while True:
+            if kwargs.get('timeout') is not None:
+                kwargs['timeout'] = clamp_timeout(kwargs['timeout'])
+            backend = self.choose(model, exclude=tried)
+            if backend is None:
+                break
+            tried.append(backend)
+            try:
+                response = self.session.request(method, f"{backend.url}{path}", **kwargs)
+            except requests.exceptions.ConnectionError as e:
+                self.release(backend, ok=False)
+                logger.warning(f"Ollama backend {backend.url} unreachable: {e}")
+                last_error = e
+                continue
+            except requests.exceptions.RequestException:
+                self.release(backend, ok=False)
+                raise
+
+            # A 4xx (e.g. an unknown model) is not the server's fault, but only
+            # a successful answer shows that the model is loaded there.
+            ok = response.status_code < 500
+            self.release(backend, ok=ok, model=model if 200 <= response.status_code < 300 else None)
+            if ok:
+                return response
+            last_response = response
+
+        if last_response is not None:
+            return last_response
+        raise last_error
+
+    def get(self, path, model=None, **kwargs):
+        return self.request('GET', path, model=model, **kwargs)
+
+    def post(self, path, model=None, **kwargs):
+        return self.request('POST', path, model=model, **kwargs)
+
+
+_pool_lock = threading.Lock()
+_pool = None
+
+
+def get_ollama_pool():
+    """Return the process-wide pool for ``settings.OLLAMA_BACKENDS``."""
+    global _pool
+    urls = tuple(getattr(settings, 'OLLAMA_BACKENDS', None) or ["http://ollama:11434"])
+    with _pool_lock:
+        if _pool is None or tuple(b.url for b in _pool.backends) != tuple(u.rstrip('/') for u in urls):
+            _pool = OllamaPool(urls)
+        return _pool
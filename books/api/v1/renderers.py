@@ -0,0 +1,68 @@
+"""
+Renderers for the Book Management API.
+"""
+
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+_encoder = JSONEncoder()
+
+
+def dumps(data):
+    """Compact JSON bytes, identical to what ``JSONRenderer`` produces by default."""
+    ret = orjson.dumps(data, default=_encoder.default, option=ORJSON_OPTIONS)
+    # Match JSONRenderer, which escapes these so the output is valid JavaScript.
+    if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+        ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return ret
+
+
+def iter_json_array(items, buffer_size=64 * 1024):
+    """
+    Encode an iterable as a JSON array, yielding it in pieces of about ``buffer_size`` bytes.
+
+    Each element is encoded as soon as it is produced, so neither the list
+    nor its encoding has to be held in memory in full. The concatenated
+    output equals ``dumps(list(items))``.
+    """
+    buffer = [b'[']
+    size = 1
+    for index, item in enumerate(items):
+        chunk = dumps(item)
+        if index:
+            buffer.append(b',')
+        buffer.append(chunk)
+        size += len(chunk) + 1
+        if size >= buffer_size:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    buffer.append(b']')
+    yield b''.join(buffer)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    Drop-in replacement for ``JSONRenderer`` built on orjson.
+
+    Compact output is byte-for-byte identical to DRF's: values orjson does not
+    handle natively (datetimes, decimals, lazy strings) go through DRF's own
+    encoder. Indented output, as requested by the browsable API, is left to
+    the stock renderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        indent = self.get_indent(accepted_media_type, renderer_context)
+        if indent is not None or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            return dumps(data)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
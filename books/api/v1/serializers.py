@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from books.api.v1.trending import record_review, remove_review
 from books.models import Book, Review
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
@@ -30,6 +31,15 @@ class ReviewSerializer(serializers.ModelSerializer):
             validated_data['user'] = request.user
         return super().create(validated_data)
 
+    def update(self, instance, validated_data):
+        previous_book_id = instance.book_id
+        review = super().update(instance, validated_data)
+        if review.book_id != previous_book_id:
+            # The review's activity now counts for its new book.
+            remove_review(previous_book_id, review.created_at)
+            record_review(review.book_id, review.created_at)
+        return review
+
 class BookSerializer(serializers.ModelSerializer):
     average_rating = serializers.FloatField(read_only=True)
     review_count = serializers.IntegerField(read_only=True)
@@ -39,6 +49,12 @@ class BookSerializer(serializers.ModelSerializer):
         fields = ('id', 'title', 'author', 'description', 'rating', 'average_rating', 'review_count', 'created_at', 'updated_at')
         read_only_fields = ('created_at', 'updated_at')
 
+class BookSearchResultSerializer(BookSerializer):
+    score = serializers.FloatField(read_only=True)
+
+    class Meta(BookSerializer.Meta):
+        fields = BookSerializer.Meta.fields + ('score',)
+
 class BookSummarySerializer(serializers.ModelSerializer):
     average_rating = serializers.FloatField()
     review_count = serializers.IntegerField()
@@ -0,0 +1,149 @@
+"""
+Single-flight coalescing of expensive calls such as summary generation.
+
+Concurrent callers asking for the same key share one execution. Threads in
+the same worker wait on an in-process event; other worker processes
+coordinate through a ``SummaryLease`` row: the first caller inserts it and
+runs the call, everyone else polls the row until the result is published
+or the lease expires (for example because its owner crashed).
+
+Waiters of either kind give up at their own request deadline, not the
+lease's. A leader that runs out of its budget fails alone: its waiters,
+which may have more time left, run the call themselves.
+"""
+
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from books.deadlines import DeadlineExceeded, check_deadline, deadline_scope, remaining
+from books.models import SummaryLease
+
+
+def get_single_flight_settings():
+    """Return the single-flight settings merged over the defaults."""
+    defaults = {
+        'LEASE_TTL': 300,
+        'RESULT_TTL': 10,
+        'POLL_INTERVAL': 0.25,
+        'RETENTION': 3600,
+    }
+    defaults.update(getattr(settings, 'SUMMARY_SINGLE_FLIGHT', {}))
+    return defaults
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Run at most one call per key at a time, sharing its result with duplicates."""
+
+    LEADER, WAITING, DONE = 'leader', 'waiting', 'done'
+
+    def __init__(self, namespace):
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """Return ``fn()``, or the result of an identical call already in flight."""
+        key = f'{self.namespace}:{key}'
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+            if leader:
+                break
+
+            if not call.done.wait(remaining()):
+                raise DeadlineExceeded()
+            if isinstance(call.error, DeadlineExceeded):
+                # The leader's deadline, not ours: try again while we have time.
+                check_deadline()
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._do_shared(key, fn)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _do_shared(self, key, fn):
+        conf = get_single_flight_settings()
+        owner = uuid.uuid4().hex
+        while True:
+            state, result = self._try_lead(key, owner, conf)
+            if state == self.LEADER:
+                break
+            if state == self.DONE:
+                return result
+            left = remaining()
+            time.sleep(conf['POLL_INTERVAL'] if left is None else max(0.0, min(conf['POLL_INTERVAL'], left)))
+            check_deadline()
+
+        try:
+            result = fn()
+        except Exception:
+            # Release the lease even when the request ran out of time, so waiters can take over.
+            with deadline_scope(None):
+                SummaryLease.objects.filter(key=key, owner=owner).delete()
+            raise
+
+        now = timezone.now()
+        SummaryLease.objects.filter(key=key, owner=owner).update(
+            result=result,
+            completed_at=now,
+            expires_at=now + timedelta(seconds=conf['RESULT_TTL'])
+        )
+        return result
+
+    def _try_lead(self, key, owner, conf):
+        now = timezone.now()
+        lease_expiry = now + timedelta(seconds=conf['LEASE_TTL'])
+        try:
+            with transaction.atomic():
+                SummaryLease.objects.create(key=key, owner=owner, expires_at=lease_expiry)
+        except IntegrityError:
+            pass
+        else:
+            SummaryLease.objects.filter(
+                expires_at__lt=now - timedelta(seconds=conf['RETENTION'])
+            ).delete()
+            return self.LEADER, None
+
+        lease = SummaryLease.objects.filter(key=key).first()
+        if lease is None:
+            # Released between our insert and read; retry on the next poll.
+            return self.WAITING, None
+        if lease.expires_at > now:
+            if lease.completed_at is not None:
+                return self.DONE, lease.result
+            return self.WAITING, None
+
+        # The lease is stale, or its result too old to share: take it over.
+        taken = SummaryLease.objects.filter(
+            key=key, owner=lease.owner, expires_at=lease.expires_at
+        ).update(owner=owner, expires_at=lease_expiry, result=None, completed_at=None)
+        return (self.LEADER, None) if taken else (self.WAITING, None)
+
+
+summary_flight = SingleFlight('summary')
@@ -0,0 +1,200 @@
+"""
+Background precomputation of book summaries, driven by description changes.
+
+Saving a book compares the hash of its description with
+``Book.summary_source_hash``, the hash of the text its summary was generated
+from. Only on a mismatch is a ``SummaryJob`` scheduled. Edits in quick
+succession push the job back by ``DEBOUNCE_SECONDS``, but never more than
+``MAX_DELAY_SECONDS`` past the first edit, so a burst of edits costs a
+single generation. ``manage.py run_summary_jobs`` runs due jobs. It always
+summarizes the description current at that moment, and it stores the
+result only if the description did not change meanwhile.
+
+Reads only ever see the stored summary; nothing on the read path calls the
+LLM.
+"""
+
+import logging
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from books.api.v1.singleflight import summary_flight
+from books.api.v1.utils import PRIORITY_BATCH, content_hash, generate_summary
+from books.models import Book, SummaryJob
+
+logger = logging.getLogger(__name__)
+
+JOB_DONE = 'done'
+JOB_SKIPPED = 'skipped'
+JOB_RETRY = 'retry'
+
+
+def get_summary_job_settings():
+    """Return the summary precomputation settings merged over the defaults."""
+    defaults = {
+        'ENABLED': True,
+        'DEBOUNCE_SECONDS': 30,
+        'MAX_DELAY_SECONDS': 300,
+        'LEASE_SECONDS': 600,
+        'RETRY_SECONDS': 60,
+        'MAX_RETRY_SECONDS': 3600,
+        'BATCH_SIZE': 10,
+        'POLL_SECONDS': 5,
+    }
+    defaults.update(getattr(settings, 'SUMMARY_PRECOMPUTE', {}))
+    return defaults
+
+
+class SummaryUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "The summary could not be generated right now; it will be generated in the background."
+    default_code = 'summary_unavailable'
+
+
+def summary_is_current(book):
+    return bool(book.summary) and book.summary_source_hash == content_hash(book.description)
+
+
+def schedule_summaries(books, delay=None, conf=None):
+    """
+    Schedule summaries for the books whose description differs from the one last summarized.
+
+    Costs one query to read the pending jobs and one to write each of new
+    and changed jobs, however many books are passed. Returns how many jobs
+    were created or moved.
+    """
+    conf = conf or get_summary_job_settings()
+    if not conf['ENABLED']:
+        return 0
+    stale = {}
+    for book in books:
+        if not book.description:
+            continue
+        digest = content_hash(book.description)
+        if digest != book.summary_source_hash or not book.summary:
+            stale[book.pk] = digest
+    if not stale:
+        return 0
+
+    now = timezone.now()
+    run_after = now + timedelta(seconds=conf['DEBOUNCE_SECONDS'] if delay is None else delay)
+    max_delay = timedelta(seconds=conf['MAX_DELAY_SECONDS'])
+    jobs = SummaryJob.objects.in_bulk(list(stale), field_name='book_id')
+    created, moved = [], []
+    for book_id, digest in stale.items():
+        job = jobs.get(book_id)
+        if job is None:
+            created.append(SummaryJob(book_id=book_id, content_hash=digest, requested_at=now, run_after=run_after))
+        elif job.content_hash != digest:
+            # Debounce: wait for the edits to settle, but not past the cap set by the first one.
+            job.content_hash = digest
+            job.run_after = min(run_after, job.requested_at + max_delay)
+            job.attempts = 0
+            job.last_error = ''
+            moved.append(job)
+    if created:
+        # A concurrent save may insert the same book's job first; it summarizes the current text either way.
+        SummaryJob.objects.bulk_create(created, ignore_conflicts=True)
+    if moved:
+        SummaryJob.objects.bulk_update(moved, ['content_hash', 'run_after', 'attempts', 'last_error'])
+    return len(created) + len(moved)
+
+
+def schedule_stale_summaries(queryset=None, chunk_size=1000):
+    """Schedule every book (of ``queryset``) without a current summary to run now; returns how many were scheduled."""
+    scheduled = 0
+    chunk = []
+    queryset = Book.objects.all() if queryset is None else queryset
+    books = queryset.only('id', 'description', 'summary', 'summary_source_hash').order_by('pk')
+    for book in books.iterator(chunk_size=chunk_size):
+        chunk.append(book)
+        if len(chunk) >= chunk_size:
+            scheduled += schedule_summaries(chunk, delay=0)
+            chunk = []
+    return scheduled + schedule_summaries(chunk, delay=0)
+
+
+def store_summary(book_id, description, summary):
+    """
+    Store a summary generated from ``description`` unless the description has
+    changed since; returns whether it was stored.
+    """
+    digest = content_hash(description)
+    stored = Book.objects.filter(pk=book_id, description=description).update(
+        summary=summary,
+        summary_source_hash=digest,
+        updated_at=timezone.now()
+    )
+    if stored:
+        SummaryJob.objects.filter(book_id=book_id, content_hash=digest, locked_until__isnull=True).delete()
+    return bool(stored)
+
+
+def summarize_book(book, priority=PRIORITY_BATCH, slot=None):
+    """
+    Generate and store the summary of the book's current description.
+
+    Concurrent calls for the same book and text share one generation. LLM
+    errors propagate, so a failure is never stored as the summary.
+    ``slot`` is an optional context manager factory held around the LLM
+    call, such as the admission control slot for interactive requests.
+    """
+    description = book.description
+
+    def run():
+        if slot is not None:
+            with slot():
+                summary = generate_summary(description, priority=priority, raise_errors=True)
+        else:
+            summary = generate_summary(description, priority=priority, raise_errors=True)
+        store_summary(book.pk, description, summary)
+        return summary
+
+    return summary_flight.do(f"book-{book.pk}-{content_hash(description)}", run)
+
+
+def claim_due_jobs(limit, conf=None):
+    """Lease up to ``limit`` due jobs to this worker, oldest first."""
+    conf = conf or get_summary_job_settings()
+    now = timezone.now()
+    free = Q(locked_until__isnull=True) | Q(locked_until__lt=now)
+    candidates = SummaryJob.objects.filter(free, run_after__lte=now).order_by('run_after').values_list('pk', flat=True)
+    lease = now + timedelta(seconds=conf['LEASE_SECONDS'])
+    # The conditional update fails for a job another worker claimed since it was listed.
+    claimed = [pk for pk in candidates[:limit] if SummaryJob.objects.filter(free, pk=pk).update(locked_until=lease)]
+    return list(SummaryJob.objects.filter(pk__in=claimed).select_related('book').order_by('run_after'))
+
+
+def run_summary_job(job, conf=None):
+    """Run one claimed job; returns ``JOB_DONE``, ``JOB_SKIPPED`` or ``JOB_RETRY``."""
+    conf = conf or get_summary_job_settings()
+    book = job.book
+    outcome = JOB_SKIPPED
+    if not summary_is_current(book):
+        try:
+            summarize_book(book)
+            outcome = JOB_DONE
+        except requests.exceptions.RequestException as e:
+            delay = min(conf['RETRY_SECONDS'] * 2 ** job.attempts, conf['MAX_RETRY_SECONDS'])
+            logger.warning(f"Summary of book {book.pk} failed (attempt {job.attempts + 1}), retrying in {delay}s: {e}")
+            SummaryJob.objects.filter(pk=job.pk).update(
+                attempts=job.attempts + 1,
+                last_error=str(e)[:1000],
+                run_after=timezone.now() + timedelta(seconds=delay),
+                locked_until=None
+            )
+            return JOB_RETRY
+
+    # If the book was edited while the LLM was busy, the summary was not stored and the job stays for the new text.
+    book.refresh_from_db(fields=['description', 'summary', 'summary_source_hash'])
+    if summary_is_current(book):
+        SummaryJob.objects.filter(pk=job.pk).delete()
+    else:
+        SummaryJob.objects.filter(pk=job.pk).update(locked_until=None)
+    return outcome
@@ -0,0 +1,194 @@
+"""
+Admission control for the LLM-backed API actions.
+
+Summary generation is slow and bound by a single model server, so these
+actions are guarded twice: a per-user token bucket (exposed as a DRF
+throttle, answering 429) and a global cap on in-flight LLM calls with a
+bounded wait queue (answering 503 once the queue is full). Both keep their
+state in the Django cache, so the limits are shared across gunicorn workers
+whenever a shared cache backend is configured.
+
+A queued request holds a sync worker, so it waits at most ``QUEUE_TIMEOUT``
+and never more than ``QUEUE_BUDGET_SHARE`` of its remaining deadline; past
+that it is better answered 503 with ``Retry-After`` than kept waiting.
+"""
+
+import math
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.throttling import BaseThrottle
+
+from books.deadlines import check_deadline, remaining
+
+
+def get_admission_settings():
+    """Return the LLM admission settings merged over the defaults."""
+    defaults = {
+        'MAX_CONCURRENT': 2,
+        'MAX_QUEUE': 4,
+        'QUEUE_TIMEOUT': 5,
+        # Queued requests also give up after this share of their remaining deadline.
+        'QUEUE_BUDGET_SHARE': 0.25,
+        'SLOT_TTL': 300,
+        'POLL_INTERVAL': 0.1,
+        'RETRY_AFTER': 10,
+        'USER_BURST': 5,
+        'USER_RATE_PER_MINUTE': 6,
+        'CACHE_ALIAS': 'default',
+        # How long a request waits for another request of the same user to update its bucket.
+        'BUCKET_LOCK_WAIT': 0.5,
+    }
+    defaults.update(getattr(settings, 'LLM_ADMISSION', {}))
+    return defaults
+
+
+@contextmanager
+def cache_lock(cache, key, wait, timeout=1, poll=0.005):
+    """
+    Hold ``key`` as a lock, claimed with the atomic ``cache.add``; yield whether it was acquired.
+
+    The key expires after ``timeout`` seconds, so a worker killed while
+    holding it blocks others only briefly.
+    """
+    token = uuid.uuid4().hex
+    give_up_at = time.monotonic() + wait
+    acquired = cache.add(key, token, timeout=timeout)
+    while not acquired and time.monotonic() < give_up_at:
+        time.sleep(poll)
+        acquired = cache.add(key, token, timeout=timeout)
+    try:
+        yield acquired
+    finally:
+        if acquired and cache.get(key) == token:
+            cache.delete(key)
+
+
+class LLMOverloaded(APIException):
+    """Raised when the LLM wait queue is full or a queued request gives up."""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'The summary service is busy. Please retry later.'
+    default_code = 'llm_overloaded'
+
+    def __init__(self, wait, detail=None):
+        super().__init__(detail)
+        self.wait = wait
+
+
+class LLMUserRateThrottle(BaseThrottle):
+    """
+    Token-bucket quota for LLM actions, keyed on the authenticated user.
+
+    Each user may burst up to ``USER_BURST`` requests, refilled at
+    ``USER_RATE_PER_MINUTE``. Anonymous callers fall back to their client IP.
+    The bucket is read and written under a per-key ``cache_lock``, so
+    concurrent requests of one user cannot both spend the same token.
+    """
+    cache_format = 'throttle_llm_%s'
+
+    def __init__(self):
+        self.conf = get_admission_settings()
+        self.cache = caches[self.conf['CACHE_ALIAS']]
+        self._wait = None
+
+    def get_cache_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return self.cache_format % f'user_{request.user.pk}'
+        return self.cache_format % f'ip_{self.get_ident(request)}'
+
+    def allow_request(self, request, view):
+        capacity = float(self.conf['USER_BURST'])
+        rate = float(self.conf['USER_RATE_PER_MINUTE']) / 60.0
+        key = self.get_cache_key(request)
+
+        with cache_lock(self.cache, f'{key}_lock', self.conf['BUCKET_LOCK_WAIT']) as locked:
+            if not locked:
+                # Only a burst of this user's own requests holds the lock this long.
+                self._wait = self.conf['BUCKET_LOCK_WAIT']
+                return False
+            now = time.time()
+            tokens, stamp = self.cache.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - stamp) * rate)
+            if tokens < 1:
+                self._wait = (1 - tokens) / rate
+                return False
+            self.cache.set(key, (tokens - 1, now), timeout=math.ceil(capacity / rate))
+        return True
+
+    def wait(self):
+        return self._wait
+
+
+class AdmissionController:
+    """
+    Global cap on concurrent LLM calls with a bounded wait queue.
+
+    Every in-flight call and every waiter owns a numbered cache key claimed
+    with ``cache.add``, which is atomic on all Django cache backends. The keys
+    expire on their own, so a worker killed mid-request cannot leak capacity.
+    """
+
+    def __init__(self, name='llm', conf=None):
+        self.name = name
+        self.conf = conf or get_admission_settings()
+        self.cache = caches[self.conf['CACHE_ALIAS']]
+
+    def _claim(self, kind, count, ttl):
+        token = uuid.uuid4().hex
+        for index in range(count):
+            key = f'admission_{self.name}_{kind}_{index}'
+            if self.cache.add(key, token, timeout=ttl):
+                return key, token
+        return None
+
+    def _release(self, claim):
+        key, token = claim
+        # Only drop the key if it is still ours; it may have expired and been
+        # claimed by another request in the meantime.
+        if self.cache.get(key) == token:
+            self.cache.delete(key)
+
+    def _acquire(self):
+        conf = self.conf
+        slot = self._claim('slot', conf['MAX_CONCURRENT'], conf['SLOT_TTL'])
+        if slot is not None:
+            return slot
+
+        ticket = self._claim('queue', conf['MAX_QUEUE'], math.ceil(conf['QUEUE_TIMEOUT']) + 1)
+        if ticket is None:
+            raise LLMOverloaded(wait=conf['RETRY_AFTER'])
+
+        try:
+            wait = conf['QUEUE_TIMEOUT']
+            left = remaining()
+            if left is not None:
+                wait = min(wait, max(0.0, left) * conf['QUEUE_BUDGET_SHARE'])
+            give_up_at = time.monotonic() + wait
+            while time.monotonic() < give_up_at:
+                time.sleep(conf['POLL_INTERVAL'])
+                check_deadline()
+                slot = self._claim('slot', conf['MAX_CONCURRENT'], conf['SLOT_TTL'])
+                if slot is not None:
+                    return slot
+        finally:
+            self._release(ticket)
+        raise LLMOverloaded(wait=conf['RETRY_AFTER'])
+
+    @contextmanager
+    def slot(self):
+        """Hold one LLM slot for the duration of the block."""
+        claim = self._acquire()
+        try:
+            yield
+        finally:
+            self._release(claim)
+
+
+def llm_slot():
+    """Context manager guarding a single call to the LLM service."""
+    return AdmissionController().slot()
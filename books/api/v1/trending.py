@@ -0,0 +1,121 @@
+"""
+"Trending now": books ranked by exponentially time-decayed review activity.
+
+A review written at time ``t`` contributes ``exp(-(now - t) / tau)`` to its
+book's score, so activity loses half its weight every ``HALF_LIFE_HOURS``.
+Decaying every stored score as time passes would mean a periodic rewrite of
+the whole table. Forward decay avoids it: relative to a fixed landmark ``L``
+each review contributes ``exp((t - L) / tau)``, a number that never changes,
+and the current score is that sum times ``exp(-(now - L) / tau)``, a factor
+shared by every book. The ranking can therefore be read straight from the
+stored sums through an index, and a new review adds one term in O(1).
+
+The sums grow without bound, so ``BookTrendingScore`` stores their natural
+log and adds a review with a log-sum-exp in a single ``UPDATE``, which
+never overflows. Deleting a review, or moving it to another book, takes its
+term back out with the matching log-diff-exp.
+"""
+
+import math
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Abs, Exp, Greatest, Least, Ln
+from django.utils import timezone
+
+from books.models import BookTrendingScore, Review
+
+# Changing the landmark invalidates stored scores; run backfill_trending_scores afterwards.
+LANDMARK = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+# exp(-700) is the smallest power of e a double represents without underflow errors on PostgreSQL.
+MIN_EXPONENT = -700.0
+
+
+def get_tau():
+    """Decay time constant in seconds."""
+    half_life_hours = getattr(settings, 'TRENDING', {}).get('HALF_LIFE_HOURS', 72)
+    return half_life_hours * 3600 / math.log(2)
+
+
+def log_weight(when, tau=None):
+    """Log of the forward-decayed weight of an event at ``when``."""
+    return (when - LANDMARK).total_seconds() / (tau or get_tau())
+
+
+def decayed_score(log_score, now=None, tau=None):
+    """Current score, i.e. the number of reviews discounted by their age."""
+    now = now or timezone.now()
+    return math.exp(log_score - log_weight(now, tau))
+
+
+def record_review(book_id, created_at):
+    """Add a review written at ``created_at`` to the book's score with one atomic statement."""
+    point = Value(log_weight(created_at), output_field=BookTrendingScore._meta.get_field('log_score'))
+    # log(e^a + e^b) = max(a, b) + log(1 + e^-|a - b|)
+    log_sum = Greatest(F('log_score'), point) + Ln(
+        1 + Exp(Greatest(-Abs(F('log_score') - point), Value(MIN_EXPONENT)))
+    )
+    updates = {'log_score': log_sum, 'last_review_at': Greatest(F('last_review_at'), Value(created_at))}
+    if BookTrendingScore.objects.filter(book_id=book_id).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            BookTrendingScore.objects.create(book_id=book_id, log_score=point.value, last_review_at=created_at)
+    except IntegrityError:
+        # Another review of the same book created the row first.
+        BookTrendingScore.objects.filter(book_id=book_id).update(**updates)
+
+
+def remove_review(book_id, created_at):
+    """
+    Take a review written at ``created_at`` back out of the book's score.
+
+    A book left without reviews loses its score row; otherwise one
+    ``UPDATE`` subtracts the review's term.
+    """
+    if not Review.objects.filter(book_id=book_id).exists():
+        BookTrendingScore.objects.filter(book_id=book_id).delete()
+        return
+    point = Value(log_weight(created_at), output_field=BookTrendingScore._meta.get_field('log_score'))
+    # log(e^a - e^b) = a + log(1 - e^(b - a)); rounding can put b at or above a, so the
+    # difference is clamped at e^MIN_EXPONENT rather than reaching log(0).
+    log_difference = F('log_score') + Ln(Greatest(
+        1 - Exp(Greatest(Least(point - F('log_score'), Value(0.0)), Value(MIN_EXPONENT))),
+        Value(math.exp(MIN_EXPONENT))
+    ))
+    BookTrendingScore.objects.filter(book_id=book_id).update(log_score=log_difference)
+
+
+def top_trending(k):
+    """``(book_id, log_score)`` of the ``k`` highest-scoring books, read from the score index."""
+    return list(BookTrendingScore.objects.order_by('-log_score').values_list('book_id', 'log_score')[:k])
+
+
+def backfill_scores():
+    """
+    Recompute every score from the reviews table.
+
+    Only needed once, for reviews written before scores were maintained or
+    after moving ``LANDMARK``; new reviews keep the scores current.
+    """
+    tau = get_tau()
+    scores = {}
+    for book_id, created_at in Review.objects.values_list('book_id', 'created_at').iterator():
+        point = log_weight(created_at, tau)
+        current = scores.get(book_id)
+        if current is None:
+            scores[book_id] = [point, created_at]
+        else:
+            high, low = max(current[0], point), min(current[0], point)
+            current[0] = high + math.log1p(math.exp(max(low - high, MIN_EXPONENT)))
+            current[1] = max(current[1], created_at)
+
+    with transaction.atomic():
+        BookTrendingScore.objects.all().delete()
+        BookTrendingScore.objects.bulk_create(
+            BookTrendingScore(book_id=book_id, log_score=log_score, last_review_at=last_review_at)
+            for book_id, (log_score, last_review_at) in scores.items()
+        )
+    return len(scores)
@@ -12,6 +12,8 @@ from rest_framework_simplejwt.views import (
 )
 from books.api.v1.views import (
     BookViewSet,
+    ChangeFeedView,
+    MultiplexView,
     ReviewViewSet,
     CustomTokenObtainPairView
 )
@@ -24,6 +26,8 @@ router.register(r'reviews', ReviewViewSet)
 # 
 urlpatterns = [
     path('', include(router.urls)),
+    path('changes/', ChangeFeedView.as_view(), name='change-feed'),
+    path('multi/', MultiplexView.as_view(), name='multiplex'),
     path('token/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('token/verify/', TokenVerifyView.as_view(), name='token_verify'),
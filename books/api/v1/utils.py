@@ -1,66 +1,181 @@
+import hashlib
 import requests
 import logging
 import time
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+from dataclasses import dataclass
+from django.conf import settings
+from django.db import DatabaseError, transaction
+
+from books.api.v1.ollama_pool import get_ollama_pool, keep_alive
+from books.deadlines import check_deadline, clamp_timeout, deadline_scope, remaining
 
-OLLAMA_API_URL = "http://ollama:11434"
 logger = logging.getLogger(__name__)
 
-# Configure retry strategy
-retry_strategy = Retry(
-    total=3,  # number of retries
-    backoff_factor=1,  # wait 1, 2, 4 seconds between retries
-    status_forcelist=[500, 502, 503, 504]  # HTTP status codes to retry on
-)
-adapter = HTTPAdapter(max_retries=retry_strategy)
-http = requests.Session()
-http.mount("http://", adapter)
-http.mount("https://", adapter)
-
-def generate_summary(text):
-    """Generate a summary using Ollama API."""
+def content_hash(text):
+    """Return the SHA-256 hex digest of a piece of text."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+PRIORITY_INTERACTIVE = 'interactive'
+PRIORITY_BATCH = 'batch'
+
+DEFAULT_SUMMARY_ROUTES = [
+    {
+        'name': 'default',
+        'model': 'mistral',
+        'max_input_chars': None,
+        'min_tokens': 150,
+        'max_tokens': 150,
+        'tokens_per_1k_chars': 0,
+        'temperature': 0.7,
+        'timeout': 180,
+    },
+]
+
+@dataclass(frozen=True)
+class SummaryRoute:
+    """Model and generation budget chosen for one summary request."""
+    name: str
+    model: str
+    num_predict: int
+    temperature: float
+    timeout: float
+    priority: str
+
+def route_summary_request(text, priority=PRIORITY_INTERACTIVE):
+    """
+    Pick a model and token budget for summarizing ``text``.
+
+    Routes from ``settings.SUMMARY_ROUTES`` are tried in order; the first one
+    whose ``max_input_chars`` fits the text and whose ``priorities`` (if set)
+    include the caller's priority wins. The output budget grows with the
+    input: ``min_tokens`` plus ``tokens_per_1k_chars`` per thousand input
+    characters, capped at ``max_tokens``.
+    """
+    routes = getattr(settings, 'SUMMARY_ROUTES', None) or DEFAULT_SUMMARY_ROUTES
+    length = len(text)
+    for rule in routes:
+        if rule.get('max_input_chars') is not None and length > rule['max_input_chars']:
+            continue
+        if rule.get('priorities') and priority not in rule['priorities']:
+            continue
+        break
+    else:
+        rule = routes[-1]
+
+    budget = rule['min_tokens'] + length * rule.get('tokens_per_1k_chars', 0) / 1000
+    return SummaryRoute(
+        name=rule['name'],
+        model=rule['model'],
+        num_predict=int(min(max(budget, rule['min_tokens']), rule['max_tokens'])),
+        temperature=rule.get('temperature', 0.7),
+        timeout=rule.get('timeout', 180),
+        priority=priority,
+    )
+
+def record_route_sample(route, text, latency, result=None):
+    """Store the latency of one routed generation; never fails the caller."""
+    from books.models import SummaryRouteSample
+
+    # Ollama reports how long it spent loading the model, in nanoseconds.
+    load_duration = (result or {}).get('load_duration')
+    load_ms = load_duration / 1e6 if load_duration is not None else None
+    logger.info(
+        f"Summary route={route.name} model={route.model} chars={len(text)} "
+        f"num_predict={route.num_predict} latency={latency * 1000:.0f}ms "
+        f"load={'-' if load_ms is None else f'{load_ms:.0f}ms'} success={result is not None}"
+    )
+    try:
+        with transaction.atomic():
+            SummaryRouteSample.objects.create(
+                route=route.name,
+                model=route.model,
+                priority=route.priority,
+                input_chars=len(text),
+                num_predict=route.num_predict,
+                output_tokens=(result or {}).get('eval_count'),
+                latency_ms=latency * 1000,
+                load_ms=load_ms,
+                success=result is not None,
+            )
+    except DatabaseError as e:
+        logger.warning(f"Could not record summary route sample: {e}")
+
+SUMMARY_INSTRUCTION = "Please provide a concise summary of the following text:"
+
+def generate_summary(text, priority=PRIORITY_INTERACTIVE, instruction=SUMMARY_INSTRUCTION, raise_errors=False):
+    """
+    Generate a summary using Ollama API, routed by input length and caller priority.
+
+    ``instruction`` is placed before the text in the prompt. Failures are
+    returned as a user-facing message, or re-raised if ``raise_errors`` is
+    set, for callers that store the result.
+    """
+    route = route_summary_request(text, priority)
     try:
-        # First, check if Ollama service is available
-        max_health_retries = 3
+        # First, check if Ollama service is available; not needed when a
+        # server just answered with the model loaded (see model_lifecycle)
+        max_health_retries = 0 if get_ollama_pool().is_warm(route.model) else 3
         health_check_timeout = 30  # increased from 10 to 30 seconds
         
         for attempt in range(max_health_retries):
             try:
-                health_check = http.get(f"{OLLAMA_API_URL}/api/tags", timeout=health_check_timeout)
+                health_check = get_ollama_pool().get("/api/tags", timeout=clamp_timeout(health_check_timeout))
                 if health_check.status_code == 200:
                     logger.info("Ollama service is healthy")
                     break
             except requests.exceptions.RequestException as e:
-                if attempt == max_health_retries - 1:
-                    logger.error(f"Health check failed after {max_health_retries} attempts: {e}")
+                left = remaining()
+                # Stop retrying once the request deadline leaves no time for the backoff.
+                if attempt == max_health_retries - 1 or (left is not None and left <= 2 ** attempt):
+                    check_deadline()
+                    if raise_errors:
+                        raise
+                    logger.error(f"Health check failed after {attempt + 1} attempts: {e}")
                     return "Failed to connect to Ollama service. Please try again in a few moments."
                 logger.warning(f"Health check attempt {attempt + 1} failed, retrying...")
                 time.sleep(2 ** attempt)  # exponential backoff
 
         # Generate summary using Ollama
-        response = http.post(
-            f"{OLLAMA_API_URL}/api/generate",
-            json={
-                "model": "mistral",
-                "prompt": f"Please provide a concise summary of the following text:\n\n{text}",
-                "stream": False,
-                "temperature": 0.7,  # Add some temperature for more natural responses
-                "max_tokens": 150  # Limit response length for faster generation
-            },
-            timeout=180  # 3 minutes should be enough with max_tokens limit
-        )
-        response.raise_for_status()
-        result = response.json()
+        start = time.perf_counter()
+        result = None
+        try:
+            response = get_ollama_pool().post(
+                "/api/generate",
+                model=route.model,
+                json={
+                    "model": route.model,
+                    "prompt": f"{instruction}\n\n{text}",
+                    "stream": False,
+                    "keep_alive": keep_alive(),
+                    "options": {
+                        "temperature": route.temperature,
+                        "num_predict": route.num_predict,
+                    },
+                },
+                timeout=clamp_timeout(route.timeout)
+            )
+            response.raise_for_status()
+            result = response.json()
+        finally:
+            with deadline_scope(None):
+                record_route_sample(route, text, time.perf_counter() - start, result)
         logger.info("Successfully generated summary")
         return result.get("response", "No summary available.")
 
     except requests.exceptions.ConnectionError as e:
         logger.error(f"Connection error: {e}")
+        if raise_errors:
+            raise
         return "Failed to connect to Ollama service. Please ensure the service is running."
     except requests.exceptions.Timeout as e:
         logger.error(f"Timeout error: {e}")
+        # A timeout cut short by the request deadline is the caller's 504, not a summary.
+        check_deadline()
+        if raise_errors:
+            raise
         return "Request timed out. Please try again with a shorter text or contact support if the issue persists."
     except requests.exceptions.RequestException as e:
         logger.error(f"Request error: {e}")
+        if raise_errors:
+            raise
         return "An error occurred while generating the summary. Please try again later."
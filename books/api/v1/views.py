@@ -5,22 +5,46 @@ This module provides ViewSets for managing books and reviews through the REST AP
 including features like book summaries, recommendations, and review management.
 """
 
+from itertools import chain, islice
+
+import requests
 from rest_framework import viewsets, status, mixins
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView
+from django.conf import settings
 from django.db.models import Avg, Count
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 
-from books.models import Book, Review
+from books.db_routers import set_request_user
+from books.models import Book, BookReviewDigest, Review
 from books.api.v1.serializers import (
     BookSerializer,
     ReviewSerializer,
     BookSummarySerializer,
     BookRecommendationSerializer,
+    BookSearchResultSerializer,
     CustomTokenObtainPairSerializer
 )
-from books.api.v1.utils import generate_summary
+from books.api.v1.autocomplete import get_autocomplete_index
+from books.api.v1.batch import BookBatchSerializer, apply_book_batch
+from books.api.v1.catalog import get_catalog_snapshot
+from books.api.v1.changes import CursorExpired, InvalidCursor, read_changes
+from books.api.v1.duplicates import DuplicateBook, DuplicateCheck
+from books.api.v1.multiplex import MultiplexSerializer, run_subrequests
+from books.api.v1.renderers import ORJSONRenderer, iter_json_array
+from books.api.v1.row_serializers import BookRowSerializer, ReviewRowSerializer
+from books.api.v1.utils import PRIORITY_INTERACTIVE, content_hash, generate_summary
+from books.api.v1.embeddings import IndexUnavailable, semantic_search
+from books.api.v1.singleflight import summary_flight
+from books.api.v1.summary_jobs import SummaryUnavailable, summarize_book, summary_is_current
+from books.api.v1.throttling import LLMUserRateThrottle, llm_slot
+from books.api.v1.trending import decayed_score, top_trending
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     """
@@ -39,12 +63,70 @@ class BaseBookViewSet(mixins.CreateModelMixin,
     """Base ViewSet with common functionality."""
     permission_classes = [IsAuthenticated]
 
-class BookViewSet(BaseBookViewSet):
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Reads after a recent write by this user must see it, so let the router know who is asking.
+        set_request_user(request.user)
+
+    def filter_queryset(self, queryset):
+        """Restrict lists to ``?ids=1,2,3`` when given, fetched with a single ``id__in`` query."""
+        queryset = super().filter_queryset(queryset)
+        ids = self.request.query_params.get('ids')
+        if self.action != 'list' or ids is None:
+            return queryset
+        return queryset.filter(pk__in=self.parse_ids(ids)).order_by('pk')
+
+    def parse_ids(self, value):
+        limit = getattr(settings, 'MAX_BULK_IDS', 500)
+        try:
+            ids = {int(part) for part in value.split(',') if part.strip()}
+        except ValueError:
+            raise ValidationError({"ids": "Must be a comma-separated list of integers."})
+        if len(ids) > limit:
+            raise ValidationError({"ids": f"At most {limit} ids per request."})
+        return ids
+
+class FastReadMixin:
+    """
+    Opt-in fast path for list responses.
+
+    Viewsets that set ``row_serializer_class`` serve ``list`` from ``values()``
+    rows rendered with orjson, skipping model instantiation and per-field
+    serializer calls. The JSON produced is identical to the regular path.
+    Lists longer than ``STREAMING_LIST_THRESHOLD`` rows are streamed, encoding
+    each element as it is read from the database.
+    """
+    row_serializer_class = None
+    renderer_classes = [ORJSONRenderer, BrowsableAPIRenderer]
+
+    def list(self, request, *args, **kwargs):
+        if self.row_serializer_class is None or self.paginator is not None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.row_list_response(queryset, self.row_serializer_class())
+
+    def row_list_response(self, queryset, row_serializer):
+        """Serialize ``queryset`` with a row serializer, streaming large results."""
+        if not isinstance(self.request.accepted_renderer, ORJSONRenderer):
+            return Response(row_serializer.serialize(queryset))
+
+        threshold = getattr(settings, 'STREAMING_LIST_THRESHOLD', 1000)
+        rows = row_serializer.iter_rows(queryset)
+        head = list(islice(rows, threshold))
+        if len(head) < threshold:
+            return Response(head)
+        return StreamingHttpResponse(
+            iter_json_array(chain(head, rows)),
+            content_type=self.request.accepted_renderer.media_type
+        )
+
+class BookViewSet(FastReadMixin, BaseBookViewSet):
     """
     ViewSet for managing books.
     """
     queryset = Book.objects.all()
     serializer_class = BookSerializer
+    row_serializer_class = BookRowSerializer
 
     def get_queryset(self):
         """Add aggregated fields to queryset."""
@@ -53,22 +135,54 @@ class BookViewSet(BaseBookViewSet):
             review_count=Count('reviews')
         )
 
-    @action(detail=True, methods=['post'])
+    def create(self, request, *args, **kwargs):
+        try:
+            response = super().create(request, *args, **kwargs)
+        except DuplicateBook as exc:
+            return Response({"detail": exc.detail, "duplicates": exc.duplicates}, status=exc.status_code)
+        if self.possible_duplicates:
+            response['X-Possible-Duplicates'] = ','.join(str(match['id']) for match in self.possible_duplicates)
+        return response
+
+    def perform_create(self, serializer):
+        # Partner imports tend to re-create existing books under slightly different titles.
+        self.possible_duplicates = DuplicateCheck()(serializer.validated_data)
+        super().perform_create(serializer)
+
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """Apply a list of create/update/delete operations in one transaction."""
+        envelope = BookBatchSerializer(data=request.data)
+        envelope.is_valid(raise_exception=True)
+        applied, results = apply_book_batch(
+            envelope.validated_data['operations'],
+            self.get_serializer_class(),
+            context=self.get_serializer_context(),
+            check_duplicates=DuplicateCheck()
+        )
+        return Response(
+            {"applied": applied, "results": results},
+            status=status.HTTP_200_OK if applied else status.HTTP_400_BAD_REQUEST
+        )
+
+    @action(detail=True, methods=['post'], throttle_classes=[LLMUserRateThrottle])
     def generate_summary(self, request, **_):
-        """Generate a summary for the book using AI."""
+        """Generate a summary for the book using AI, unless the stored one is current."""
         book = self.get_object()
-        summary = generate_summary(book.description)
-        book.summary = summary
-        book.save()
+        if summary_is_current(book):
+            return Response({"summary": book.summary})
+        try:
+            summary = summarize_book(book, priority=PRIORITY_INTERACTIVE, slot=llm_slot)
+        except requests.exceptions.RequestException:
+            # Failures are not stored as the summary; the background job retries.
+            raise SummaryUnavailable()
         return Response({"summary": summary})
 
     @action(detail=True, methods=['get'])
     def reviews(self, request, **_):
         """Get all reviews for a specific book."""
         book = self.get_object()
-        reviews = book.reviews.select_related('user').all()
-        serializer = ReviewSerializer(reviews, many=True)
-        return Response(serializer.data)
+        return self.row_list_response(book.reviews.all(), ReviewRowSerializer())
 
     @action(detail=True, methods=['post'])
     def add_review(self, request, **_):
@@ -97,30 +211,160 @@ class BookViewSet(BaseBookViewSet):
         serializer = BookSummarySerializer(book_with_stats)
         return Response(serializer.data)
 
+    @action(detail=True, methods=['get'])
+    def review_digest(self, request, **_):
+        """Get the digest of what readers say, kept up to date by update_review_digests."""
+        book = self.get_object()
+        digest = BookReviewDigest.objects.filter(book=book).exclude(folded_at=None).first()
+        if digest is None:
+            return Response(
+                {"error": "No review digest has been generated for this book yet"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response({
+            "digest": digest.digest,
+            "review_count": digest.review_count,
+            "last_review_at": digest.last_review_at,
+            "updated_at": digest.folded_at,
+        })
+
     @action(detail=False, methods=['get'])
     def recommendations(self, request):
         """Get personalized book recommendations."""
+        # Candidates come from the in-memory snapshot; only the five winners are loaded.
+        snapshot = get_catalog_snapshot()
         user_reviews = Review.objects.filter(user=request.user)
         if not user_reviews.exists():
-            recommended_books = Book.objects.annotate(
-                average_rating=Avg('reviews__rating'),
-                similarity_score=Avg('rating')
-            ).order_by('-average_rating')[:5]
+            ids = snapshot.query(order_by='-average_rating', limit=5)
         else:
             highly_rated = user_reviews.filter(rating__gte=4).values_list('book', flat=True)
-            recommended_books = Book.objects.exclude(
-                id__in=highly_rated
-            ).annotate(
-                average_rating=Avg('reviews__rating'),
-                similarity_score=Avg('rating')
-            ).filter(
-                average_rating__gte=4
-            ).order_by('-average_rating')[:5]
+            ids = snapshot.query(
+                min_average_rating=4,
+                exclude_ids=list(highly_rated),
+                order_by='-average_rating',
+                limit=5
+            )
 
+        books = Book.objects.in_bulk(ids.tolist())
+        recommended_books = []
+        for book_id in ids.tolist():
+            book = books.get(book_id)
+            if book is not None:
+                book.similarity_score = book.rating
+                recommended_books.append(book)
         serializer = BookRecommendationSerializer(recommended_books, many=True)
         return Response(serializer.data)
 
-    @action(detail=False, methods=['post'])
+    @action(detail=False, methods=['get'])
+    def leaderboard(self, request):
+        """Get the top books by rating or review count, optionally within a genre or author."""
+        order = request.query_params.get('order', 'rating')
+        if order not in ('rating', 'average_rating', 'review_count'):
+            return Response(
+                {"error": "Query parameter 'order' must be 'rating', 'average_rating' or 'review_count'"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+            min_rating = request.query_params.get('min_rating')
+            min_rating = float(min_rating) if min_rating is not None else None
+        except ValueError:
+            return Response(
+                {"error": "Query parameters 'limit' and 'min_rating' must be numbers"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        ids = get_catalog_snapshot().query(
+            genre=request.query_params.get('genre'),
+            author=request.query_params.get('author'),
+            min_rating=min_rating,
+            order_by=f'-{order}',
+            limit=limit
+        ).tolist()
+        books = self.get_queryset().in_bulk(ids)
+        serializer = BookSerializer([books[book_id] for book_id in ids if book_id in books], many=True)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def trending(self, request):
+        """Get the books with the most recent review activity, weighted by recency."""
+        try:
+            k = min(max(int(request.query_params.get('k', 10)), 1), 50)
+        except ValueError:
+            return Response(
+                {"error": "Query parameter 'k' must be an integer"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        top = top_trending(k)
+        books = self.get_queryset().in_bulk([book_id for book_id, _ in top])
+        now = timezone.now()
+        results = []
+        for book_id, log_score in top:
+            book = books.get(book_id)
+            if book is not None:
+                book.score = decayed_score(log_score, now)
+                results.append(book)
+        serializer = BookSearchResultSerializer(results, many=True)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """Suggest books whose title or author words start with ``q``, best rated first."""
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response(
+                {"error": "Query parameter 'q' is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 20)
+        except ValueError:
+            return Response(
+                {"error": "Query parameter 'limit' must be an integer"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        fuzzy = request.query_params.get('fuzzy', '').lower() in ('1', 'true', 'yes')
+
+        matches = get_autocomplete_index().search(query, limit=limit, fuzzy=fuzzy)
+        return Response([
+            {"id": book_id, "title": title, "author": author, "rating": rating, "review_count": review_count}
+            for book_id, title, author, rating, review_count in matches
+        ])
+
+    @action(detail=False, methods=['get'])
+    def semantic_search(self, request):
+        """Find books whose content is semantically closest to a free-text query."""
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response(
+                {"error": "Query parameter 'q' is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            k = min(max(int(request.query_params.get('k', 10)), 1), 100)
+        except ValueError:
+            return Response(
+                {"error": "Query parameter 'k' must be an integer"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            matches = semantic_search(query, k=k)
+        except (IndexUnavailable, requests.exceptions.RequestException) as e:
+            return Response({"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        books = self.get_queryset().in_bulk([book_id for book_id, _ in matches])
+        results = []
+        for book_id, score in matches:
+            book = books.get(book_id)
+            if book is not None:
+                book.score = score
+                results.append(book)
+        serializer = BookSearchResultSerializer(results, many=True)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['post'], throttle_classes=[LLMUserRateThrottle])
     def generate_content_summary(self, request):
         """Generate a summary for given book content."""
         content = request.data.get('content')
@@ -129,15 +373,72 @@ class BookViewSet(BaseBookViewSet):
                 {"error": "Content is required"},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        summary = generate_summary(content)
+
+        def run():
+            with llm_slot():
+                return generate_summary(content)
+
+        summary = summary_flight.do(f"content-{content_hash(content)}", run)
         return Response({"summary": summary})
 
-class ReviewViewSet(BaseBookViewSet):
+class ReviewViewSet(FastReadMixin, BaseBookViewSet):
     """
     ViewSet for managing reviews.
     """
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
+    row_serializer_class = ReviewRowSerializer
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
\ No newline at end of file
+        serializer.save(user=self.request.user)
+
+class ChangeFeedView(APIView):
+    """
+    Book and review changes since a cursor.
+
+    Call without ``cursor`` to start, then pass back the returned ``cursor``
+    until ``has_more`` is false; later calls with the last cursor return only
+    what changed since. A ``410`` means the cursor is too old and the client
+    must copy the catalog again.
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [ORJSONRenderer, BrowsableAPIRenderer]
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get('limit', 0)) or None
+        except ValueError:
+            return Response(
+                {"error": "Query parameter 'limit' must be an integer"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if limit is not None and limit < 1:
+            return Response(
+                {"error": "Query parameter 'limit' must be positive"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            changes, cursor, has_more = read_changes(request.query_params.get('cursor'), limit)
+        except InvalidCursor as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except CursorExpired as e:
+            return Response({"error": str(e)}, status=status.HTTP_410_GONE)
+        return Response({"changes": changes, "cursor": cursor, "has_more": has_more})
+
+class MultiplexView(APIView):
+    """
+    Run several API requests in one round trip.
+
+    ``{"requests": [{"method": "GET", "path": "/books/api/v1/books/1/summary/"}, ...]}``
+    returns ``{"responses": [{"status": 200, "body": {...}}, ...]}`` in the
+    same order. The caller is authenticated once for the whole batch.
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [ORJSONRenderer, BrowsableAPIRenderer]
+
+    def post(self, request):
+        envelope = MultiplexSerializer(data=request.data)
+        envelope.is_valid(raise_exception=True)
+        responses = run_subrequests(request, envelope.validated_data['requests'], exclude_view=MultiplexView)
+        return Response({"responses": responses})
@@ -17,3 +17,6 @@ class BooksConfig(AppConfig):
     """
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'books'
+
+    def ready(self):
+        from books import signals  # noqa: F401
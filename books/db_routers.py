@@ -0,0 +1,129 @@
+"""
+Database routing between the primary and its read replicas.
+
+Reads issued while serving a safe (GET/HEAD/OPTIONS) request go to a
+replica; everything else, including reads inside write requests and work
+done outside a request (management commands, shell), uses the primary. A
+multiplexed call is routed by its sub-requests instead of its own POST.
+
+To give clients read-your-writes consistency despite replication lag, a
+successful write pins the client to the primary for
+``READ_YOUR_WRITES_SECONDS``. The pin is recorded in two places: a cookie,
+which follows browser clients, and an entry keyed on the authenticated user
+in the shared database cache (``CACHES``), which follows the account to
+every worker process and covers token clients that send no cookies. Cache
+entries are always read from the primary, and without replicas no pin is
+kept at all.
+"""
+
+import contextvars
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+
+PRIMARY_DB = 'default'
+# app_label of the model DatabaseCache queries through.
+CACHE_APP_LABEL = 'django_cache'
+PIN_COOKIE = 'db_primary_pin'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_routing_state = contextvars.ContextVar('db_routing_state', default=None)
+
+
+def user_pin_key(user_id):
+    return f'db_primary_pin_user_{user_id}'
+
+
+def get_replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+class RoutingState:
+    """Per-request routing decision, refined once the API user is known."""
+
+    def __init__(self, request):
+        self.is_write = request.method not in SAFE_METHODS
+        self.pinned = PIN_COOKIE in request.COOKIES
+        self.user_id = None
+
+    def set_user(self, user):
+        if user is None or not user.is_authenticated:
+            return
+        self.user_id = user.pk
+        self._check_user_pin()
+
+    def _check_user_pin(self):
+        if self.user_id is not None and not self.pinned and not self.is_write and get_replicas():
+            self.pinned = cache.get(user_pin_key(self.user_id)) is not None
+
+    def start_batch(self):
+        """Route a multiplexed call as reads until one of its sub-requests writes."""
+        self.is_write = False
+        self._check_user_pin()
+
+    def route_subrequest(self, method):
+        """
+        A write sub-request, and everything after it in the batch, uses the
+        primary; the client is then pinned as after any other write.
+        """
+        if method not in SAFE_METHODS:
+            self.is_write = True
+
+    @property
+    def use_primary(self):
+        return self.is_write or self.pinned
+
+
+def get_routing_state():
+    return _routing_state.get()
+
+
+def set_request_user(user):
+    """Tell the router who the API user is; called once DRF has authenticated."""
+    state = _routing_state.get()
+    if state is not None:
+        state.set_user(user)
+
+
+class PrimaryReplicaRouter:
+    """Send safe-method reads to ``settings.DATABASE_REPLICAS`` and the rest to the primary."""
+
+    def db_for_read(self, model, **hints):
+        replicas = get_replicas()
+        state = _routing_state.get()
+        if not replicas or state is None or state.use_primary or model._meta.app_label == CACHE_APP_LABEL:
+            return PRIMARY_DB
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY_DB
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in get_replicas()
+
+
+class ReadReplicaMiddleware:
+    """Establish the routing state for each request and pin clients after writes."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = RoutingState(request)
+        token = _routing_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing_state.reset(token)
+
+        if state.is_write and response.status_code < 400:
+            seconds = getattr(settings, 'READ_YOUR_WRITES_SECONDS', 5)
+            response.set_cookie(PIN_COOKIE, '1', max_age=seconds, httponly=True, samesite='Lax')
+            if state.user_id is not None and get_replicas():
+                cache.set(user_pin_key(state.user_id), 1, timeout=seconds)
+        return response
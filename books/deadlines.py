@@ -0,0 +1,190 @@
+"""
+End-to-end request deadlines.
+
+``DeadlineMiddleware`` gives each request a deadline: the budget the client
+asks for in the ``X-Request-Timeout`` header (capped at ``MAX_SECONDS``),
+else the endpoint's budget from ``REQUEST_DEADLINES['ENDPOINTS']``, else
+``DEFAULT_SECONDS``. The remaining budget is then enforced below the view:
+
+* every database query checks it first, and on PostgreSQL it is applied as
+  ``statement_timeout`` so a slow query is cancelled by the server;
+* Ollama calls clamp their timeouts and stop retrying with ``clamp_timeout``;
+* waits for an LLM slot or for another request's summary give up with it.
+
+Once the budget is spent the request fails with ``DeadlineExceeded`` (504)
+instead of doing work for a client that is no longer waiting. Streaming
+response bodies are generated after the view returns and are not bounded.
+"""
+
+import contextvars
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import OperationalError, connections
+from django.http import JsonResponse
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+_deadline = contextvars.ContextVar('request_deadline', default=None)
+
+
+def get_deadline_settings():
+    """Return the request deadline settings merged over the defaults."""
+    defaults = {
+        'DEFAULT_SECONDS': 30,
+        'MAX_SECONDS': 300,
+        'HEADER': 'X-Request-Timeout',
+        'ENDPOINTS': {},
+        'STATEMENT_TIMEOUT_SLACK_MS': 1000,
+    }
+    defaults.update(getattr(settings, 'REQUEST_DEADLINES', {}))
+    return defaults
+
+
+class DeadlineExceeded(APIException):
+    status_code = status.HTTP_504_GATEWAY_TIMEOUT
+    default_detail = 'The request deadline was exceeded.'
+    default_code = 'deadline_exceeded'
+
+
+def remaining():
+    """Seconds left before the current request's deadline, or None outside a deadline."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def check_deadline():
+    """Raise ``DeadlineExceeded`` if the current request is out of time."""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded()
+
+
+def clamp_timeout(timeout):
+    """Return ``timeout`` cut down to the remaining budget; raise if nothing is left."""
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded()
+    return min(timeout, left)
+
+
+class deadline_scope:
+    """
+    Run a block under a deadline ``seconds`` from now.
+
+    ``deadline_scope(None)`` lifts the deadline, for cleanup that must run
+    even after the request has run out of time.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def __enter__(self):
+        value = None if self.seconds is None else time.monotonic() + self.seconds
+        self._token = _deadline.set(value)
+        return self
+
+    def __exit__(self, *exc_info):
+        _deadline.reset(self._token)
+
+
+class StatementTimeout:
+    """
+    Database execute wrapper enforcing the request deadline.
+
+    On PostgreSQL ``statement_timeout`` is lowered as the budget shrinks.
+    It is only re-sent when the budget has fallen more than
+    ``STATEMENT_TIMEOUT_SLACK_MS`` below the value in effect, so most queries
+    cost no extra round trip; a statement can overrun the deadline by at
+    most that slack.
+    """
+
+    def __init__(self, connection, slack_ms):
+        self.connection = connection
+        self.slack_ms = slack_ms
+        self.applied_ms = None
+
+    def __call__(self, execute, sql, params, many, context):
+        left = remaining()
+        if left is None and self.applied_ms is not None:
+            # Cleanup run outside the deadline (deadline_scope(None)) gets the default timeout back.
+            execute('SET statement_timeout TO DEFAULT', None, False, context)
+            self.applied_ms = None
+        elif left is not None:
+            if left <= 0:
+                raise DeadlineExceeded()
+            if self.connection.vendor == 'postgresql':
+                budget_ms = max(int(left * 1000), 1)
+                if self.applied_ms is None or budget_ms < self.applied_ms - self.slack_ms:
+                    execute(f'SET statement_timeout = {budget_ms}', None, False, context)
+                    self.applied_ms = budget_ms
+        try:
+            return execute(sql, params, many, context)
+        except OperationalError as e:
+            left = remaining()
+            if left is not None and left <= self.slack_ms / 1000:
+                raise DeadlineExceeded() from e
+            raise
+
+    def reset(self):
+        if self.applied_ms is not None and self.connection.connection is not None:
+            try:
+                with self.connection.cursor() as cursor:
+                    cursor.execute('SET statement_timeout TO DEFAULT')
+            except Exception:
+                # Inside an aborted transaction; the connection is discarded or rolled back anyway.
+                self.connection.close_if_unusable_or_obsolete()
+
+
+class DeadlineMiddleware:
+    """Set the request deadline once the view is known and enforce it on every query."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _deadline.set(None)
+        wrappers = []
+        try:
+            with ExitStack() as stack:
+                conf = get_deadline_settings()
+                for alias in connections:
+                    wrapper = StatementTimeout(connections[alias], conf['STATEMENT_TIMEOUT_SLACK_MS'])
+                    stack.enter_context(connections[alias].execute_wrapper(wrapper))
+                    wrappers.append(wrapper)
+                response = self.get_response(request)
+        finally:
+            _deadline.reset(token)
+            for wrapper in wrappers:
+                wrapper.reset()
+        return response
+
+    def get_budget(self, request, conf):
+        match = getattr(request, 'resolver_match', None)
+        budget = conf['ENDPOINTS'].get(match.view_name if match else None, conf['DEFAULT_SECONDS'])
+        requested = request.headers.get(conf['HEADER'])
+        if requested:
+            try:
+                value = float(requested)
+            except ValueError:
+                value = 0
+            if value > 0:
+                budget = min(value, conf['MAX_SECONDS'])
+        # An endpoint configured with None or 0 has no deadline.
+        return budget or None
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        budget = self.get_budget(request, get_deadline_settings())
+        _deadline.set(None if budget is None else time.monotonic() + budget)
+        return None
+
+    def process_exception(self, request, exception):
+        # Views outside DRF (admin, schema) do not turn APIExceptions into responses.
+        if isinstance(exception, DeadlineExceeded):
+            return JsonResponse({'detail': str(exception.detail)}, status=exception.status_code)
+        return None
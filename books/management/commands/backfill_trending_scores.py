@@ -0,0 +1,15 @@
+"""
+Management command that recomputes trending scores from all existing reviews.
+"""
+
+from django.core.management.base import BaseCommand
+
+from books.api.v1.trending import backfill_scores
+
+
+class Command(BaseCommand):
+    help = "Recompute every book's trending score from its reviews (once, after deploying or moving the landmark)."
+
+    def handle(self, *args, **options):
+        count = backfill_scores()
+        self.stdout.write(self.style.SUCCESS(f"Scored {count} book(s)."))
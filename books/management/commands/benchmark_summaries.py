@@ -0,0 +1,213 @@
+"""
+Management command that load-tests the summary path against an Ollama stand-in.
+
+Requests go through ``generate_summary`` end to end: routing, the health
+check, the Ollama pool and the route sample written to the database. By
+default they are served by an in-process ``OllamaStub`` configured from the
+command line; ``--backend`` points them at a running server instead.
+"""
+
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Max
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from books.api.v1.utils import DEFAULT_SUMMARY_ROUTES, PRIORITY_BATCH, PRIORITY_INTERACTIVE, generate_summary
+from books.models import Book, SummaryRouteSample
+from books.ollama_stub import add_stub_arguments, build_stub
+
+WORDS = (
+    'the novel follows a young detective through a city of secrets where every family hides a past '
+    'and the war has changed the people who stayed behind while letters from an old friend reveal '
+    'what really happened on the night the lighthouse went dark'
+).split()
+PERCENTILES = (50, 90, 95, 99)
+
+
+def synthetic_text(chars, rng):
+    words = []
+    length = 0
+    while length < chars:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return ' '.join(words)[:chars]
+
+
+def outcome_of(error):
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return f'http {error.response.status_code}'
+    if isinstance(error, requests.exceptions.Timeout):
+        return 'timeout'
+    if isinstance(error, requests.exceptions.ConnectionError):
+        return 'connection'
+    return type(error).__name__
+
+
+def summarize(samples, wall, workers):
+    """
+    Throughput, latency percentiles and worker occupancy of a run.
+
+    ``samples`` are ``(latency, busy, outcome)`` tuples: latency counts from
+    the scheduled arrival, busy only the time a worker spent on the request.
+    """
+    latencies = sorted(latency for latency, _, _ in samples)
+    ok = [latency for latency, _, outcome in samples if outcome == 'ok']
+    outcomes = {}
+    for _, _, outcome in samples:
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    busy = sum(busy for _, busy, _ in samples)
+    count = len(latencies)
+    return {
+        'requests': count,
+        'outcomes': dict(sorted(outcomes.items())),
+        'wall_seconds': wall,
+        'throughput': count / wall if wall else 0.0,
+        'goodput': len(ok) / wall if wall else 0.0,
+        'latency_ms': {
+            **{f'p{q}': latencies[min(count - 1, int(count * q / 100))] * 1000 for q in PERCENTILES if count},
+            'max': latencies[-1] * 1000 if count else None,
+            'mean': sum(latencies) / count * 1000 if count else None,
+        },
+        'occupancy': busy / (workers * wall) if wall else 0.0,
+        'busy_workers': busy / wall if wall else 0.0,
+    }
+
+
+class Command(BaseCommand):
+    help = "Measure summary throughput, tail latency and worker occupancy against an Ollama stand-in."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100, help="Summaries to generate (default: 100).")
+        parser.add_argument('--concurrency', type=int, default=8, help="Worker threads (default: 8).")
+        parser.add_argument(
+            '--rate', type=float,
+            help="Open loop: Poisson arrivals at this many requests per second. "
+                 "Without it every worker sends its next request as soon as the last one ends."
+        )
+        parser.add_argument('--priority', choices=[PRIORITY_INTERACTIVE, PRIORITY_BATCH], default=PRIORITY_INTERACTIVE)
+        parser.add_argument('--chars', type=int, default=1500, help="Length of the synthetic texts (default: 1500).")
+        parser.add_argument('--from-books', action='store_true', help="Summarize book descriptions instead of synthetic text.")
+        parser.add_argument('--timeout', type=float, help="Override the generation timeout of every summary route.")
+        parser.add_argument('--backend', help="Benchmark this Ollama URL instead of an in-process stub.")
+        parser.add_argument('--keep-samples', action='store_true', help="Keep the route samples the run records.")
+        parser.add_argument('--json', action='store_true', help="Print the results as JSON.")
+        add_stub_arguments(parser)
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError("--requests and --concurrency must be positive.")
+        rng = random.Random(options['seed'])
+        texts = self.texts(options, rng)
+
+        overrides = {}
+        if options['timeout'] is not None:
+            routes = getattr(settings, 'SUMMARY_ROUTES', None) or DEFAULT_SUMMARY_ROUTES
+            overrides['SUMMARY_ROUTES'] = [{**route, 'timeout': options['timeout']} for route in routes]
+
+        stub = None
+        if options['backend']:
+            overrides['OLLAMA_BACKENDS'] = [options['backend']]
+        else:
+            try:
+                stub = build_stub(options).start()
+            except (OSError, ValueError) as e:
+                raise CommandError(str(e))
+            overrides['OLLAMA_BACKENDS'] = [stub.url]
+
+        first_sample = SummaryRouteSample.objects.aggregate(last=Max('pk'))['last'] or 0
+        started_at = timezone.now()
+        try:
+            with override_settings(**overrides):
+                report = self.run(texts, options, rng)
+        finally:
+            if stub is not None:
+                stub.close()
+        if not options['keep_samples']:
+            SummaryRouteSample.objects.filter(pk__gt=first_sample, created_at__gte=started_at).delete()
+
+        report['target'] = overrides['OLLAMA_BACKENDS'][0]
+        report['priority'] = options['priority']
+        report['workers'] = options['concurrency']
+        report['rate'] = options['rate']
+        if stub is not None:
+            report['stub'] = stub.stats.as_dict()
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.print_report(report)
+
+    def texts(self, options, rng):
+        if options['from_books']:
+            texts = list(Book.objects.exclude(description='').values_list('description', flat=True)[:options['requests']])
+            if not texts:
+                raise CommandError("No book has a description; drop --from-books to use synthetic text.")
+            return texts
+        return [synthetic_text(options['chars'], rng) for _ in range(min(options['requests'], 50))]
+
+    def run(self, texts, options, rng):
+        samples = []
+        lock = threading.Lock()
+
+        def call(text, scheduled):
+            start = time.perf_counter()
+            try:
+                generate_summary(text, options['priority'], raise_errors=True)
+                outcome = 'ok'
+            except Exception as e:
+                outcome = outcome_of(e)
+            finally:
+                connection.close()
+            end = time.perf_counter()
+            with lock:
+                samples.append((end - (scheduled if scheduled is not None else start), end - start, outcome))
+
+        began = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            arrival = began
+            for i in range(options['requests']):
+                scheduled = None
+                if options['rate']:
+                    # Arrivals keep their schedule even when every worker is busy, so queueing shows as latency.
+                    arrival += rng.expovariate(options['rate'])
+                    time.sleep(max(0.0, arrival - time.perf_counter()))
+                    scheduled = arrival
+                executor.submit(call, texts[i % len(texts)], scheduled)
+        return summarize(samples, time.perf_counter() - began, options['concurrency'])
+
+    def print_report(self, report):
+        mode = f"open loop at {report['rate']:g} req/s" if report['rate'] else "closed loop"
+        self.stdout.write(
+            f"{report['requests']} {report['priority']} summaries, {report['workers']} workers, {mode}, "
+            f"against {report['target']}"
+        )
+        for outcome, count in report['outcomes'].items():
+            self.stdout.write(f"  {outcome:<12} {count:>6}")
+        self.stdout.write(
+            f"Wall time {report['wall_seconds']:.2f}s, throughput {report['throughput']:.2f} req/s, "
+            f"goodput {report['goodput']:.2f} req/s"
+        )
+        latency = report['latency_ms']
+        self.stdout.write("Latency ms: " + "  ".join(
+            f"{name} {value:.0f}" for name, value in latency.items() if value is not None
+        ))
+        self.stdout.write(
+            f"Worker occupancy {report['occupancy']:.0%} "
+            f"({report['busy_workers']:.1f} of {report['workers']} busy on average)"
+        )
+        if 'stub' in report:
+            stub = report['stub']
+            failures = ', '.join(f"{kind} {count}" for kind, count in stub['failures'].items() if count) or 'none'
+            self.stdout.write(
+                f"Stub: {stub['generate']} generations, peak {stub['max_in_flight']} in flight, "
+                f"peak {stub['max_queued']} queued, {stub['rejected']} rejected, injected failures: {failures}"
+            )
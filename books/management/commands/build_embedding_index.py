@@ -0,0 +1,36 @@
+"""
+Management command that embeds books and rebuilds the semantic search index.
+"""
+
+from django.core.management.base import BaseCommand
+
+from books.api.v1.embeddings import VectorIndex, embed_books, get_embedder, get_embedding_settings
+from books.models import Book
+
+
+class Command(BaseCommand):
+    help = "Embed new or changed books and rebuild the memory-mapped semantic search index."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help="Re-embed every book, even if its text has not changed."
+        )
+        parser.add_argument(
+            '--skip-embedding',
+            action='store_true',
+            help="Only rebuild the index from the embeddings already stored."
+        )
+
+    def handle(self, *args, **options):
+        embedder = get_embedder()
+        if not options['skip_embedding']:
+            count = embed_books(Book.objects.all(), embedder, force=options['force'])
+            self.stdout.write(f"Embedded {count} book(s) with {embedder.model}.")
+
+        directory = get_embedding_settings()['INDEX_DIR']
+        index = VectorIndex.build(directory, embedder.model)
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote index of {len(index)} vector(s) ({index.meta['dimensions']}d) to {directory}."
+        ))
@@ -0,0 +1,25 @@
+"""
+Management command that prebuilds the OpenAPI schema served at /api/schema/.
+"""
+
+from django.core.management.base import BaseCommand
+
+from books.schema import build_schema_artifacts, get_schema_dir
+
+
+class Command(BaseCommand):
+    help = "Generate the OpenAPI schema once and write versioned, precompressed artifacts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--directory',
+            default=None,
+            help="Output directory (defaults to settings.OPENAPI_SCHEMA_DIR)."
+        )
+
+    def handle(self, *args, **options):
+        directory = options['directory'] or get_schema_dir()
+        manifest = build_schema_artifacts(directory)
+        for fmt, entry in manifest['formats'].items():
+            self.stdout.write(f"{fmt}: {entry['files']['identity']} (ETag {entry['etag']})")
+        self.stdout.write(self.style.SUCCESS(f"Wrote OpenAPI schema {manifest['version']} to {directory}."))
@@ -0,0 +1,38 @@
+"""
+Management command that reports clusters of near-duplicate books.
+"""
+
+from django.core.management.base import BaseCommand
+
+from books.api.v1.duplicates import DuplicateIndex, get_duplicate_settings
+from books.models import Book
+
+
+class Command(BaseCommand):
+    help = "Report clusters of near-duplicate books found with MinHash LSH over title, author and description."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            help="Estimated Jaccard similarity above which two books are duplicates "
+                 "(default DUPLICATES['THRESHOLD'])."
+        )
+
+    def handle(self, *args, **options):
+        conf = get_duplicate_settings()
+        threshold = options['threshold'] if options['threshold'] is not None else conf['THRESHOLD']
+        index = DuplicateIndex(conf)
+        index.build()
+        clusters = index.clusters(threshold)
+
+        books = Book.objects.in_bulk([book_id for cluster in clusters for book_id in cluster])
+        for cluster in clusters:
+            self.stdout.write(f"Cluster of {len(cluster)}:")
+            for book_id in cluster:
+                book = books.get(book_id)
+                if book is not None:
+                    self.stdout.write(f"  #{book.pk} {book}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Found {len(clusters)} cluster(s) of near-duplicates among {len(index)} book(s) at {threshold:.2f}."
+        ))
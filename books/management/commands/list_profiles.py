@@ -0,0 +1,86 @@
+"""
+Management command that lists and summarizes stored request profiles.
+"""
+
+import io
+import pstats
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from books.profiling import get_profile_store
+
+
+class Command(BaseCommand):
+    help = "List stored request profiles, summarize them by view, or show one in detail."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--show', metavar='PROFILE_ID', help="Show the hottest functions and slowest queries of a profile.")
+        parser.add_argument('--summary', action='store_true', help="Aggregate stored profiles by view.")
+        parser.add_argument('--limit', type=int, default=20, help="Number of rows to print (default: 20).")
+        parser.add_argument(
+            '--sort',
+            default='cumulative',
+            choices=['cumulative', 'tottime', 'ncalls'],
+            help="pstats sort key used with --show (default: cumulative)."
+        )
+
+    def handle(self, *args, **options):
+        store = get_profile_store()
+        if options['show']:
+            self.show(store, options['show'], options['limit'], options['sort'])
+        elif options['summary']:
+            self.summarize(store.list(), options['limit'])
+        else:
+            self.list_profiles(store.list(), options['limit'])
+
+    def list_profiles(self, records, limit):
+        if not records:
+            self.stdout.write("No profiles stored.")
+            return
+        self.stdout.write(f"{'ID':<25} {'TRIGGER':<7} {'STATUS':>6} {'MS':>10} {'SQL':>5} {'SQL MS':>9}  REQUEST")
+        for record in records[:limit]:
+            self.stdout.write(
+                f"{record['id']:<25} {record['trigger']:<7} {record['status']:>6} "
+                f"{record['duration_ms']:>10.1f} {record['query_count']:>5} "
+                f"{record['query_time_ms']:>9.1f}  {record['method']} {record['path']}"
+            )
+
+    def summarize(self, records, limit):
+        groups = defaultdict(list)
+        for record in records:
+            groups[record['view'] or record['path']].append(record)
+        if not groups:
+            self.stdout.write("No profiles stored.")
+            return
+
+        rows = []
+        for view, items in groups.items():
+            durations = sorted(item['duration_ms'] for item in items)
+            p95 = durations[min(len(durations) - 1, int(len(durations) * 0.95))]
+            queries = sum(item['query_count'] for item in items) / len(items)
+            rows.append((view, len(items), sum(durations) / len(durations), p95, queries))
+        rows.sort(key=lambda row: row[2] * row[1], reverse=True)
+
+        self.stdout.write(f"{'VIEW':<45} {'COUNT':>5} {'AVG MS':>10} {'P95 MS':>10} {'AVG SQL':>8}")
+        for view, count, avg, p95, queries in rows[:limit]:
+            self.stdout.write(f"{view:<45} {count:>5} {avg:>10.1f} {p95:>10.1f} {queries:>8.1f}")
+
+    def show(self, store, profile_id, limit, sort):
+        record = store.get(profile_id)
+        if record is None:
+            raise CommandError(f"Profile {profile_id} not found.")
+
+        self.stdout.write(
+            f"{record['method']} {record['path']} -> {record['status']} in {record['duration_ms']:.1f} ms "
+            f"({record['query_count']} queries, {record['query_time_ms']:.1f} ms in SQL)"
+        )
+
+        output = io.StringIO()
+        stats = pstats.Stats(str(store.stats_path(profile_id)), stream=output)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        self.stdout.write(output.getvalue())
+
+        self.stdout.write("Slowest queries:")
+        for query in sorted(record['queries'], key=lambda q: q['duration_ms'], reverse=True)[:limit]:
+            self.stdout.write(f"  {query['duration_ms']:>9.3f} ms [{query['alias']}] {query['sql']}")
@@ -0,0 +1,20 @@
+"""
+Management command that deletes tombstones older than the change feed retention period.
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from books.api.v1.changes import get_change_feed_settings
+from books.models import Tombstone
+
+
+class Command(BaseCommand):
+    help = "Delete change feed tombstones older than CHANGE_FEED['TOMBSTONE_RETENTION_DAYS']."
+
+    def handle(self, *args, **options):
+        days = get_change_feed_settings()['TOMBSTONE_RETENTION_DAYS']
+        deleted, _ = Tombstone.objects.filter(deleted_at__lt=timezone.now() - timedelta(days=days)).delete()
+        self.stdout.write(f"Deleted {deleted} tombstone(s) older than {days} days.")
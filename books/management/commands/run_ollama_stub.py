@@ -0,0 +1,57 @@
+"""
+Management command that serves a local Ollama stand-in (see books.ollama_stub).
+"""
+
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from books.ollama_stub import Cassette, add_stub_arguments, build_stub
+
+
+class Command(BaseCommand):
+    help = "Serve recorded Ollama generations with synthetic latency and injected failures."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1', help="Address to listen on (default: 127.0.0.1).")
+        parser.add_argument('--port', type=int, default=11435, help="Port to listen on (default: 11435).")
+        parser.add_argument(
+            '--record-from',
+            help="URL of a real Ollama server. Prompts missing from the cassette are forwarded to it "
+                 "and the answers saved to --cassette on exit."
+        )
+        add_stub_arguments(parser)
+
+    def handle(self, *args, **options):
+        path = options['cassette']
+        recording = options['record_from']
+        if recording and not path:
+            raise CommandError("--record-from needs --cassette to save the recordings to.")
+        try:
+            cassette = Cassette.load(path) if path and os.path.exists(path) else None
+            if path and cassette is None and not recording:
+                raise CommandError(f"Cassette {path} does not exist.")
+            stub = build_stub(
+                options, cassette=cassette, record_from=recording, host=options['host'], port=options['port']
+            )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(
+            f"Ollama stub on {stub.url} replaying {len(stub.cassette)} recording(s)"
+            + (f", recording from {recording}" if recording else "") + ". Ctrl-C to stop."
+        )
+        try:
+            stub.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stub.close()
+            stats = stub.stats.as_dict()
+            self.stdout.write(
+                f"Served {stats['generate']} generation(s), peak {stats['max_in_flight']} in flight; "
+                f"injected failures: {stats['failures']}."
+            )
+            if recording:
+                stub.cassette.save(path)
+                self.stdout.write(self.style.SUCCESS(f"Saved {len(stub.cassette)} recording(s) to {path}."))
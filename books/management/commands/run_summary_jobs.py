@@ -0,0 +1,44 @@
+"""
+Management command that generates book summaries scheduled by description changes.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from books.api.v1.summary_jobs import claim_due_jobs, get_summary_job_settings, run_summary_job, schedule_stale_summaries
+
+
+class Command(BaseCommand):
+    help = "Run due summary jobs, generating summaries for new and changed book descriptions."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Run the jobs due now and exit instead of polling.")
+        parser.add_argument(
+            '--schedule-stale',
+            action='store_true',
+            help="First schedule every book whose summary is missing or out of date (e.g. after enabling precomputation)."
+        )
+
+    def handle(self, *args, **options):
+        conf = get_summary_job_settings()
+        if options['schedule_stale']:
+            self.stdout.write(f"Scheduled {schedule_stale_summaries()} book(s) with stale summaries.")
+
+        counts = {}
+        try:
+            while True:
+                jobs = claim_due_jobs(conf['BATCH_SIZE'], conf)
+                for job in jobs:
+                    outcome = run_summary_job(job, conf)
+                    counts[outcome] = counts.get(outcome, 0) + 1
+                if options['once'] and not jobs:
+                    break
+                if not jobs:
+                    time.sleep(conf['POLL_SECONDS'])
+        except KeyboardInterrupt:
+            pass
+
+        summary = ", ".join(f"{count} {outcome}" for outcome, count in sorted(counts.items())) or "nothing to do"
+        style = self.style.WARNING if counts.get('retry') else self.style.SUCCESS
+        self.stdout.write(style(f"Summary jobs: {summary}."))
@@ -0,0 +1,65 @@
+"""
+Management command that reports summary latency per route, for tuning SUMMARY_ROUTES.
+
+Generations that had to load their model first are counted as cold starts
+and kept out of the warm latency percentiles.
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from books.api.v1.model_lifecycle import get_lifecycle_settings
+from books.models import SummaryRouteSample
+
+
+class Command(BaseCommand):
+    help = "Report summary generation latency and token usage per route."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help="Only consider the last N days (default: 7).")
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(days=options['days'])
+        cold_load_ms = get_lifecycle_settings()['COLD_LOAD_MS']
+        samples = SummaryRouteSample.objects.filter(created_at__gte=since).values_list(
+            'route', 'model', 'latency_ms', 'load_ms', 'input_chars', 'output_tokens', 'success'
+        )
+
+        groups = {}
+        for route, model, latency, load_ms, chars, tokens, success in samples.iterator():
+            group = groups.setdefault(
+                (route, model), {'latencies': [], 'cold': [], 'chars': 0, 'tokens': [], 'token_ms': 0.0, 'errors': 0}
+            )
+            cold = load_ms is not None and load_ms > cold_load_ms
+            group['cold' if cold else 'latencies'].append(latency)
+            group['chars'] += chars
+            if tokens and not cold:
+                group['tokens'].append(tokens)
+                group['token_ms'] += latency
+            if not success:
+                group['errors'] += 1
+
+        if not groups:
+            self.stdout.write("No summary samples recorded.")
+            return
+
+        self.stdout.write(
+            f"{'ROUTE':<20} {'MODEL':<16} {'COUNT':>6} {'ERR':>4} {'P50 MS':>9} {'P95 MS':>9} "
+            f"{'COLD':>5} {'COLD P50':>9} {'AVG CHARS':>9} {'AVG TOK':>8} {'MS/TOK':>7}"
+        )
+        for (route, model), group in sorted(groups.items()):
+            latencies = sorted(group['latencies'])
+            cold = sorted(group['cold'])
+            count = len(latencies) + len(cold)
+            p50 = f"{latencies[len(latencies) // 2]:.0f}" if latencies else '-'
+            p95 = f"{latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]:.0f}" if latencies else '-'
+            cold_p50 = f"{cold[len(cold) // 2]:.0f}" if cold else '-'
+            tokens = group['tokens']
+            avg_tokens = sum(tokens) / len(tokens) if tokens else 0
+            ms_per_token = group['token_ms'] / sum(tokens) if tokens else 0
+            self.stdout.write(
+                f"{route:<20} {model:<16} {count:>6} {group['errors']:>4} {p50:>9} {p95:>9} "
+                f"{len(cold):>5} {cold_p50:>9} {group['chars'] / count:>9.0f} {avg_tokens:>8.0f} {ms_per_token:>7.1f}"
+            )
@@ -0,0 +1,41 @@
+"""
+Management command that folds new reviews into the per-book review digests.
+"""
+
+import requests
+from django.core.management.base import BaseCommand
+
+from books.api.v1.digests import books_needing_digest, update_review_digest
+from books.models import Book
+
+
+class Command(BaseCommand):
+    help = "Fold new reviews into each book's review digest, rebuilding digests that drifted too far."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--book', type=int, action='append', help="Only update this book (repeatable).")
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help="Regenerate the selected digests from all reviews instead of folding in new ones."
+        )
+
+    def handle(self, *args, **options):
+        books = Book.objects.all()
+        if options['book']:
+            books = books.filter(pk__in=options['book'])
+        elif not options['rebuild']:
+            books = books_needing_digest(books)
+
+        counts = {}
+        for book in books.order_by('pk').iterator():
+            try:
+                _, outcome = update_review_digest(book, rebuild=options['rebuild'])
+            except requests.exceptions.RequestException as e:
+                self.stderr.write(f"Book {book.pk}: digest not updated: {e}")
+                outcome = 'failed'
+            counts[outcome] = counts.get(outcome, 0) + 1
+
+        summary = ", ".join(f"{count} {outcome}" for outcome, count in sorted(counts.items())) or "nothing to do"
+        style = self.style.WARNING if counts.get('failed') else self.style.SUCCESS
+        self.stdout.write(style(f"Review digests: {summary}."))
@@ -0,0 +1,46 @@
+"""
+Management command that loads the summary and embedding models on every Ollama server.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from books.api.v1.model_lifecycle import ModelKeeper
+
+
+class Command(BaseCommand):
+    help = "Load the managed Ollama models on every server, so the first requests do not pay the model load."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help="Keep running and keep the models loaded, instead of the keeper in each web process."
+        )
+
+    def handle(self, *args, **options):
+        keeper = ModelKeeper()
+        if options['keep']:
+            try:
+                keeper.run()
+            except KeyboardInterrupt:
+                pass
+            return
+
+        upkeep = keeper.check()
+        self.stdout.write(f"{'BACKEND':<32} {'MODEL':<24} {'RESULT':<8} {'LOAD MS':>8}")
+        for backend in keeper.pool.backends:
+            for model in keeper.models:
+                entry = upkeep.get((backend.url, model))
+                if entry is None:
+                    result, load_ms = 'loaded', None
+                elif entry.failures:
+                    result, load_ms = 'failed', None
+                else:
+                    result, load_ms = ('loaded', entry.last_load_ms) if entry.loads else ('renewed', None)
+                self.stdout.write(
+                    f"{backend.url:<32} {model:<24} {result:<8} {'-' if load_ms is None else f'{load_ms:.0f}':>8}"
+                )
+
+        failed = sum(entry.failures for entry in upkeep.values())
+        if failed:
+            raise CommandError(f"{failed} model load(s) failed.")
@@ -0,0 +1,139 @@
+"""
+Middleware for the Book Management System.
+"""
+
+import gzip
+import re
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+COMPRESSIBLE_TYPES = re.compile(r'^(text/|application/(json|javascript|xml|vnd\.oai\.openapi)|.*\+(json|xml))')
+
+
+def get_compression_settings():
+    """Return the response compression settings merged over the defaults."""
+    defaults = {
+        'MIN_SIZE': 1024,
+        'GZIP_LEVEL': 6,
+        'BROTLI_QUALITY': 5,
+    }
+    defaults.update(getattr(settings, 'RESPONSE_COMPRESSION', {}))
+    return defaults
+
+
+def parse_accept_encoding(header):
+    """Return the codings accepted by the client, mapped to their q-values."""
+    accepted = {}
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        match = re.search(r'q=([0-9.]+)', params)
+        if match:
+            try:
+                quality = float(match.group(1))
+            except ValueError:
+                quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def choose_encoding(header):
+    """Pick brotli or gzip, whichever the client prefers and we support."""
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get('*', 0.0)
+    candidates = []
+    if brotli is not None:
+        candidates.append(('br', accepted.get('br', wildcard)))
+    candidates.append(('gzip', accepted.get('gzip', wildcard)))
+    # Ties go to brotli, which compresses repetitive JSON noticeably better.
+    encoding, quality = max(candidates, key=lambda candidate: candidate[1])
+    return encoding if quality > 0 else None
+
+
+class StreamCompressor:
+    """Incremental gzip or brotli compressor with a common interface."""
+
+    def __init__(self, encoding, conf):
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=conf['BROTLI_QUALITY'])
+            self._process = self._compressor.process
+            self._finish = self._compressor.finish
+        else:
+            self._compressor = zlib.compressobj(conf['GZIP_LEVEL'], zlib.DEFLATED, 31)
+            self._process = self._compressor.compress
+            self._finish = self._compressor.flush
+
+    def compress(self, data):
+        return self._process(data)
+
+    def finish(self):
+        return self._finish()
+
+
+def compress_sequence(chunks, encoding, conf):
+    """Compress a streaming body chunk by chunk, yielding only non-empty output."""
+    compressor = StreamCompressor(encoding, conf)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with brotli or gzip, negotiated from ``Accept-Encoding``.
+
+    Regular responses are compressed when at least ``MIN_SIZE`` bytes long.
+    Streaming responses are always compressed, incrementally, so the
+    compressed body is never held in memory in full either.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        conf = get_compression_settings()
+
+        if response.has_header('Content-Encoding') or response.status_code < 200 or response.status_code == 204:
+            return response
+        if not COMPRESSIBLE_TYPES.match(response.get('Content-Type', '')):
+            return response
+        if not response.streaming and len(response.content) < conf['MIN_SIZE']:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compress_sequence(response.streaming_content, encoding, conf)
+            response.headers.pop('Content-Length', None)
+        else:
+            if encoding == 'br':
+                compressed = brotli.compress(response.content, quality=conf['BROTLI_QUALITY'])
+            else:
+                compressed = gzip.compress(response.content, compresslevel=conf['GZIP_LEVEL'], mtime=0)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # The representation changed, so a strong ETag no longer applies.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.6 on 2026-10-19 07:33
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0006_summarylease'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SummaryRouteSample',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('route', models.CharField(max_length=50)),
+                ('model', models.CharField(max_length=100)),
+                ('priority', models.CharField(max_length=20)),
+                ('input_chars', models.PositiveIntegerField()),
+                ('num_predict', models.PositiveIntegerField()),
+                ('output_tokens', models.PositiveIntegerField(blank=True, null=True)),
+                ('latency_ms', models.FloatField()),
+                ('success', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
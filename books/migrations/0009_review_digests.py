@@ -0,0 +1,44 @@
+# Generated by Django 5.1.6 on 2026-10-19 08:01
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0008_change_feed'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookReviewDigest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('digest', models.TextField(blank=True, default='')),
+                ('last_review_at', models.DateTimeField(blank=True, null=True)),
+                ('last_review_id', models.BigIntegerField(default=0)),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('drift_count', models.PositiveIntegerField(default=0)),
+                ('folded_at', models.DateTimeField(blank=True, null=True)),
+                ('rebuilt_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['book', 'created_at', 'id'], name='review_book_created_at_id_idx'),
+        ),
+        migrations.AddField(
+            model_name='bookreviewdigest',
+            name='book',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='review_digest', to='books.book'),
+        ),
+    ]
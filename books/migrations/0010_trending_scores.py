@@ -0,0 +1,25 @@
+# Generated by Django 5.1.6 on 2026-10-19 08:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0009_review_digests'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookTrendingScore',
+            fields=[
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='books.book')),
+                ('log_score', models.FloatField()),
+                ('last_review_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-log_score'], name='trending_log_score_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.1.6 on 2026-10-19 08:20
+
+import hashlib
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+# What generate_summary returned, and the summary action stored, when generation failed.
+FAILED_SUMMARY_PREFIXES = (
+    "Failed to connect to Ollama service.",
+    "Request timed out.",
+    "An error occurred while generating the summary.",
+    "No summary available.",
+)
+
+
+def mark_existing_summaries(apps, schema_editor):
+    """
+    Existing summaries count as current, so they are not regenerated; stored
+    failure messages do not, so ``run_summary_jobs --schedule-stale`` replaces them.
+    """
+    Book = apps.get_model('books', 'Book')
+    books = Book.objects.exclude(summary__isnull=True).exclude(summary='').only('id', 'description')
+    for prefix in FAILED_SUMMARY_PREFIXES:
+        books = books.exclude(summary__startswith=prefix)
+    batch = []
+    for book in books.iterator():
+        book.summary_source_hash = hashlib.sha256(book.description.encode('utf-8')).hexdigest()
+        batch.append(book)
+        if len(batch) >= 1000:
+            Book.objects.bulk_update(batch, ['summary_source_hash'])
+            batch = []
+    Book.objects.bulk_update(batch, ['summary_source_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0010_trending_scores'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='summary_source_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.CreateModel(
+            name='SummaryJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64)),
+                ('requested_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('run_after', models.DateTimeField(db_index=True)),
+                ('locked_until', models.DateTimeField(blank=True, null=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='summary_job', to='books.book')),
+            ],
+        ),
+        migrations.RunPython(mark_existing_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-19 08:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0012_book_title_author_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='summaryroutesample',
+            name='load_ms',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
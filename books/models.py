@@ -32,10 +32,11 @@ class Book(TimeStampedModel):
         year_published (int): The year the book was published
         description (str): A detailed description of the book
         summary (str): AI-generated summary of the book (optional)
+        summary_source_hash (str): SHA-256 of the description the summary was generated from
         rating (float): Average rating of the book (0.0 to 5.0)
     """
-    title = models.CharField(max_length=200)
-    author = models.CharField(max_length=200)
+    title = models.CharField(max_length=200, db_index=True)
+    author = models.CharField(max_length=200, db_index=True)
     genre = models.CharField(max_length=100, null=True, blank=True)
     year_published = models.IntegerField(
         validators=[MinValueValidator(1000), MaxValueValidator(9999)],
@@ -44,11 +45,17 @@ class Book(TimeStampedModel):
     )
     description = models.TextField()
     summary = models.TextField(blank=True, null=True)
+    summary_source_hash = models.CharField(max_length=64, blank=True, default='')
     rating = models.FloatField(
         default=0.0,
         validators=[MinValueValidator(0.0), MaxValueValidator(5.0)]
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='book_updated_at_id_idx'),
+        ]
+
     def __str__(self):
         return f"{self.title} by {self.author}"
 
@@ -80,9 +87,180 @@ class Review(TimeStampedModel):
     )
     comment = models.TextField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='review_updated_at_id_idx'),
+            models.Index(fields=['book', 'created_at', 'id'], name='review_book_created_at_id_idx'),
+        ]
+
     def __str__(self):
         return f"Review by {self.user.username} for {self.book.title}"
 
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
         self.book.update_rating()
+
+class BookEmbedding(TimeStampedModel):
+    """
+    Vector embedding of a book used for semantic search.
+
+    Attributes:
+        book (Book): The embedded book
+        model (str): Name of the embedding model that produced the vector
+        dimensions (int): Length of the vector
+        vector (bytes): The vector as little-endian float32
+        content_hash (str): SHA-256 of the text that was embedded
+    """
+    book = models.OneToOneField(Book, on_delete=models.CASCADE, related_name='embedding')
+    model = models.CharField(max_length=100)
+    dimensions = models.PositiveIntegerField()
+    vector = models.BinaryField()
+    content_hash = models.CharField(max_length=64)
+
+    def __str__(self):
+        return f"Embedding of {self.book_id} ({self.model}, {self.dimensions}d)"
+
+class BookReviewDigest(TimeStampedModel):
+    """
+    LLM digest of what readers say about a book, maintained incrementally.
+
+    Attributes:
+        book (Book): The book the reviews belong to
+        digest (str): The current digest text
+        last_review_at (datetime): created_at of the newest review folded in (the high-water mark)
+        last_review_id (int): id of that review, breaking ties on created_at
+        review_count (int): Reviews reflected in the digest
+        drift_count (int): Folded reviews edited or deleted since the digest was last rebuilt
+        folded_at (datetime): When reviews were last folded in
+        rebuilt_at (datetime): When the digest was last generated from scratch
+    """
+    book = models.OneToOneField(Book, on_delete=models.CASCADE, related_name='review_digest')
+    digest = models.TextField(blank=True, default='')
+    last_review_at = models.DateTimeField(null=True, blank=True)
+    last_review_id = models.BigIntegerField(default=0)
+    review_count = models.PositiveIntegerField(default=0)
+    drift_count = models.PositiveIntegerField(default=0)
+    folded_at = models.DateTimeField(null=True, blank=True)
+    rebuilt_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Review digest of {self.book_id} ({self.review_count} reviews)"
+
+class BookTrendingScore(models.Model):
+    """
+    Exponentially time-decayed review activity of a book, for the trending shelf.
+
+    Attributes:
+        book (Book): The book
+        log_score (float): Natural log of the sum of exp((review time - landmark) / tau) over its reviews
+        last_review_at (datetime): When the newest counted review was written
+    """
+    book = models.OneToOneField(Book, on_delete=models.CASCADE, primary_key=True, related_name='trending')
+    log_score = models.FloatField()
+    last_review_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-log_score'], name='trending_log_score_idx'),
+        ]
+
+    def __str__(self):
+        return f"Trending score of {self.book_id}: {self.log_score:.3f}"
+
+class SummaryLease(models.Model):
+    """
+    Lease row coordinating a single in-flight summary generation across processes.
+
+    Attributes:
+        key (str): Identifies the generation (book and content hash)
+        owner (str): Token of the request currently holding the lease
+        expires_at (datetime): When the lease, or the cached result, stops being valid
+        result (str): The generated summary once the owner has finished
+        completed_at (datetime): When the owner finished
+    """
+    key = models.CharField(max_length=128, unique=True)
+    owner = models.CharField(max_length=32)
+    expires_at = models.DateTimeField(db_index=True)
+    result = models.TextField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Lease {self.key} held by {self.owner}"
+
+class SummaryJob(models.Model):
+    """
+    Pending background generation of a book's summary, debounced across edits.
+
+    Attributes:
+        book (Book): The book to summarize
+        content_hash (str): SHA-256 of the description that triggered the job
+        requested_at (datetime): When the first edit of this debounce window arrived
+        run_after (datetime): Earliest time a worker may run the job
+        locked_until (datetime): Lease of the worker running the job, if any
+        attempts (int): Failed generations so far
+        last_error (str): Error of the last failed generation
+    """
+    book = models.OneToOneField(Book, on_delete=models.CASCADE, related_name='summary_job')
+    content_hash = models.CharField(max_length=64)
+    requested_at = models.DateTimeField(default=timezone.now)
+    run_after = models.DateTimeField(db_index=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+
+    def __str__(self):
+        return f"Summary job for {self.book_id} after {self.run_after}"
+
+class SummaryRouteSample(models.Model):
+    """
+    Latency sample of one summary generation, used to tune the routing rules.
+
+    Attributes:
+        route (str): Name of the route from settings.SUMMARY_ROUTES
+        model (str): Model the request was sent to
+        priority (str): Caller priority
+        input_chars (int): Length of the summarized text
+        num_predict (int): Output token budget
+        output_tokens (int): Tokens actually generated, when reported
+        latency_ms (float): Wall-clock time of the generation call
+        load_ms (float): Time Ollama spent loading the model, when reported
+        success (bool): Whether a summary was returned
+    """
+    route = models.CharField(max_length=50)
+    model = models.CharField(max_length=100)
+    priority = models.CharField(max_length=20)
+    input_chars = models.PositiveIntegerField()
+    num_predict = models.PositiveIntegerField()
+    output_tokens = models.PositiveIntegerField(null=True, blank=True)
+    latency_ms = models.FloatField()
+    load_ms = models.FloatField(null=True, blank=True)
+    success = models.BooleanField(default=True)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"{self.route} ({self.model}): {self.latency_ms:.0f} ms"
+
+class Tombstone(models.Model):
+    """
+    Record of a deleted book or review, read by the change feed.
+
+    Attributes:
+        model (str): Which kind of object was deleted
+        object_id (int): Primary key the object had
+        deleted_at (datetime): When it was deleted
+    """
+    MODEL_BOOK = 'book'
+    MODEL_REVIEW = 'review'
+    MODEL_CHOICES = [(MODEL_BOOK, 'Book'), (MODEL_REVIEW, 'Review')]
+
+    model = models.CharField(max_length=20, choices=MODEL_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at', 'id'], name='tombstone_deleted_at_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"Deleted {self.model} {self.object_id}"
@@ -0,0 +1,517 @@
+"""
+Local stand-in for an Ollama server, for tests and load benchmarks.
+
+``OllamaStub`` answers ``/api/tags``, ``/api/ps``, ``/api/generate`` and
+``/api/embeddings`` without a model. Like Ollama, it answers 404 for models
+that are not installed (``models``), and ``/api/ps`` lists the models used
+so far (or ``loaded``). Generations are replayed from a
+``Cassette`` of recorded responses, looked up by model and prompt; in
+record mode, prompts missing from the cassette are forwarded to a real
+server and its answers added.
+
+Timing follows a real server: a first-token delay (model load plus prompt
+evaluation), then one token every ``token_interval``. Both are
+``LatencyModel`` distributions, or taken from the recorded durations when
+not given. Streaming requests get one NDJSON chunk per token at that pace.
+``parallel`` and ``max_queue`` mimic ``OLLAMA_NUM_PARALLEL`` and
+``OLLAMA_MAX_QUEUE``, and ``failures`` injects errors at given rates:
+
+* ``error``: 500 with an error body.
+* ``overload``: 503, as Ollama answers when its queue is full.
+* ``hang``: no answer for ``hang_seconds``, so the client times out.
+* ``disconnect``: the connection is dropped (mid-stream when streaming).
+
+``manage.py run_ollama_stub`` serves it; ``manage.py benchmark_summaries``
+drives the summary path against it.
+"""
+
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from books.api.v1.embeddings import HashingEmbedder
+from books.api.v1.ollama_pool import normalize_model
+from books.api.v1.utils import content_hash
+
+FAILURE_KINDS = ('error', 'overload', 'hang', 'disconnect')
+DEFAULT_MODELS = ('mistral', 'phi3:mini')
+TOKEN_RE = re.compile(r'\S+\s*')
+NANOSECONDS = 1e9
+
+
+class LatencyModel:
+    """
+    A distribution of delays, sampled in seconds.
+
+    Parsed from ``"constant:MS"``, ``"uniform:LOW_MS:HIGH_MS"``,
+    ``"normal:MEAN_MS:STDDEV_MS"``, ``"lognormal:MEDIAN_MS:SIGMA"`` or
+    ``"exponential:MEAN_MS"``; a bare number is a constant.
+    """
+
+    DISTRIBUTIONS = {
+        'constant': (1, lambda rng, ms: ms),
+        'uniform': (2, lambda rng, low, high: rng.uniform(low, high)),
+        'normal': (2, lambda rng, mean, stddev: rng.gauss(mean, stddev)),
+        'lognormal': (2, lambda rng, median, sigma: rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0),
+        'exponential': (1, lambda rng, mean: rng.expovariate(1 / mean) if mean > 0 else 0.0),
+    }
+
+    def __init__(self, distribution='constant', *params):
+        if distribution not in self.DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution {distribution!r}; choose from {', '.join(self.DISTRIBUTIONS)}.")
+        arity, _ = self.DISTRIBUTIONS[distribution]
+        if len(params) != arity:
+            raise ValueError(f"The {distribution} distribution takes {arity} parameter(s), got {len(params)}.")
+        self.distribution = distribution
+        self.params = tuple(float(param) for param in params)
+
+    def __repr__(self):
+        return ':'.join([self.distribution] + [f'{param:g}' for param in self.params])
+
+    @classmethod
+    def parse(cls, spec):
+        if isinstance(spec, cls):
+            return spec
+        if isinstance(spec, (int, float)):
+            return cls('constant', spec)
+        name, *params = str(spec).split(':')
+        try:
+            return cls('constant', float(name)) if not params else cls(name, *params)
+        except ValueError as e:
+            raise ValueError(f"Invalid latency {spec!r}: {e}") from e
+
+    def sample(self, rng):
+        _, draw = self.DISTRIBUTIONS[self.distribution]
+        value = draw(rng, *self.params)
+        # Every parameter is in milliseconds except the lognormal sigma.
+        return max(value, 0.0) / 1000
+
+
+class Cassette:
+    """Recorded generations, looked up by model and prompt."""
+
+    def __init__(self, entries=()):
+        self.entries = []
+        self._by_key = {}
+        self._by_model = {}
+        self._cursor = {}
+        self._lock = threading.Lock()
+        for entry in entries:
+            self.add(entry)
+
+    def __len__(self):
+        return len(self.entries)
+
+    @staticmethod
+    def key(model, prompt):
+        return content_hash(f'{model}\n{prompt}')
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, indent=2)
+            f.write('\n')
+
+    def add(self, entry):
+        with self._lock:
+            self.entries.append(entry)
+            self._by_key[entry['key']] = entry
+            self._by_model.setdefault(entry['model'], []).append(entry)
+
+    def record(self, model, prompt, result):
+        """Add the body of an Ollama ``/api/generate`` answer."""
+        entry = {
+            'key': self.key(model, prompt),
+            'model': model,
+            'prompt_chars': len(prompt),
+            'response': result.get('response', ''),
+        }
+        for field in ('eval_count', 'prompt_eval_count', 'load_duration', 'prompt_eval_duration', 'eval_duration'):
+            if result.get(field) is not None:
+                entry[field] = result[field]
+        self.add(entry)
+        return entry
+
+    def find(self, model, prompt, exact=False):
+        """
+        The recording of this exact prompt, or unless ``exact`` another one
+        of the same model (then of any model), in turn, so that a small
+        cassette can serve a long benchmark.
+        """
+        with self._lock:
+            entry = self._by_key.get(self.key(model, prompt))
+            if entry is not None or exact:
+                return entry
+            pool = self._by_model.get(model) or self.entries
+            if not pool:
+                return None
+            position = self._cursor.get(model, 0)
+            self._cursor[model] = position + 1
+            return pool[position % len(pool)]
+
+
+class StubStats:
+    """Counters of what the stub served, safe to read while it runs."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.generate = 0
+        self.embeddings = 0
+        self.rejected = 0
+        self.failures = dict.fromkeys(FAILURE_KINDS, 0)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.queued = 0
+        self.max_queued = 0
+
+    def count(self, field, kind=None):
+        with self._lock:
+            if kind is not None:
+                self.failures[kind] += 1
+            else:
+                setattr(self, field, getattr(self, field) + 1)
+
+    def adjust(self, field, delta):
+        with self._lock:
+            value = getattr(self, field) + delta
+            setattr(self, field, value)
+            peak = f'max_{field}'
+            setattr(self, peak, max(getattr(self, peak), value))
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'generate': self.generate,
+                'embeddings': self.embeddings,
+                'rejected': self.rejected,
+                'failures': dict(self.failures),
+                'max_in_flight': self.max_in_flight,
+                'max_queued': self.max_queued,
+            }
+
+
+class Disconnect(Exception):
+    """Drop the client connection without an answer."""
+
+
+class OllamaStub:
+    """An HTTP server that replays recorded Ollama generations with synthetic timing."""
+
+    def __init__(self, cassette=None, models=DEFAULT_MODELS, loaded=None, first_token=None, token_interval=None,
+                 failures=None, hang_seconds=30.0, parallel=None, max_queue=None, record_from=None,
+                 default_response="This is a summary.", embedding_dimensions=256, seed=None,
+                 host='127.0.0.1', port=0):
+        self.cassette = cassette if cassette is not None else Cassette()
+        self.models = list(models)
+        self.loaded = list(models if loaded is None else loaded)
+        self._loaded_lock = threading.Lock()
+        self.first_token = LatencyModel.parse(first_token) if first_token is not None else None
+        self.token_interval = LatencyModel.parse(token_interval) if token_interval is not None else None
+        self.failures = dict(failures or {})
+        unknown = set(self.failures) - set(FAILURE_KINDS)
+        if unknown:
+            raise ValueError(f"Unknown failure kind(s) {', '.join(sorted(unknown))}; choose from {', '.join(FAILURE_KINDS)}.")
+        if sum(self.failures.values()) > 1:
+            raise ValueError("Failure rates add up to more than 1.")
+        self.hang_seconds = hang_seconds
+        self.max_queue = max_queue
+        self.record_from = record_from.rstrip('/') if record_from else None
+        self.default_response = default_response
+        self.embedder = HashingEmbedder(embedding_dimensions)
+        self.stats = StubStats()
+        self._slots = threading.Semaphore(parallel) if parallel else None
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._closed = threading.Event()
+
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self.url = f'http://{host}:{self.server.server_port}'
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self.server.serve_forever()
+
+    def close(self):
+        # Release hanging requests first so shutdown does not wait for them.
+        self._closed.set()
+        if self._thread is not None:
+            self.server.shutdown()
+        self.server.server_close()
+
+    def is_installed(self, model):
+        return normalize_model(model) in {normalize_model(m) for m in self.models}
+
+    def load(self, model):
+        """Report ``model`` in ``/api/ps`` from now on, as Ollama does once a request used it."""
+        with self._loaded_lock:
+            if normalize_model(model) not in {normalize_model(m) for m in self.loaded}:
+                self.loaded.append(model)
+
+    def _random(self):
+        with self._rng_lock:
+            return self._rng.random()
+
+    def _sample(self, latency):
+        with self._rng_lock:
+            return latency.sample(self._rng)
+
+    def _sleep(self, seconds):
+        """Sleep, waking early if the stub is closed."""
+        if seconds > 0:
+            self._closed.wait(seconds)
+
+    def draw_failure(self):
+        """The injected failure for the next generation, or ``None``."""
+        roll = self._random()
+        for kind in FAILURE_KINDS:
+            rate = self.failures.get(kind, 0)
+            if roll < rate:
+                return kind
+            roll -= rate
+        return None
+
+    def recording(self, model, prompt, body):
+        entry = self.cassette.find(model, prompt, exact=self.record_from is not None)
+        if entry is not None:
+            return entry
+        if self.record_from is not None:
+            response = requests.post(f'{self.record_from}/api/generate', json={**body, 'stream': False}, timeout=600)
+            response.raise_for_status()
+            return self.cassette.record(model, prompt, response.json())
+        return {'model': model, 'response': self.default_response}
+
+    def timing(self, entry):
+        """``(first token delay, delay per token)`` in seconds for one generation."""
+        if self.first_token is not None:
+            first = self._sample(self.first_token)
+        else:
+            first = (entry.get('load_duration', 0) + entry.get('prompt_eval_duration', 0)) / NANOSECONDS
+        if self.token_interval is not None:
+            interval = self._sample(self.token_interval)
+        elif entry.get('eval_duration') and entry.get('eval_count'):
+            interval = entry['eval_duration'] / entry['eval_count'] / NANOSECONDS
+        else:
+            interval = 0.0
+        return first, interval
+
+    def generate(self, body, failure=None):
+        """
+        Yield the NDJSON chunks of one generation, sleeping as a real server
+        would between them. With ``failure='disconnect'`` it raises
+        ``Disconnect`` halfway through.
+        """
+        model = body.get('model', '')
+        prompt = body.get('prompt', '')
+        if not prompt:
+            # Like Ollama, an empty prompt only loads the model.
+            yield {'model': model, 'response': '', 'done': True, 'done_reason': 'load'}
+            return
+        entry = self.recording(model, prompt, body)
+        tokens = TOKEN_RE.findall(entry.get('response', ''))
+        limit = (body.get('options') or {}).get('num_predict')
+        if limit is not None and limit >= 0:
+            tokens = tokens[:limit]
+        first, interval = self.timing(entry)
+
+        started = time.perf_counter()
+        self._sleep(first)
+        for position, token in enumerate(tokens):
+            if failure == 'disconnect' and position >= len(tokens) // 2:
+                raise Disconnect
+            yield {'model': model, 'response': token, 'done': False}
+            self._sleep(interval)
+        if failure == 'disconnect':
+            raise Disconnect
+        elapsed = time.perf_counter() - started
+        yield {
+            'model': model,
+            'response': '',
+            'done': True,
+            'done_reason': 'length' if limit is not None and len(tokens) == limit else 'stop',
+            'total_duration': int(elapsed * NANOSECONDS),
+            'load_duration': int(first * NANOSECONDS),
+            'prompt_eval_count': entry.get('prompt_eval_count', len(prompt) // 4),
+            'eval_count': len(tokens),
+            'eval_duration': int(interval * len(tokens) * NANOSECONDS),
+        }
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # HTTP/1.1 for keep-alive and chunked streaming, like Ollama.
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _read_json(self):
+                length = int(self.headers.get('Content-Length', 0))
+                try:
+                    return json.loads(self.rfile.read(length) or b'{}')
+                except ValueError:
+                    return None
+
+            def do_GET(self):
+                if self.path in ('/api/tags', '/api/ps'):
+                    models = stub.models if self.path == '/api/tags' else list(stub.loaded)
+                    self._send(200, {'models': [{'name': m, 'model': m} for m in models]})
+                elif self.path == '/':
+                    self._send(200, {'status': 'Ollama is running'})
+                else:
+                    self._send(404, {'error': 'not found'})
+
+            def do_POST(self):
+                body = self._read_json()
+                if body is None:
+                    self._send(400, {'error': 'invalid JSON body'})
+                elif self.path in ('/api/generate', '/api/embeddings') and not stub.is_installed(body.get('model', '')):
+                    self._send(404, {'error': f"model '{body.get('model', '')}' not found, try pulling it first"})
+                elif self.path == '/api/generate':
+                    stub.load(body['model'])
+                    self._generate(body)
+                elif self.path == '/api/embeddings':
+                    stub.load(body['model'])
+                    stub.stats.count('embeddings')
+                    vector = stub.embedder.embed(body.get('prompt', ''))
+                    self._send(200, {'embedding': [float(x) for x in vector]})
+                else:
+                    self._send(404, {'error': 'not found'})
+
+            def _generate(self, body):
+                stub.stats.count('generate')
+                if stub.max_queue is not None and stub.stats.queued >= stub.max_queue:
+                    stub.stats.count('rejected')
+                    self._send(503, {'error': 'server busy, please try again.  maximum pending requests exceeded'})
+                    return
+                stub.stats.adjust('queued', 1)
+                if stub._slots is not None:
+                    stub._slots.acquire()
+                stub.stats.adjust('queued', -1)
+                stub.stats.adjust('in_flight', 1)
+                try:
+                    self._run_generation(body)
+                finally:
+                    stub.stats.adjust('in_flight', -1)
+                    if stub._slots is not None:
+                        stub._slots.release()
+
+            def _run_generation(self, body):
+                failure = stub.draw_failure()
+                if failure is not None and failure != 'disconnect':
+                    stub.stats.count('failures', failure)
+                    if failure == 'error':
+                        self._send(500, {'error': 'injected failure'})
+                    elif failure == 'overload':
+                        self._send(503, {'error': 'server busy, please try again.  maximum pending requests exceeded'})
+                    else:
+                        stub._sleep(stub.hang_seconds)
+                        self.close_connection = True
+                    return
+
+                try:
+                    chunks = stub.generate(body, failure)
+                    if body.get('stream', True):
+                        self.send_response(200)
+                        self.send_header('Content-Type', 'application/x-ndjson')
+                        self.send_header('Transfer-Encoding', 'chunked')
+                        self.end_headers()
+                        for chunk in chunks:
+                            line = json.dumps(chunk).encode() + b'\n'
+                            self.wfile.write(b'%x\r\n%s\r\n' % (len(line), line))
+                            self.wfile.flush()
+                        self.wfile.write(b'0\r\n\r\n')
+                    else:
+                        text = []
+                        for chunk in chunks:
+                            text.append(chunk['response'])
+                        self._send(200, {**chunk, 'response': ''.join(text)})
+                except Disconnect:
+                    stub.stats.count('failures', 'disconnect')
+                    self.close_connection = True
+                except requests.exceptions.RequestException as e:
+                    self._send(502, {'error': f'recording failed: {e}'})
+
+        return Handler
+
+
+def parse_failures(specs):
+    """``{'error': 0.05}`` from ``['error=0.05']``."""
+    failures = {}
+    for spec in specs or ():
+        kind, _, rate = spec.partition('=')
+        try:
+            failures[kind] = float(rate)
+        except ValueError:
+            raise ValueError(f"Invalid failure rate {spec!r}; expected KIND=RATE, e.g. error=0.05.") from None
+    return failures
+
+
+def add_stub_arguments(parser):
+    """Command-line options shared by the commands that start a stub."""
+    parser.add_argument('--cassette', help="JSON file of recorded generations to replay.")
+    parser.add_argument('--models', nargs='+', default=list(DEFAULT_MODELS), help="Models the stub reports as installed.")
+    parser.add_argument(
+        '--first-token',
+        help="Delay before the first token, e.g. 800, lognormal:800:0.5 or uniform:200:1500 (milliseconds). "
+             "Defaults to the recorded load and prompt evaluation time."
+    )
+    parser.add_argument(
+        '--token-interval',
+        help="Delay between tokens, in the same format. Defaults to the recorded generation speed."
+    )
+    parser.add_argument(
+        '--fail', action='append', default=[], metavar='KIND=RATE',
+        help=f"Inject failures of KIND ({', '.join(FAILURE_KINDS)}) into this fraction of generations; repeatable."
+    )
+    parser.add_argument('--hang-seconds', type=float, default=30.0, help="How long injected hangs last (default: 30).")
+    parser.add_argument('--parallel', type=int, help="Generations served at once, like OLLAMA_NUM_PARALLEL (default: unlimited).")
+    parser.add_argument('--max-queue', type=int, help="Waiting generations before answering 503, like OLLAMA_MAX_QUEUE.")
+    parser.add_argument('--seed', type=int, help="Seed for latency sampling and failure injection.")
+
+
+def build_stub(options, **kwargs):
+    """An ``OllamaStub`` configured from ``add_stub_arguments`` options."""
+    if 'cassette' not in kwargs:
+        kwargs['cassette'] = Cassette.load(options['cassette']) if options.get('cassette') else None
+    return OllamaStub(
+        models=options['models'],
+        first_token=options['first_token'],
+        token_interval=options['token_interval'],
+        failures=parse_failures(options['fail']),
+        hang_seconds=options['hang_seconds'],
+        parallel=options['parallel'],
+        max_queue=options['max_queue'],
+        seed=options['seed'],
+        **kwargs
+    )
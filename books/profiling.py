@@ -0,0 +1,184 @@
+"""
+On-demand request profiling.
+
+``ProfilingMiddleware`` profiles a request with cProfile when the caller
+sends the privileged ``X-Profile-Token`` header, or at random according to
+``REQUEST_PROFILING['SAMPLE_RATE']``. Each profile is written to a rotating
+on-disk store as a pstats dump plus a JSON record holding the request
+details and every SQL statement with its timing. ``manage.py list_profiles``
+reads the store.
+"""
+
+import cProfile
+import hmac
+import json
+import logging
+import os
+import random
+import time
+import uuid
+from contextlib import ExitStack
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Profile-Token'
+
+
+def get_profiling_settings():
+    """Return the profiling settings merged over the defaults."""
+    defaults = {
+        'HEADER_TOKEN': '',
+        'SAMPLE_RATE': 0.0,
+        'DIR': os.path.join(settings.BASE_DIR, 'var', 'profiles'),
+        'MAX_PROFILES': 200,
+        'MAX_QUERIES': 500,
+    }
+    defaults.update(getattr(settings, 'REQUEST_PROFILING', {}))
+    return defaults
+
+
+class QueryRecorder:
+    """Database execute wrapper collecting each statement and its duration."""
+
+    def __init__(self, alias, limit):
+        self.alias = alias
+        self.limit = limit
+        self.queries = []
+        self.count = 0
+        self.total = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.total += duration
+            if len(self.queries) < self.limit:
+                self.queries.append({
+                    'alias': self.alias,
+                    'sql': sql,
+                    'many': many,
+                    'duration_ms': round(duration * 1000, 3),
+                })
+
+
+class ProfileStore:
+    """Directory of profiles that keeps only the newest ``max_profiles``."""
+
+    def __init__(self, directory, max_profiles=200):
+        self.directory = Path(directory)
+        self.max_profiles = max_profiles
+
+    def new_id(self):
+        return f"{datetime.now(dt_timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+
+    def save(self, profile_id, profiler, record):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(str(self.directory / f'{profile_id}.prof'))
+        tmp = self.directory / f'{profile_id}.json.tmp'
+        tmp.write_text(json.dumps(record))
+        os.replace(tmp, self.directory / f'{profile_id}.json')
+        self.rotate()
+
+    def rotate(self):
+        records = sorted(self.directory.glob('*.json'))
+        for path in records[:max(len(records) - self.max_profiles, 0)]:
+            path.unlink(missing_ok=True)
+            path.with_suffix('.prof').unlink(missing_ok=True)
+
+    def list(self):
+        """Return the stored records, newest first."""
+        records = []
+        for path in sorted(self.directory.glob('*.json'), reverse=True):
+            try:
+                records.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                continue
+        return records
+
+    def get(self, profile_id):
+        path = self.directory / f'{profile_id}.json'
+        if not path.exists():
+            return None
+        return json.loads(path.read_text())
+
+    def stats_path(self, profile_id):
+        return self.directory / f'{profile_id}.prof'
+
+
+def get_profile_store():
+    conf = get_profiling_settings()
+    return ProfileStore(conf['DIR'], conf['MAX_PROFILES'])
+
+
+class ProfilingMiddleware:
+    """
+    Profile selected requests with cProfile and record their SQL.
+
+    Header-triggered profiles report their id in the ``X-Profile-Id``
+    response header. For streaming responses only the view is profiled, not
+    the generation of the body.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def get_trigger(self, request, conf):
+        token = request.headers.get(PROFILE_HEADER)
+        if token and conf['HEADER_TOKEN'] and hmac.compare_digest(token, conf['HEADER_TOKEN']):
+            return 'header'
+        if conf['SAMPLE_RATE'] and random.random() < conf['SAMPLE_RATE']:
+            return 'sample'
+        return None
+
+    def __call__(self, request):
+        conf = get_profiling_settings()
+        trigger = self.get_trigger(request, conf)
+        if trigger is None:
+            return self.get_response(request)
+
+        recorders = [QueryRecorder(alias, conf['MAX_QUERIES']) for alias in connections]
+        profiler = cProfile.Profile()
+        started_at = datetime.now(dt_timezone.utc)
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for recorder in recorders:
+                stack.enter_context(connections[recorder.alias].execute_wrapper(recorder))
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        duration = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        try:
+            store = ProfileStore(conf['DIR'], conf['MAX_PROFILES'])
+            profile_id = store.new_id()
+            store.save(profile_id, profiler, {
+                'id': profile_id,
+                'created_at': started_at.isoformat(),
+                'trigger': trigger,
+                'method': request.method,
+                'path': request.path,
+                'view': match.view_name if match else None,
+                'status': response.status_code,
+                'duration_ms': round(duration * 1000, 3),
+                'query_count': sum(r.count for r in recorders),
+                'query_time_ms': round(sum(r.total for r in recorders) * 1000, 3),
+                'queries': [query for r in recorders for query in r.queries],
+            })
+        except OSError as e:
+            # An unwritable or full profile directory must not fail the request.
+            logger.warning(f"Could not store request profile in {conf['DIR']}: {e}")
+            return response
+        if trigger == 'header':
+            response['X-Profile-Id'] = profile_id
+        return response
@@ -0,0 +1,196 @@
+"""
+Prebuilt OpenAPI schema artifacts.
+
+Generating the schema introspects every viewset and serializer, which is
+too expensive to repeat on every Swagger UI load. ``build_schema_artifacts``
+renders it once, at build or startup time, into content-addressed YAML and
+JSON files with gzip and brotli variants next to them. ``SchemaArtifactView``
+serves those files with precompressed bodies and never generates the schema
+in production workers. Each encoding is its own representation with its own
+strong ETag (``"<hash>"``, ``"<hash>-gzip"``, ``"<hash>-br"``), and responses
+vary on ``Accept-Encoding``, so a cache never answers a revalidation with
+the wrong body.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from django.views import View
+
+from books.middleware import brotli, choose_encoding
+
+MANIFEST_NAME = 'manifest.json'
+FORMATS = {
+    'yaml': 'application/vnd.oai.openapi; charset=utf-8',
+    'json': 'application/vnd.oai.openapi+json',
+}
+KEEP_ARTIFACTS = 3
+
+
+def encoding_etag(etag, encoding):
+    """The ETag of one encoding of an artifact whose identity body has ``etag``."""
+    return etag if encoding == 'identity' else f'{etag[:-1]}-{encoding}"'
+
+
+def if_none_match(header, etag):
+    """Whether an ``If-None-Match`` list (or ``*``) matches ``etag``, by weak comparison."""
+    if not header:
+        return False
+    etags = parse_etags(header)
+    return etags == ['*'] or etag in {candidate.removeprefix('W/') for candidate in etags}
+
+
+def get_schema_dir():
+    return Path(getattr(settings, 'OPENAPI_SCHEMA_DIR', os.path.join(settings.BASE_DIR, 'var', 'schema')))
+
+
+def generate_schema():
+    """Introspect the API and return the OpenAPI document as rendered bytes per format."""
+    from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+    from drf_spectacular.settings import spectacular_settings
+
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+    schema = generator.get_schema(request=None, public=True)
+    return {
+        'yaml': OpenApiYamlRenderer().render(schema, renderer_context={}),
+        'json': OpenApiJsonRenderer().render(schema, renderer_context={}),
+    }
+
+
+def build_schema_artifacts(directory=None):
+    """
+    Write the schema artifacts and their manifest, returning the manifest.
+
+    Files are named after the API version and a content hash, so a deploy
+    that does not change the API produces the same ETags.
+    """
+    directory = Path(directory or get_schema_dir())
+    directory.mkdir(parents=True, exist_ok=True)
+    version = settings.SPECTACULAR_SETTINGS.get('VERSION', '0')
+
+    manifest = {'version': version, 'formats': {}}
+    for fmt, content in generate_schema().items():
+        digest = hashlib.sha256(content).hexdigest()[:16]
+        name = f'openapi-{version}-{digest}.{fmt}'
+        variants = {'identity': content, 'gzip': gzip.compress(content, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants['br'] = brotli.compress(content, quality=11)
+
+        files = {}
+        for encoding, data in variants.items():
+            filename = name if encoding == 'identity' else f'{name}.{"gz" if encoding == "gzip" else "br"}'
+            (directory / filename).write_bytes(data)
+            files[encoding] = filename
+        manifest['formats'][fmt] = {'etag': f'"{digest}"', 'files': files}
+
+    tmp = directory / f'{MANIFEST_NAME}.tmp'
+    tmp.write_text(json.dumps(manifest, indent=2))
+    os.replace(tmp, directory / MANIFEST_NAME)
+    _prune(directory, manifest)
+    return manifest
+
+
+def _prune(directory, manifest):
+    """Delete all but the most recent artifacts; running workers keep theirs in memory."""
+    current = {name for fmt in manifest['formats'].values() for name in fmt['files'].values()}
+    stale = sorted(
+        (path for path in directory.glob('openapi-*') if path.name not in current),
+        key=lambda path: path.stat().st_mtime,
+        reverse=True
+    )
+    for path in stale[(KEEP_ARTIFACTS - 1) * len(current):]:
+        path.unlink(missing_ok=True)
+
+
+class SchemaArtifacts:
+    """The artifact set a worker serves, reloaded when the manifest changes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._key = None
+        self._formats = None
+
+    def get(self):
+        directory = get_schema_dir()
+        try:
+            mtime = (directory / MANIFEST_NAME).stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+        with self._lock:
+            if self._key != (str(directory), mtime):
+                manifest = json.loads((directory / MANIFEST_NAME).read_text())
+                formats = {}
+                for fmt, entry in manifest['formats'].items():
+                    bodies = {
+                        encoding: (directory / filename).read_bytes()
+                        for encoding, filename in entry['files'].items()
+                    }
+                    formats[fmt] = {'etag': entry['etag'], 'bodies': bodies}
+                self._formats = formats
+                self._key = (str(directory), mtime)
+            return self._formats
+
+
+artifacts = SchemaArtifacts()
+
+
+class SchemaArtifactView(View):
+    """
+    Serve the prebuilt OpenAPI schema.
+
+    The format follows ``?format=`` or the ``Accept`` header, as with
+    ``SpectacularAPIView``. When no artifact exists, the schema is generated
+    live only if ``OPENAPI_SCHEMA_LIVE_FALLBACK`` is enabled (local
+    development); otherwise the view answers 503.
+    """
+    http_method_names = ['get', 'head']
+
+    def get(self, request, etag=None):
+        # ``etag`` is the version in versioned URLs: the hash of the identity body.
+        formats = artifacts.get()
+        if formats is None:
+            if getattr(settings, 'OPENAPI_SCHEMA_LIVE_FALLBACK', settings.DEBUG):
+                from drf_spectacular.views import SpectacularAPIView
+                return SpectacularAPIView.as_view()(request)
+            return JsonResponse(
+                {"error": "OpenAPI schema has not been built. Run `manage.py build_openapi_schema`."},
+                status=503
+            )
+
+        fmt = request.GET.get('format')
+        if fmt not in FORMATS:
+            fmt = 'json' if 'json' in request.headers.get('Accept', '') else 'yaml'
+        entry = formats[fmt]
+
+        if etag is not None and f'"{etag}"' != entry['etag']:
+            return JsonResponse({"error": "Unknown schema version"}, status=404)
+
+        encoding = choose_encoding(request.headers.get('Accept-Encoding', ''))
+        if encoding not in entry['bodies']:
+            encoding = 'identity'
+        representation = encoding_etag(entry['etag'], encoding)
+
+        if if_none_match(request.headers.get('If-None-Match'), representation):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(entry['bodies'][encoding], content_type=FORMATS[fmt])
+            if encoding != 'identity':
+                response['Content-Encoding'] = encoding
+
+        response['ETag'] = representation
+        if etag is not None:
+            # Versioned URLs never change content.
+            response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        else:
+            response['Cache-Control'] = 'public, max-age=300, must-revalidate'
+        patch_vary_headers(response, ('Accept', 'Accept-Encoding'))
+        return response
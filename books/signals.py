@@ -0,0 +1,90 @@
+"""
+Signal handlers for the books app.
+
+Deleting a ``Book`` or ``Review`` leaves a ``Tombstone`` behind so the
+change feed can report the deletion. Tombstones are written in the same
+transaction as the delete. Bulk paths wrap their deletes in
+``deferred_tombstones()`` to write them with one ``bulk_create`` instead of
+one ``INSERT`` per object.
+
+Creating a ``Review`` adds it to its book's trending score and deleting one
+takes it back out. Deleting a review also recomputes its book's rating, as
+saving one does, which moves the book's ``updated_at`` so the per-worker
+indexes re-read its rating and review count.
+
+Saving a ``Book`` whose description no longer matches its summary schedules
+a background summary (see ``books.api.v1.summary_jobs``).
+"""
+
+import threading
+from contextlib import contextmanager
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from books.api.v1.summary_jobs import schedule_summaries
+from books.api.v1.trending import record_review, remove_review
+from books.models import Book, Review, Tombstone
+
+_deferred = threading.local()
+
+TOMBSTONE_MODELS = {
+    Book: Tombstone.MODEL_BOOK,
+    Review: Tombstone.MODEL_REVIEW,
+}
+
+
+@contextmanager
+def deferred_tombstones():
+    """Collect the tombstones of deletes in this block and insert them together at the end."""
+    if getattr(_deferred, 'pending', None) is not None:
+        yield
+        return
+    _deferred.pending = []
+    try:
+        yield
+        pending = _deferred.pending
+    finally:
+        _deferred.pending = None
+    if pending:
+        Tombstone.objects.bulk_create(pending)
+
+
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Review)
+def record_tombstone(sender, instance, **kwargs):
+    tombstone = Tombstone(model=TOMBSTONE_MODELS[sender], object_id=instance.pk, deleted_at=timezone.now())
+    pending = getattr(_deferred, 'pending', None)
+    if pending is not None:
+        pending.append(tombstone)
+    else:
+        tombstone.save()
+
+
+@receiver(post_save, sender=Review)
+def update_trending_score(sender, instance, created, **kwargs):
+    if created:
+        record_review(instance.book_id, instance.created_at)
+
+
+@receiver(post_delete, sender=Review)
+def remove_from_trending_score(sender, instance, origin=None, **kwargs):
+    # Reviews deleted along with their book go with its score row.
+    if isinstance(origin, Book) or getattr(origin, 'model', None) is Book:
+        return
+    remove_review(instance.book_id, instance.created_at)
+
+
+@receiver(post_delete, sender=Review)
+def update_book_rating(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Book) or getattr(origin, 'model', None) is Book:
+        return
+    instance.book.update_rating()
+
+
+@receiver(post_save, sender=Book)
+def schedule_book_summary(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and 'description' not in update_fields):
+        return
+    schedule_summaries([instance])
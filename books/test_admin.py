@@ -0,0 +1,126 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from unittest.mock import patch
+
+from books.admin import EstimatedCountPaginator, estimated_count
+from books.models import Book, Review, SummaryJob
+
+
+class AdminChangelistTest(TestCase):
+    """Test cases for the book and review admin on large tables."""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', password='x')
+        self.client.force_login(self.admin)
+        self.readers = [User.objects.create_user(username=f'reader{i}') for i in range(3)]
+        self.books = [
+            Book.objects.create(title=f'Title {i}', author=f'Author {i}', description='D') for i in range(3)
+        ]
+
+    def add_reviews(self, count):
+        for i in range(count):
+            Review.objects.create(book=self.books[i % 3], user=self.readers[i % 3], rating=1 + i % 5, comment='C')
+
+    def changelist_queries(self, name, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(f'admin:books_{name}_changelist'), params or {})
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_review_changelist_does_not_query_per_row(self):
+        self.add_reviews(2)
+        _, few = self.changelist_queries('review')
+        self.add_reviews(20)
+        response, many = self.changelist_queries('review')
+        self.assertEqual(few, many)
+        self.assertContains(response, 'Title 0 by Author 0')
+
+    def test_unfiltered_table_is_counted_once(self):
+        self.add_reviews(3)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('admin:books_review_changelist'), {'rating': '2'})
+        counts = [query['sql'] for query in queries.captured_queries if 'COUNT(' in query['sql'].upper()]
+        self.assertEqual(len(counts), 1)
+
+    def test_search_by_id_prefix_and_username(self):
+        self.add_reviews(6)
+        response, _ = self.changelist_queries('book', {'q': 'Title 1'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.books[1]])
+        response, _ = self.changelist_queries('book', {'q': str(self.books[2].pk)})
+        self.assertEqual(list(response.context['cl'].result_list), [self.books[2]])
+
+        response, _ = self.changelist_queries('review', {'q': 'reader1'})
+        self.assertEqual({review.user_id for review in response.context['cl'].result_list}, {self.readers[1].pk})
+        response, _ = self.changelist_queries('review', {'q': str(self.books[0].pk)})
+        self.assertTrue(all(
+            review.pk == self.books[0].pk or review.book_id == self.books[0].pk
+            for review in response.context['cl'].result_list
+        ))
+
+    def test_rating_filter(self):
+        self.add_reviews(10)
+        response, _ = self.changelist_queries('review', {'rating': '3'})
+        self.assertEqual({review.rating for review in response.context['cl'].result_list}, {3})
+
+    def test_recalculate_ratings_action(self):
+        self.add_reviews(6)
+        Book.objects.update(rating=0.0)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('admin:books_review_changelist'), {
+                'action': 'recalculate_book_ratings',
+                '_selected_action': [review.pk for review in Review.objects.filter(book=self.books[0])],
+            })
+        updates = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        ratings = dict(Book.objects.values_list('pk', 'rating'))
+        self.assertEqual(ratings[self.books[0].pk], 2.5)
+        self.assertEqual(ratings[self.books[1].pk], 0.0)
+
+    def test_regenerate_summaries_action(self):
+        SummaryJob.objects.all().delete()
+        Book.objects.update(summary='Old', summary_source_hash='stale')
+        self.client.post(reverse('admin:books_book_changelist'), {
+            'action': 'regenerate_summaries',
+            '_selected_action': [self.books[0].pk, self.books[1].pk],
+        })
+        self.assertEqual(
+            set(SummaryJob.objects.values_list('book_id', flat=True)), {self.books[0].pk, self.books[1].pk}
+        )
+
+    def test_change_forms_use_raw_id_widgets(self):
+        self.add_reviews(1)
+        review = Review.objects.get()
+        response = self.client.get(reverse('admin:books_review_change', args=[review.pk]))
+        self.assertContains(response, 'vForeignKeyRawIdAdminField')
+        response = self.client.get(reverse('admin:books_book_change', args=[self.books[0].pk]))
+        self.assertEqual(response.status_code, 200)
+
+
+class EstimatedCountTest(TestCase):
+    """Test cases for counting with planner estimates."""
+
+    def test_falls_back_to_exact_count(self):
+        Book.objects.create(title='T', author='A', description='D')
+        if connection.vendor != 'postgresql':
+            self.assertIsNone(estimated_count(Book.objects.all()))
+        self.assertEqual(EstimatedCountPaginator(Book.objects.order_by('pk'), 10).count, 1)
+
+    def test_large_estimates_replace_the_count(self):
+        with patch('books.admin.estimated_count', return_value=10_000_000):
+            paginator = EstimatedCountPaginator(Book.objects.order_by('pk'), 50)
+            with self.assertNumQueries(0):
+                self.assertEqual(paginator.count, 10_000_000)
+        with patch('books.admin.estimated_count', return_value=12):
+            self.assertEqual(EstimatedCountPaginator(Book.objects.order_by('pk'), 50).count, 0)
+
+    def test_postgres_estimates(self):
+        if connection.vendor != 'postgresql':
+            self.skipTest("Planner estimates need PostgreSQL.")
+        Book.objects.bulk_create(Book(title=f'T{i}', author='A', description='D') for i in range(50))
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE books_book')
+        self.assertEqual(estimated_count(Book.objects.all()), 50)
+        self.assertGreater(estimated_count(Book.objects.filter(title__startswith='T1')), 0)
@@ -0,0 +1,143 @@
+import time
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from books.api.v1.autocomplete import AutocompleteIndex, normalize_text, reset_autocomplete_index
+from books.models import Book, Review
+
+
+class AutocompleteIndexTest(TestCase):
+    """Test cases for the in-memory prefix index."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='testpass')
+        self.gatsby = Book.objects.create(title='The Great Gatsby', author='F. Scott Fitzgerald', description='D', rating=4.0)
+        self.gatsby_guide = Book.objects.create(title='Gatsby: A Study Guide', author='Anon', description='D', rating=3.0)
+        self.garden = Book.objects.create(title='The Secret Garden', author='Frances Hodgson Burnett', description='D', rating=4.0)
+        self.emile = Book.objects.create(title='Émile', author='Jean-Jacques Rousseau', description='D', rating=2.0)
+        self.index = AutocompleteIndex()
+        self.index.build()
+
+    def ids(self, query, **kwargs):
+        return [match[0] for match in self.index.search(query, **kwargs)]
+
+    def test_matches_start_of_any_word_ranked_by_rating(self):
+        self.assertEqual(self.ids('gat'), [self.gatsby.pk, self.gatsby_guide.pk])
+        self.assertEqual(self.ids('fitz'), [self.gatsby.pk])
+        self.assertEqual(self.ids('great gat'), [self.gatsby.pk])
+        self.assertEqual(self.ids('atsby'), [])
+
+    def test_review_count_breaks_rating_ties(self):
+        Review.objects.create(book=self.garden, user=self.user, rating=4, comment='Lovely')
+        self.index.build()
+        self.assertEqual(self.ids('the'), [self.garden.pk, self.gatsby.pk])
+
+    def test_deleted_review_is_refreshed(self):
+        """A deleted review drops out of its book's review count."""
+        # No overlap, so the refresh only sees books that moved after the reviews were added.
+        self.index.conf = {**self.index.conf, 'REFRESH_OVERLAP_SECONDS': 0}
+        review = Review.objects.create(book=self.garden, user=self.user, rating=4, comment='Lovely')
+        Review.objects.create(book=self.garden, user=self.user, rating=4, comment='Again')
+        Review.objects.create(book=self.gatsby, user=self.user, rating=4, comment='Fine')
+        self.index.refresh(force=True)
+        self.assertEqual(self.ids('the'), [self.garden.pk, self.gatsby.pk])
+
+        review.delete()
+        self.index.refresh(force=True)
+        self.assertEqual(self.ids('the'), [self.gatsby.pk, self.garden.pk])
+
+    def test_normalizes_case_and_accents(self):
+        self.assertEqual(normalize_text('  Émile,  or ON Education '), 'emile or on education')
+        self.assertEqual(self.ids('EMI'), [self.emile.pk])
+
+    def test_fuzzy_matching_is_optional(self):
+        self.assertEqual(self.ids('gatbsy'), [])
+        self.assertEqual(self.ids('gatbsy', fuzzy=True), [self.gatsby.pk, self.gatsby_guide.pk])
+        self.assertEqual(self.ids('great gatbsy', fuzzy=True), [self.gatsby.pk])
+
+    def test_limit(self):
+        self.assertEqual(len(self.ids('the', limit=1)), 1)
+
+    def test_incremental_refresh(self):
+        """Creates, renames and deletes are picked up without rebuilding the index."""
+        new = Book.objects.create(title='Gathering Storm', author='Someone', description='D', rating=5.0)
+        self.garden.title = 'The Gate'
+        self.garden.save()
+        self.gatsby_guide.delete()
+
+        with self.assertNumQueries(2):
+            self.index.refresh(force=True)
+
+        # Equal rating and review count: the older book comes first.
+        self.assertEqual(self.ids('gat'), [new.pk, self.gatsby.pk, self.garden.pk])
+        self.assertEqual(self.ids('garden'), [])
+
+        # The merged arrays are exactly those of a fresh build.
+        rebuilt = AutocompleteIndex()
+        rebuilt.build()
+        self.assertEqual((self.index.terms, self.index.term_ids), (rebuilt.terms, rebuilt.term_ids))
+
+    def test_short_prefix_cache_is_invalidated_by_changes(self):
+        self.assertEqual(self.ids('g'), [self.gatsby.pk, self.garden.pk, self.gatsby_guide.pk])
+        new = Book.objects.create(title='Gold', author='Someone', description='D', rating=5.0)
+        self.index.refresh(force=True)
+        self.assertEqual(self.ids('g')[0], new.pk)
+
+    def test_lookup_latency(self):
+        """Lookups stay well under 5 ms on a catalog of a few thousand books."""
+        Book.objects.bulk_create(
+            Book(title=f'Title {i} of the Series', author=f'Author {i % 300}', description='D', rating=i % 5)
+            for i in range(5000)
+        )
+        self.index.build()
+        queries = ['t', 'ti', 'tit', 'title 12', 'author 7', 'series', 'of the']
+        start = time.perf_counter()
+        for _ in range(20):
+            for query in queries:
+                self.index.search(query, limit=10)
+        average = (time.perf_counter() - start) / (20 * len(queries))
+        self.assertLess(average, 0.005)
+
+
+@override_settings(AUTOCOMPLETE={'REFRESH_SECONDS': 0})
+class AutocompleteEndpointTest(TestCase):
+    """Test cases for the autocomplete action."""
+
+    url = '/books/api/v1/books/autocomplete/'
+
+    def setUp(self):
+        reset_autocomplete_index()
+        self.addCleanup(reset_autocomplete_index)
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_authenticate(user=self.user)
+        self.book = Book.objects.create(title='The Great Gatsby', author='F. Scott Fitzgerald', description='D', rating=4.5)
+
+    def test_suggestions(self):
+        response = self.client.get(self.url, {'q': 'Gre'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [{
+            'id': self.book.pk,
+            'title': 'The Great Gatsby',
+            'author': 'F. Scott Fitzgerald',
+            'rating': 4.5,
+            'review_count': 0,
+        }])
+
+    def test_new_books_appear(self):
+        self.client.get(self.url, {'q': 'gre'})
+        Book.objects.create(title='Great Expectations', author='Charles Dickens', description='D', rating=5.0)
+        response = self.client.get(self.url, {'q': 'gre'})
+        self.assertEqual([item['title'] for item in response.data], ['Great Expectations', 'The Great Gatsby'])
+
+    def test_fuzzy_flag(self):
+        self.assertEqual(self.client.get(self.url, {'q': 'gatbsy'}).data, [])
+        response = self.client.get(self.url, {'q': 'gatbsy', 'fuzzy': '1'})
+        self.assertEqual(response.data[0]['id'], self.book.pk)
+
+    def test_query_required(self):
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url, {'q': 'g', 'limit': 'x'}).status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,122 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from books.api.v1.duplicates import get_duplicate_index, reset_duplicate_index
+from books.models import Book, Review
+
+
+@override_settings(DUPLICATES={'REFRESH_SECONDS': 0})
+class BookBatchTest(TestCase):
+    """Test cases for the batch mutation endpoint."""
+
+    url = '/books/api/v1/books/batch/'
+
+    def setUp(self):
+        reset_duplicate_index()
+        self.addCleanup(reset_duplicate_index)
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_authenticate(user=self.user)
+        self.books = [
+            Book.objects.create(title=f'Book {i}', author='Author', description='Description', rating=1.0)
+            for i in range(3)
+        ]
+
+    def test_mixed_operations_applied_in_order(self):
+        """Creates, updates and deletes are applied and reported per operation."""
+        before = Book.objects.get(pk=self.books[0].pk).updated_at
+        operations = [
+            {'op': 'create', 'data': {'title': 'New', 'author': 'A', 'description': 'D'}},
+            {'op': 'update', 'id': self.books[0].pk, 'data': {'rating': 4.5}},
+            {'op': 'delete', 'id': self.books[1].pk},
+        ]
+
+        response = self.client.post(self.url, {'operations': operations}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['applied'])
+        statuses = [result['status'] for result in response.data['results']]
+        self.assertEqual(statuses, [201, 200, 204])
+        created = Book.objects.get(pk=response.data['results'][0]['id'])
+        self.assertEqual(created.title, 'New')
+        updated = Book.objects.get(pk=self.books[0].pk)
+        self.assertEqual(updated.rating, 4.5)
+        self.assertEqual(updated.title, 'Book 0')
+        self.assertGreater(updated.updated_at, before)
+        self.assertFalse(Book.objects.filter(pk=self.books[1].pk).exists())
+
+    def test_query_count_independent_of_batch_size(self):
+        """A batch costs the same number of queries whether it has 3 or 60 operations."""
+        def run(count):
+            books = [Book.objects.create(title='T', author='A', description='D') for _ in range(2 * count)]
+            operations = (
+                [{'op': 'create', 'data': {'title': 'New', 'author': 'A', 'description': 'D'}}] * count
+                + [{'op': 'update', 'id': book.pk, 'data': {'rating': 3}} for book in books[:count]]
+                + [{'op': 'delete', 'id': book.pk} for book in books[count:]]
+            )
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(self.url, {'operations': operations}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return len(queries)
+
+        get_duplicate_index()
+        self.assertEqual(run(1), run(20))
+
+    def test_invalid_operation_rolls_back_batch(self):
+        """One invalid operation leaves the database untouched."""
+        operations = [
+            {'op': 'create', 'data': {'title': 'New', 'author': 'A', 'description': 'D'}},
+            {'op': 'update', 'id': self.books[0].pk, 'data': {'rating': 9}},
+            {'op': 'delete', 'id': self.books[1].pk},
+        ]
+        response = self.client.post(self.url, {'operations': operations}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(response.data['applied'])
+        results = response.data['results']
+        self.assertEqual([result['status'] for result in results], [424, 400, 424])
+        self.assertIn('rating', results[1]['errors'])
+        self.assertEqual(Book.objects.count(), 3)
+        self.assertEqual(Book.objects.get(pk=self.books[0].pk).rating, 1.0)
+
+    def test_missing_and_duplicate_ids(self):
+        """Unknown ids are 404 and a book targeted twice is a conflict."""
+        operations = [
+            {'op': 'delete', 'id': 999999},
+            {'op': 'update', 'id': self.books[2].pk, 'data': {'rating': 2}},
+            {'op': 'delete', 'id': self.books[2].pk},
+        ]
+        response = self.client.post(self.url, {'operations': operations}, format='json')
+
+        self.assertEqual([result['status'] for result in response.data['results']], [404, 424, 409])
+        self.assertTrue(Book.objects.filter(pk=self.books[2].pk).exists())
+
+    def test_malformed_envelope(self):
+        """Operations without an id or data are rejected before touching the database."""
+        response = self.client.post(self.url, {'operations': [{'op': 'update', 'data': {}}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post(self.url, {'operations': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(MAX_BATCH_OPERATIONS=2)
+    def test_batch_size_limit(self):
+        """Batches over MAX_BATCH_OPERATIONS are refused."""
+        operations = [{'op': 'delete', 'id': book.pk} for book in self.books]
+        response = self.client.post(self.url, {'operations': operations}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Book.objects.count(), 3)
+
+    def test_delete_cascades_to_reviews(self):
+        """Deleting through the batch removes the book's reviews like a single DELETE."""
+        Review.objects.create(book=self.books[0], user=self.user, rating=5, comment='Great')
+        operations = [{'op': 'delete', 'id': self.books[0].pk}]
+        response = self.client.post(self.url, {'operations': operations}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(Review.objects.exists())
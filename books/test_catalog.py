@@ -0,0 +1,124 @@
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from books.api.v1.catalog import CatalogSnapshot, reset_catalog_snapshot
+from books.models import Book, Review
+
+
+class CatalogSnapshotTest(TestCase):
+    """Test cases for the columnar catalog snapshot."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='testpass')
+        self.dune = Book.objects.create(title='Dune', author='Herbert', genre='SF', description='D', rating=4.5)
+        self.emma = Book.objects.create(title='Emma', author='Austen', genre='Classic', description='D', rating=3.0)
+        self.persuasion = Book.objects.create(title='Persuasion', author='Austen', genre='Classic', description='D', rating=4.5)
+        self.untagged = Book.objects.create(title='Untagged', author='Anon', description='D', rating=1.0)
+        self.snapshot = CatalogSnapshot(conf={'REFRESH_SECONDS': 0, 'REFRESH_OVERLAP_SECONDS': 10})
+        self.snapshot.build()
+
+    def ids(self, **kwargs):
+        return self.snapshot.query(**kwargs).tolist()
+
+    def test_filter_and_sort_without_queries(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(self.ids(), [self.dune.pk, self.persuasion.pk, self.emma.pk, self.untagged.pk])
+            self.assertEqual(self.ids(author='Austen'), [self.persuasion.pk, self.emma.pk])
+            self.assertEqual(self.ids(genre='Classic', min_rating=4), [self.persuasion.pk])
+            self.assertEqual(self.ids(genre='Horror'), [])
+            self.assertEqual(self.ids(order_by='rating', limit=2), [self.untagged.pk, self.emma.pk])
+            self.assertEqual(self.ids(exclude_ids=[self.dune.pk], limit=1), [self.persuasion.pk])
+
+    def test_limit_keeps_ties_in_id_order(self):
+        extra = [Book.objects.create(title=f'Tie {i}', author='A', description='D', rating=4.5) for i in range(5)]
+        self.snapshot.refresh(force=True)
+        self.assertEqual(self.ids(limit=4), [self.dune.pk, self.persuasion.pk, extra[0].pk, extra[1].pk])
+
+    def test_average_rating_and_review_count(self):
+        Review.objects.create(book=self.emma, user=self.user, rating=5, comment='Lovely')
+        self.snapshot.refresh(force=True)
+        self.assertEqual(self.ids(order_by='-review_count', limit=1), [self.emma.pk])
+        # Books without reviews have no average and sort last.
+        self.assertEqual(self.ids(order_by='-average_rating', limit=2), [self.emma.pk, self.dune.pk])
+        self.assertEqual(self.ids(min_average_rating=4), [self.emma.pk])
+
+    def test_deleted_review_leaves_snapshot(self):
+        # No overlap, so the refresh only sees books that moved after the reviews were added.
+        self.snapshot.conf = {'REFRESH_SECONDS': 0, 'REFRESH_OVERLAP_SECONDS': 0}
+        review = Review.objects.create(book=self.emma, user=self.user, rating=5, comment='Lovely')
+        Review.objects.create(book=self.dune, user=self.user, rating=2, comment='Dry')
+        self.snapshot.refresh(force=True)
+        self.assertEqual(self.ids(min_average_rating=4), [self.emma.pk])
+
+        review.delete()
+        self.snapshot.refresh(force=True)
+        self.assertEqual(self.ids(min_average_rating=1), [self.dune.pk])
+        self.assertEqual(self.ids(order_by='-review_count', limit=1), [self.dune.pk])
+
+    def test_incremental_refresh(self):
+        self.emma.rating = 5.0
+        self.emma.genre = 'Romance'
+        self.emma.save()
+        self.dune.delete()
+        new = Book.objects.create(title='New', author='Austen', genre='Classic', description='D', rating=2.0)
+
+        with self.assertNumQueries(2):
+            self.snapshot.refresh(force=True)
+
+        self.assertEqual(self.ids(), [self.emma.pk, self.persuasion.pk, new.pk, self.untagged.pk])
+        self.assertEqual(self.ids(genre='Classic'), [self.persuasion.pk, new.pk])
+        self.assertEqual(list(self.snapshot.columns.ids), sorted(self.snapshot.columns.ids))
+
+    def test_compact_memory(self):
+        Book.objects.bulk_create(
+            Book(title=f'B{i}', author=f'Author {i % 50}', genre=f'G{i % 7}', description='D', rating=i % 5)
+            for i in range(1000)
+        )
+        self.snapshot.build()
+        self.assertEqual(len(self.snapshot), 1004)
+        # 28 bytes per book: about 28 MB for a million books.
+        self.assertLessEqual(self.snapshot.columns.nbytes, 28 * len(self.snapshot))
+
+    def test_unknown_order_field(self):
+        with self.assertRaises(ValueError):
+            self.snapshot.query(order_by='title')
+
+
+@override_settings(CATALOG_SNAPSHOT={'REFRESH_SECONDS': 0})
+class SnapshotEndpointTest(TestCase):
+    """Test cases for the endpoints served from the snapshot."""
+
+    def setUp(self):
+        reset_catalog_snapshot()
+        self.addCleanup(reset_catalog_snapshot)
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='reader', password='testpass')
+        self.other = User.objects.create_user(username='other', password='testpass')
+        self.client.force_authenticate(user=self.user)
+        self.books = [
+            Book.objects.create(title=f'Book {i}', author='Austen' if i % 2 else 'Herbert', genre='Classic',
+                                description='D', rating=float(i))
+            for i in range(5)
+        ]
+
+    def test_leaderboard(self):
+        response = self.client.get('/books/api/v1/books/leaderboard/', {'author': 'Austen', 'limit': 5})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([book['title'] for book in response.data], ['Book 3', 'Book 1'])
+        self.assertIn('review_count', response.data[0])
+
+        self.assertEqual(self.client.get('/books/api/v1/books/leaderboard/', {'order': 'title'}).status_code, 400)
+        self.assertEqual(self.client.get('/books/api/v1/books/leaderboard/', {'limit': 'x'}).status_code, 400)
+
+    def test_recommendations(self):
+        for book, rating in ((self.books[1], 5), (self.books[2], 4), (self.books[3], 2)):
+            Review.objects.create(book=book, user=self.other, rating=rating, comment='C')
+        response = self.client.get('/books/api/v1/books/recommendations/')
+        self.assertEqual([book['id'] for book in response.data][:2], [self.books[1].pk, self.books[2].pk])
+
+        Review.objects.create(book=self.books[1], user=self.user, rating=5, comment='C')
+        response = self.client.get('/books/api/v1/books/recommendations/')
+        self.assertEqual([book['id'] for book in response.data], [self.books[2].pk])
+        self.assertEqual(response.data[0]['similarity_score'], self.books[2].rating)
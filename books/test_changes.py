@@ -0,0 +1,142 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from books.api.v1.changes import STREAMS, encode_cursor
+from books.models import Book, Review, Tombstone
+
+NO_LAG = {'SAFETY_LAG_SECONDS': 0}
+
+
+@override_settings(CHANGE_FEED=NO_LAG)
+class ChangeFeedTest(TestCase):
+    """Test cases for the book and review change feed."""
+
+    url = '/books/api/v1/changes/'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_authenticate(user=self.user)
+        self.books = [
+            Book.objects.create(title=f'Book {i}', author='Author', description='Description')
+            for i in range(3)
+        ]
+        self.review = Review.objects.create(book=self.books[0], user=self.user, rating=4, comment='Good')
+
+    def sync(self, cursor=None, limit=None):
+        """Follow the feed until has_more is false; return the changes and the last cursor."""
+        changes = []
+        while True:
+            params = {}
+            if cursor:
+                params['cursor'] = cursor
+            if limit:
+                params['limit'] = limit
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            changes.extend(response.data['changes'])
+            cursor = response.data['cursor']
+            if not response.data['has_more']:
+                return changes, cursor
+
+    def test_initial_sync_pages_through_everything_in_order(self):
+        """A new consumer receives every row once, oldest change first."""
+        changes, _ = self.sync(limit=2)
+
+        seen = [(change['type'], change['id']) for change in changes]
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(
+            sorted(seen),
+            sorted([('book', book.pk) for book in self.books] + [('review', self.review.pk)])
+        )
+        stamps = [change['at'] for change in changes]
+        self.assertEqual(stamps, sorted(stamps))
+        review = next(change for change in changes if change['type'] == 'review')
+        self.assertEqual(review['data']['comment'], 'Good')
+
+    def test_incremental_sync_returns_only_changes(self):
+        """After a sync, the next call returns exactly the updates and deletions since."""
+        _, cursor = self.sync()
+        changes, cursor = self.sync(cursor)
+        self.assertEqual(changes, [])
+
+        self.books[1].title = 'Renamed'
+        self.books[1].save()
+        review_id = self.review.pk
+        self.review.delete()
+
+        changes, _ = self.sync(cursor)
+        self.assertEqual(
+            [(change['type'], change['op'], change['id']) for change in changes],
+            # Deleting the review recomputed its book's rating.
+            [('book', 'upsert', self.books[1].pk), ('review', 'delete', review_id), ('book', 'upsert', self.books[0].pk)]
+        )
+        self.assertEqual(changes[0]['data']['title'], 'Renamed')
+
+    def test_book_delete_leaves_tombstones_for_reviews(self):
+        """Deleting a book reports the book and its cascaded reviews as deleted."""
+        _, cursor = self.sync()
+        response = self.client.delete(f'/books/api/v1/books/{self.books[0].pk}/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        changes, _ = self.sync(cursor)
+        self.assertEqual(
+            sorted((change['type'], change['op'], change['id']) for change in changes),
+            [('book', 'delete', self.books[0].pk), ('review', 'delete', self.review.pk)]
+        )
+
+    def test_batch_delete_writes_tombstones(self):
+        """Deletes through the batch endpoint are reported too."""
+        operations = [{'op': 'delete', 'id': book.pk} for book in self.books[1:]]
+        response = self.client.post('/books/api/v1/books/batch/', {'operations': operations}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(
+            sorted(Tombstone.objects.values_list('model', 'object_id')),
+            sorted(('book', book.pk) for book in self.books[1:])
+        )
+
+    def test_sync_cost_does_not_grow_with_catalog(self):
+        """An incremental sync with one change runs the same queries for a small or large catalog."""
+        def incremental_queries():
+            _, cursor = self.sync()
+            self.books[2].save()
+            with CaptureQueriesContext(connection) as queries:
+                changes, _ = self.sync(cursor)
+            self.assertEqual([change['id'] for change in changes], [self.books[2].pk])
+            return len(queries)
+
+        small = incremental_queries()
+        Book.objects.bulk_create(
+            Book(title=f'Extra {i}', author='Author', description='Description') for i in range(200)
+        )
+        self.assertEqual(incremental_queries(), small)
+
+    def test_resumed_scan_is_bounded_below(self):
+        """A resumed stream seeks the index to its cursor instead of scanning from the start."""
+        now = timezone.now()
+        sql = str(STREAMS['b'].after((now - timedelta(minutes=1), self.books[0].pk), now).query)
+        self.assertIn('"books_book"."updated_at" >= ', sql)
+
+    @override_settings(CHANGE_FEED={'SAFETY_LAG_SECONDS': 60})
+    def test_recent_changes_wait_for_safety_lag(self):
+        """Rows younger than the safety lag are held back."""
+        changes, _ = self.sync()
+        self.assertEqual(changes, [])
+
+    def test_bad_cursors(self):
+        """Malformed cursors are rejected and cursors past retention must resync."""
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        old = timezone.now() - timedelta(days=365)
+        cursor = encode_cursor({'b': (old, 0), 'r': (old, 0), 't': (old, 0)})
+        response = self.client.get(self.url, {'cursor': cursor})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
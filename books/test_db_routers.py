@@ -0,0 +1,162 @@
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.cache.backends.db import DatabaseCache
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from books.db_routers import (
+    PIN_COOKIE,
+    PrimaryReplicaRouter,
+    ReadReplicaMiddleware,
+    get_routing_state,
+    set_request_user,
+    user_pin_key,
+)
+from books.models import Book
+from books.test_throttling import other_process_cache
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], READ_YOUR_WRITES_SECONDS=5)
+class PrimaryReplicaRouterTest(TestCase):
+    """Test cases for primary/replica routing with read-your-writes pinning."""
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.router = PrimaryReplicaRouter()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+
+    def route(self, request, user=None, status=200):
+        """Run a request through the middleware, recording where a read would go."""
+        seen = {}
+
+        def view(req):
+            if user is not None:
+                set_request_user(user)
+            seen['db'] = self.router.db_for_read(Book)
+            return HttpResponse(status=status)
+
+        response = ReadReplicaMiddleware(view)(request)
+        return seen['db'], response
+
+    def test_outside_request_uses_primary(self):
+        """Management commands and the shell read from the primary."""
+        self.assertIsNone(get_routing_state())
+        self.assertEqual(self.router.db_for_read(Book), 'default')
+
+    def test_safe_reads_use_replica(self):
+        """Reads in GET requests go to a replica."""
+        db, _ = self.route(self.factory.get('/books/api/v1/books/'), user=self.user)
+        self.assertEqual(db, 'replica')
+
+    def test_writes_use_primary_and_pin(self):
+        """Write requests use the primary and pin the client and the user."""
+        db, response = self.route(self.factory.post('/books/api/v1/books/'), user=self.user, status=201)
+        self.assertEqual(db, 'default')
+        self.assertEqual(self.router.db_for_write(Book), 'default')
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertIsNotNone(cache.get(user_pin_key(self.user.pk)))
+
+    def test_failed_write_does_not_pin(self):
+        """Rejected writes do not pin the client."""
+        _, response = self.route(self.factory.post('/books/api/v1/books/'), user=self.user, status=400)
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_cookie_pins_reads_to_primary(self):
+        """A client that just wrote reads from the primary."""
+        request = self.factory.get('/books/api/v1/books/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        db, _ = self.route(request)
+        self.assertEqual(db, 'default')
+
+    def test_user_pin_follows_account(self):
+        """A user who just wrote reads from the primary, even from another client."""
+        self.route(self.factory.post('/books/api/v1/reviews/'), user=self.user, status=201)
+        db, _ = self.route(self.factory.get('/books/api/v1/reviews/'), user=self.user)
+        self.assertEqual(db, 'default')
+
+        other = User.objects.create_user(username='otheruser', password='testpass')
+        db, _ = self.route(self.factory.get('/books/api/v1/reviews/'), user=other)
+        self.assertEqual(db, 'replica')
+
+    def test_user_pin_reaches_other_processes_without_cookie(self):
+        """A token client that just wrote reads from the primary in every worker process."""
+        self.route(self.factory.post('/books/api/v1/reviews/'), user=self.user, status=201)
+        with patch('books.db_routers.cache', other_process_cache()):
+            db, _ = self.route(self.factory.get('/books/api/v1/reviews/'), user=self.user)
+        self.assertEqual(db, 'default')
+
+    def test_cache_reads_use_primary(self):
+        """The shared cache is read from the primary, so a pin is seen as soon as it is set."""
+        cache_model = DatabaseCache('django_cache', {}).cache_model_class
+        request = self.factory.get('/books/api/v1/books/')
+        seen = {}
+
+        def view(req):
+            seen['db'] = self.router.db_for_read(cache_model)
+            return HttpResponse()
+
+        ReadReplicaMiddleware(view)(request)
+        self.assertEqual(seen['db'], 'default')
+
+    def test_no_migrations_on_replicas(self):
+        """Schema changes are only applied to the primary."""
+        self.assertTrue(self.router.allow_migrate('default', 'books'))
+        self.assertFalse(self.router.allow_migrate('replica', 'books'))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        """With no replicas configured everything uses the primary."""
+        db, _ = self.route(self.factory.get('/books/api/v1/books/'))
+        self.assertEqual(db, 'default')
+
+
+@skipUnless('replica' in settings.DATABASES, "Run with --settings=book_management.test_settings")
+@override_settings(DATABASE_REPLICAS=['replica'], READ_YOUR_WRITES_SECONDS=5)
+class ReplicaConnectionTest(TransactionTestCase):
+    """Test cases against a second database connection mirroring the primary."""
+
+    # Rows are committed, so the replica connection sees what the primary wrote. The test runner
+    # sets up every alias named here even for skipped classes, hence the check.
+    databases = {'default', 'replica'} if 'replica' in settings.DATABASES else {'default'}
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_authenticate(user=self.user)
+        self.book = Book.objects.create(title='The Hobbit', author='J.R.R. Tolkien', description='D')
+
+    def queries(self, method, path, data=None):
+        """Send a request and return it with the SQL run on the primary and on the replica."""
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = getattr(self.client, method)(path, data, format='json')
+        return response, [q['sql'] for q in primary.captured_queries], [q['sql'] for q in replica.captured_queries]
+
+    def test_reads_run_on_replica_connection(self):
+        response, primary, replica = self.queries('get', f'/books/api/v1/books/{self.book.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['title'], 'The Hobbit')
+        self.assertTrue(any('books_book' in sql for sql in replica))
+        self.assertFalse(any('books_book' in sql for sql in primary))
+
+    def test_writes_and_pinned_reads_run_on_primary(self):
+        response, primary, replica = self.queries(
+            'post', f'/books/api/v1/books/{self.book.pk}/add_review/', {'rating': 5, 'comment': 'Great'}
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(any('INSERT' in sql and 'books_review' in sql for sql in primary))
+        self.assertEqual(replica, [])
+
+        response, primary, replica = self.queries('get', f'/books/api/v1/books/{self.book.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(any('books_book' in sql for sql in primary))
+        self.assertEqual(replica, [])
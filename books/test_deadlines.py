@@ -0,0 +1,156 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase
+from django.urls import resolve
+from rest_framework import status
+from rest_framework.test import APIClient
+from unittest.mock import Mock, patch
+
+from books.api.v1.utils import generate_summary
+from books.deadlines import (
+    DeadlineExceeded,
+    DeadlineMiddleware,
+    StatementTimeout,
+    clamp_timeout,
+    deadline_scope,
+)
+from books.models import Book, SummaryLease
+
+
+class DeadlineBudgetTest(SimpleTestCase):
+    """Test cases for choosing a request's deadline."""
+
+    conf = {
+        'DEFAULT_SECONDS': 30,
+        'MAX_SECONDS': 300,
+        'HEADER': 'X-Request-Timeout',
+        'ENDPOINTS': {'books:book-generate-summary': 240},
+        'STATEMENT_TIMEOUT_SLACK_MS': 1000,
+    }
+
+    def budget(self, path, **headers):
+        request = RequestFactory().get(path, headers=headers)
+        request.resolver_match = resolve(path)
+        return DeadlineMiddleware(lambda r: None).get_budget(request, self.conf)
+
+    def test_endpoint_default_and_global_default(self):
+        self.assertEqual(self.budget('/books/api/v1/books/1/generate_summary/'), 240)
+        self.assertEqual(self.budget('/books/api/v1/books/'), 30)
+
+    def test_client_header_wins_but_is_capped(self):
+        self.assertEqual(self.budget('/books/api/v1/books/', x_request_timeout='2.5'), 2.5)
+        self.assertEqual(self.budget('/books/api/v1/books/', x_request_timeout='9999'), 300)
+
+    def test_invalid_header_is_ignored(self):
+        for value in ('soon', '-1', '0'):
+            self.assertEqual(self.budget('/books/api/v1/books/', x_request_timeout=value), 30)
+
+
+class StatementTimeoutTest(SimpleTestCase):
+    """Test cases for applying the budget to database statements."""
+
+    def setUp(self):
+        self.connection = Mock(vendor='postgresql')
+        self.wrapper = StatementTimeout(self.connection, slack_ms=1000)
+        self.execute = Mock(return_value='rows')
+
+    def statements(self):
+        return [call.args[0] for call in self.execute.call_args_list]
+
+    def test_statement_timeout_follows_budget(self):
+        """The timeout is set once and re-sent only after the budget drops by the slack."""
+        with deadline_scope(10):
+            self.assertEqual(self.wrapper(self.execute, 'SELECT 1', None, False, {}), 'rows')
+            self.wrapper(self.execute, 'SELECT 2', None, False, {})
+        self.assertEqual(len(self.statements()), 3)
+        self.assertTrue(self.statements()[0].startswith('SET statement_timeout = '))
+        self.assertLessEqual(int(self.statements()[0].rsplit(' ', 1)[1]), 10000)
+
+        with deadline_scope(5):
+            self.wrapper(self.execute, 'SELECT 3', None, False, {})
+        self.assertTrue(self.statements()[3].startswith('SET statement_timeout = '))
+
+        self.wrapper(self.execute, 'SELECT 4', None, False, {})
+        self.assertEqual(self.statements()[5:], ['SET statement_timeout TO DEFAULT', 'SELECT 4'])
+
+    def test_expired_budget_fails_before_query(self):
+        with deadline_scope(-1):
+            with self.assertRaises(DeadlineExceeded):
+                self.wrapper(self.execute, 'SELECT 1', None, False, {})
+        self.execute.assert_not_called()
+
+    def test_other_databases_only_check_budget(self):
+        self.connection.vendor = 'sqlite'
+        with deadline_scope(10):
+            self.wrapper(self.execute, 'SELECT 1', None, False, {})
+        self.assertEqual(self.statements(), ['SELECT 1'])
+
+
+class DeadlineRequestTest(TestCase):
+    """Test cases for deadlines on whole requests."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_authenticate(user=self.user)
+        self.book = Book.objects.create(title='Test Book', author='Author', description='Description')
+
+    def test_request_within_deadline_succeeds(self):
+        with patch('books.api.v1.summary_jobs.generate_summary', return_value='Summary'):
+            response = self.client.post(
+                f'/books/api/v1/books/{self.book.pk}/generate_summary/',
+                headers={'X-Request-Timeout': '10'}
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @patch('books.api.v1.utils.get_ollama_pool')
+    def test_ollama_timeout_clamped_to_budget(self, mock_get_pool):
+        """The Ollama timeout never exceeds what is left of the deadline."""
+        pool = mock_get_pool.return_value
+        pool.is_warm.return_value = False
+        pool.get.return_value = Mock(status_code=200)
+        pool.post.return_value = Mock(status_code=200, json=Mock(return_value={"response": "Summary"}))
+
+        with deadline_scope(5):
+            self.assertEqual(generate_summary("Some text"), "Summary")
+
+        self.assertLessEqual(pool.get.call_args.kwargs['timeout'], 5)
+        self.assertLessEqual(pool.post.call_args.kwargs['timeout'], 5)
+
+    def test_clamp_timeout_outside_deadline(self):
+        self.assertEqual(clamp_timeout(180), 180)
+        with deadline_scope(0):
+            with self.assertRaises(DeadlineExceeded):
+                clamp_timeout(180)
+
+
+class ExpiredDeadlineTest(TransactionTestCase):
+    """Requests running out of time, outside a test transaction as in production."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_authenticate(user=self.user)
+        self.book = Book.objects.create(title='Test Book', author='Author', description='Description')
+
+    def test_expired_request_fails_with_504(self):
+        """A view still working past the client's deadline stops at its next query."""
+        def slow_summary(text, **kwargs):
+            time.sleep(0.2)
+            return 'Late summary'
+
+        with patch('books.api.v1.summary_jobs.generate_summary', side_effect=slow_summary):
+            response = self.client.post(
+                f'/books/api/v1/books/{self.book.pk}/generate_summary/',
+                headers={'X-Request-Timeout': '0.1'}
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_504_GATEWAY_TIMEOUT)
+        self.book.refresh_from_db()
+        self.assertIsNone(self.book.summary)
+        # The lease is released despite the deadline, so the next request can lead.
+        self.assertFalse(SummaryLease.objects.exists())
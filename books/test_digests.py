@@ -0,0 +1,148 @@
+from datetime import timedelta
+from io import StringIO
+
+import requests
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from unittest.mock import patch
+
+from books.api.v1.digests import (
+    DIGEST_REBUILT,
+    DIGEST_UNCHANGED,
+    DIGEST_UPDATED,
+    books_needing_digest,
+    update_review_digest,
+)
+from books.models import Book, BookReviewDigest, Review
+
+
+class FakeLLM:
+    """Stands in for generate_summary, recording each prompt."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, text, priority=None, instruction=None, raise_errors=False):
+        self.calls.append(text)
+        return f"digest {len(self.calls)}"
+
+
+class ReviewDigestTest(TestCase):
+    """Test cases for incremental review digests."""
+
+    conf = {'CHUNK_CHARS': 200, 'MAX_REVIEW_CHARS': 100, 'DRIFT_THRESHOLD': 0.2, 'SAFETY_LAG_SECONDS': 0}
+
+    def setUp(self):
+        self.book = Book.objects.create(title='Test Book', author='Author', description='Description')
+        self.users = [User.objects.create_user(username=f'reader{i}', password='testpass') for i in range(3)]
+        self.llm = FakeLLM()
+        patcher = patch('books.api.v1.digests.generate_summary', self.llm)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def add_reviews(self, count, comment='Enjoyed it'):
+        return [
+            Review.objects.create(book=self.book, user=self.users[i % 3], rating=4, comment=f'{comment} {i}')
+            for i in range(count)
+        ]
+
+    def update(self, **kwargs):
+        return update_review_digest(self.book, conf=self.conf, **kwargs)
+
+    def test_only_new_reviews_are_sent(self):
+        """The LLM sees each review once, in chunks, with the previous digest."""
+        self.add_reviews(20, comment='x' * 40)
+        digest, outcome = self.update()
+        self.assertEqual(outcome, DIGEST_UPDATED)
+        first_calls = len(self.llm.calls)
+        self.assertGreater(first_calls, 1)
+        self.assertEqual(digest.review_count, 20)
+
+        self.assertEqual(self.update()[1], DIGEST_UNCHANGED)
+        self.assertEqual(len(self.llm.calls), first_calls)
+
+        self.add_reviews(2, comment='Brand new')
+        digest, outcome = self.update()
+        self.assertEqual(outcome, DIGEST_UPDATED)
+        self.assertEqual(len(self.llm.calls), first_calls + 1)
+        prompt = self.llm.calls[-1]
+        self.assertIn(f'digest {first_calls}', prompt)
+        self.assertIn('Brand new 0', prompt)
+        self.assertNotIn('x' * 40, prompt)
+        self.assertEqual(digest.review_count, 22)
+        self.assertEqual(digest.digest, f'digest {first_calls + 1}')
+
+    def test_recent_reviews_wait_for_safety_lag(self):
+        self.add_reviews(1)
+        _, outcome = update_review_digest(self.book, conf=dict(self.conf, SAFETY_LAG_SECONDS=60))
+        self.assertEqual(outcome, DIGEST_UNCHANGED)
+        self.assertEqual(self.llm.calls, [])
+
+    def test_small_drift_is_tolerated(self):
+        reviews = self.add_reviews(10)
+        self.update()
+        reviews[0].comment = 'Changed my mind'
+        reviews[0].save()
+        self.add_reviews(1, comment='Later')
+
+        digest, outcome = self.update()
+        self.assertEqual(outcome, DIGEST_UPDATED)
+        self.assertEqual(digest.drift_count, 1)
+        self.assertNotIn('Changed my mind', self.llm.calls[-1])
+
+    def test_drift_past_threshold_rebuilds(self):
+        """Enough edits and deletions make the next update regenerate from every review."""
+        reviews = self.add_reviews(10)
+        self.update()
+        reviews[0].delete()
+        reviews[1].delete()
+        reviews[2].comment = 'Changed my mind'
+        reviews[2].save()
+
+        calls = len(self.llm.calls)
+        digest, outcome = self.update()
+        self.assertEqual(outcome, DIGEST_REBUILT)
+        self.assertTrue(all('Current digest' not in prompt for prompt in self.llm.calls[calls:]))
+        self.assertIn('Changed my mind', ''.join(self.llm.calls[calls:]))
+        self.assertEqual((digest.review_count, digest.drift_count), (8, 0))
+        self.assertIsNotNone(digest.rebuilt_at)
+
+    def test_llm_failure_keeps_previous_digest(self):
+        self.add_reviews(3)
+        self.update()
+        self.add_reviews(1, comment='Later')
+        with patch('books.api.v1.digests.generate_summary', side_effect=requests.exceptions.ConnectionError('down')):
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                self.update()
+        digest = BookReviewDigest.objects.get(book=self.book)
+        self.assertEqual((digest.digest, digest.review_count), ('digest 1', 3))
+
+    def test_books_needing_digest(self):
+        other = Book.objects.create(title='Other', author='Author', description='Description')
+        self.add_reviews(2)
+        self.assertEqual(list(books_needing_digest(Book.objects.all())), [self.book])
+        self.update()
+        self.assertEqual(list(books_needing_digest(Book.objects.all())), [])
+        Review.objects.create(book=other, user=self.users[0], rating=2, comment='Meh')
+        self.assertEqual(list(books_needing_digest(Book.objects.all())), [other])
+
+    def test_command_and_endpoint(self):
+        self.add_reviews(2)
+        Review.objects.update(created_at=timezone.now() - timedelta(minutes=1))
+        out = StringIO()
+        call_command('update_review_digests', stdout=out)
+        self.assertIn('1 updated', out.getvalue())
+
+        client = APIClient()
+        client.force_authenticate(user=self.users[0])
+        response = client.get(f'/books/api/v1/books/{self.book.pk}/review_digest/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['digest'], response.data['review_count']), ('digest 1', 2))
+
+        other = Book.objects.create(title='Other', author='Author', description='Description')
+        response = client.get(f'/books/api/v1/books/{other.pk}/review_digest/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,162 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from books.api.v1.duplicates import (
+    DuplicateIndex,
+    MinHasher,
+    get_duplicate_settings,
+    reset_duplicate_index,
+    shingles,
+    similarity,
+)
+from books.models import Book
+
+GATSBY = (
+    "Set on Long Island in the summer of 1922, the novel follows Nick Carraway as he is drawn into the "
+    "world of his mysterious neighbour Jay Gatsby, a millionaire who throws lavish parties in the hope of "
+    "winning back Daisy Buchanan, the woman he loved before the war, and whose dream ends in tragedy."
+)
+GARDEN = (
+    "After the death of her parents in India, Mary Lennox is sent to live with her uncle on the Yorkshire "
+    "moors, where she discovers a locked and neglected garden and, with the help of new friends, brings "
+    "it and her sickly cousin Colin back to life over the course of a single spring."
+)
+
+
+class MinHashTest(SimpleTestCase):
+    """Test cases for signatures and their similarity estimate."""
+
+    def test_estimate_tracks_jaccard_similarity(self):
+        hasher = MinHasher(num_perm=256, seed=7)
+        first = set(range(100))
+        second = set(range(20, 120))
+        exact = len(first & second) / len(first | second)
+        estimate = similarity(hasher.signature(first), hasher.signature(second))
+        self.assertAlmostEqual(estimate, exact, delta=0.1)
+        self.assertEqual(similarity(hasher.signature(first), hasher.signature(set(first))), 1.0)
+
+    def test_shingles_normalize_and_handle_short_text(self):
+        self.assertEqual(shingles('the great gatsby', 3), shingles('the great gatsby', 3))
+        self.assertEqual(len(shingles('one two', 3)), 1)
+        self.assertEqual(len(shingles('a b c d', 3)), 2)
+        self.assertEqual(shingles('', 3), set())
+
+
+class DuplicateIndexTest(TestCase):
+    """Test cases for finding near-duplicate books."""
+
+    def setUp(self):
+        self.gatsby = Book.objects.create(title='The Great Gatsby', author='F. Scott Fitzgerald', description=GATSBY)
+        self.copy = Book.objects.create(
+            title='The Great Gatsby (Annotated Edition)', author='Fitzgerald, F. Scott', description=GATSBY
+        )
+        self.garden = Book.objects.create(title='The Secret Garden', author='Frances Hodgson Burnett', description=GARDEN)
+        self.index = DuplicateIndex(dict(get_duplicate_settings(), REFRESH_SECONDS=0))
+        self.index.build()
+
+    def test_clusters(self):
+        self.assertEqual(self.index.clusters(), [[self.gatsby.pk, self.copy.pk]])
+
+    def test_find_excludes_unrelated_books(self):
+        matches = self.index.find('Great Gatsby', 'Fitzgerald', GATSBY.upper())
+        self.assertEqual({book_id for book_id, _ in matches}, {self.gatsby.pk, self.copy.pk})
+        self.assertTrue(all(score >= 0.7 for _, score in matches))
+        self.assertEqual(self.index.find('Dune', 'Frank Herbert', 'A desert planet and its spice.'), [])
+
+    def test_incremental_refresh(self):
+        self.copy.description = GARDEN
+        self.copy.save()
+        third = Book.objects.create(title='Secret Garden', author='F. H. Burnett', description=GARDEN)
+        self.gatsby.delete()
+
+        with self.assertNumQueries(2):
+            self.index.refresh(force=True)
+
+        self.assertEqual(self.index.clusters(), [[self.copy.pk, self.garden.pk, third.pk]])
+        self.assertEqual(len(self.index), 3)
+
+    def test_changes_are_merged_into_the_arrays(self):
+        self.index.conf['MERGE_ROWS'] = 2
+        self.copy.description = GARDEN
+        self.copy.save()
+        third = Book.objects.create(title='Secret Garden', author='F. H. Burnett', description=GARDEN)
+        self.index.refresh(force=True)
+
+        self.assertEqual((len(self.index.lsh), len(self.index.stale)), (0, 0))
+        self.assertEqual(list(self.index.base.ids), [self.gatsby.pk, self.copy.pk, self.garden.pk, third.pk])
+        self.assertEqual(self.index.clusters(), [[self.copy.pk, self.garden.pk, third.pk]])
+
+    def test_memory_per_book(self):
+        base = self.index.base
+        size = sum(array.nbytes for array in (base.ids, base.signatures, base.keys, base.rows))
+        # 8 (id) + 128 (signature) + 32 bands x (4 (key) + 4 (row))
+        self.assertEqual(size / len(base), 392)
+
+    def test_command_reports_clusters(self):
+        out = StringIO()
+        call_command('find_duplicate_books', stdout=out)
+        self.assertIn('Cluster of 2:', out.getvalue())
+        self.assertIn(f'#{self.copy.pk} The Great Gatsby (Annotated Edition)', out.getvalue())
+        self.assertIn('Found 1 cluster(s) of near-duplicates among 3 book(s)', out.getvalue())
+
+        out = StringIO()
+        call_command('find_duplicate_books', '--threshold', '1.0', stdout=out)
+        self.assertIn('Found 0 cluster(s)', out.getvalue())
+
+
+@override_settings(DUPLICATES={'REFRESH_SECONDS': 0})
+class DuplicateCheckOnCreateTest(TestCase):
+    """Test cases for the check when books are created or imported."""
+
+    def setUp(self):
+        reset_duplicate_index()
+        self.addCleanup(reset_duplicate_index)
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_authenticate(user=self.user)
+        self.gatsby = Book.objects.create(title='The Great Gatsby', author='F. Scott Fitzgerald', description=GATSBY)
+        self.copy = {'title': 'Great Gatsby', 'author': 'Fitzgerald', 'description': GATSBY}
+
+    def test_create_warns(self):
+        response = self.client.post('/books/api/v1/books/', self.copy, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response['X-Possible-Duplicates'], str(self.gatsby.pk))
+
+        response = self.client.post(
+            '/books/api/v1/books/', {'title': 'Secret Garden', 'author': 'Burnett', 'description': GARDEN}, format='json'
+        )
+        self.assertNotIn('X-Possible-Duplicates', response)
+
+    @override_settings(DUPLICATES={'REFRESH_SECONDS': 0, 'CHECK_ON_CREATE': 'reject'})
+    def test_create_rejects(self):
+        response = self.client.post('/books/api/v1/books/', self.copy, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['duplicates'][0]['id'], self.gatsby.pk)
+        self.assertEqual(Book.objects.count(), 1)
+
+    def test_batch_import_checks_catalog_and_batch(self):
+        operations = [
+            {'op': 'create', 'data': self.copy},
+            {'op': 'create', 'data': {'title': 'Secret Garden', 'author': 'Burnett', 'description': GARDEN}},
+            {'op': 'create', 'data': {'title': 'The Secret Garden', 'author': 'F. Burnett', 'description': GARDEN}},
+        ]
+        response = self.client.post('/books/api/v1/books/batch/', {'operations': operations}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual(results[0]['possible_duplicates'][0]['id'], self.gatsby.pk)
+        self.assertNotIn('possible_duplicates', results[1])
+        self.assertEqual(results[2]['possible_duplicates'][0]['operation'], 1)
+
+    @override_settings(DUPLICATES={'REFRESH_SECONDS': 0, 'CHECK_ON_CREATE': 'reject'})
+    def test_batch_import_rejects(self):
+        operations = [{'op': 'create', 'data': self.copy}]
+        response = self.client.post('/books/api/v1/books/batch/', {'operations': operations}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['results'][0]['status'], status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['results'][0]['duplicates'][0]['id'], self.gatsby.pk)
+        self.assertEqual(Book.objects.count(), 1)
@@ -0,0 +1,131 @@
+import shutil
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from books.api.v1.embeddings import (
+    KEEP_VERSIONS,
+    HashingEmbedder,
+    IndexUnavailable,
+    VectorIndex,
+    embed_books,
+    get_index,
+)
+from books.models import Book, BookEmbedding
+
+
+class HashingEmbedderTest(TestCase):
+    """Test cases for the deterministic stub embedder."""
+
+    def test_deterministic_unit_vectors(self):
+        """The same text always maps to the same unit-length float32 vector."""
+        embedder = HashingEmbedder(64)
+        first = embedder.embed("A melancholy jazz-age romance")
+        second = embedder.embed("A melancholy jazz-age romance")
+        self.assertEqual(first.dtype, np.float32)
+        self.assertTrue(np.array_equal(first, second))
+        self.assertAlmostEqual(float(np.linalg.norm(first)), 1.0, places=5)
+
+    def test_similar_texts_score_higher(self):
+        """Texts sharing vocabulary are closer than unrelated ones."""
+        embedder = HashingEmbedder(256)
+        query = embedder.embed("jazz age romance on long island")
+        close = embedder.embed("a romance in the jazz age on long island")
+        far = embedder.embed("surveillance in a totalitarian state")
+        self.assertGreater(float(query @ close), float(query @ far))
+
+
+class SemanticSearchTest(TestCase):
+    """Test cases for embedding storage, the vector index and the API action."""
+
+    def setUp(self):
+        self.index_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.index_dir)
+        overrides = override_settings(EMBEDDINGS={
+            'BACKEND': 'hashing', 'DIMENSIONS': 256, 'INDEX_DIR': self.index_dir,
+        })
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_authenticate(user=self.user)
+
+        self.gatsby = Book.objects.create(
+            title='The Great Gatsby',
+            author='F. Scott Fitzgerald',
+            description='A melancholy romance set in the jazz age on Long Island.'
+        )
+        self.orwell = Book.objects.create(
+            title='1984',
+            author='George Orwell',
+            description='A dystopian story of surveillance and totalitarian control.'
+        )
+
+    def test_embeddings_stored_as_float32_blobs(self):
+        """Embeddings are stored compactly and skipped when content is unchanged."""
+        embedder = HashingEmbedder(256)
+        self.assertEqual(embed_books(Book.objects.all(), embedder), 2)
+        stored = BookEmbedding.objects.get(book=self.gatsby)
+        self.assertEqual(stored.dimensions, 256)
+        self.assertEqual(len(bytes(stored.vector)), 256 * 4)
+
+        self.assertEqual(embed_books(Book.objects.all(), embedder), 0)
+        self.gatsby.description = 'Something else entirely.'
+        self.gatsby.save()
+        self.assertEqual(embed_books(Book.objects.all(), embedder), 1)
+
+    def test_index_is_memory_mapped(self):
+        """The built index is loaded as a read-only memory map."""
+        call_command('build_embedding_index', stdout=StringIO())
+        index = get_index()
+        self.assertEqual(len(index), 2)
+        self.assertIsInstance(index.vectors, np.memmap)
+
+    def test_rebuild_swaps_in_a_complete_version(self):
+        """A rebuild is picked up as a whole while indexes already loaded stay readable."""
+        call_command('build_embedding_index', stdout=StringIO())
+        before = get_index()
+        for i in range(KEEP_VERSIONS + 1):
+            Book.objects.create(title=f'Book {i}', author='Someone', description='A quiet story.')
+            call_command('build_embedding_index', stdout=StringIO())
+
+        after = get_index()
+        self.assertEqual(len(after), 2 + KEEP_VERSIONS + 1)
+        self.assertEqual(after.vectors.shape[0], len(after.ids))
+        self.assertEqual(len(before), 2)
+        self.assertEqual(before.vectors.shape, (2, 256))
+        self.assertEqual(len(list(Path(self.index_dir).glob('v*'))), KEEP_VERSIONS)
+
+    def test_missing_index(self):
+        """Loading an index that was never built raises IndexUnavailable."""
+        with self.assertRaises(IndexUnavailable):
+            VectorIndex.load(self.index_dir)
+
+    def test_semantic_search_action(self):
+        """The action returns the closest books first, with their score."""
+        call_command('build_embedding_index', stdout=StringIO())
+        response = self.client.get(
+            '/books/api/v1/books/semantic_search/', {'q': 'melancholy jazz age romance', 'k': 2}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+        self.assertEqual(response.data[0]['id'], self.gatsby.id)
+        self.assertGreater(response.data[0]['score'], response.data[1]['score'])
+
+    def test_semantic_search_without_index(self):
+        """Without an index the action answers 503."""
+        response = self.client.get('/books/api/v1/books/semantic_search/', {'q': 'romance'})
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    def test_semantic_search_requires_query(self):
+        """The query parameter is mandatory."""
+        response = self.client.get('/books/api/v1/books/semantic_search/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,93 @@
+import gzip
+import json
+import unittest
+
+from django.contrib.auth.models import User
+from django.db.models import Avg, Count
+from django.test import TestCase, override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from books.api.v1.serializers import BookSerializer
+from books.middleware import brotli, choose_encoding
+from books.models import Book
+
+
+class CompressionMiddlewareTest(TestCase):
+    """Test cases for negotiated response compression."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_authenticate(user=self.user)
+        Book.objects.bulk_create([
+            Book(title=f'Book {i}', author='Test Author', description='A long repetitive description. ' * 5)
+            for i in range(20)
+        ])
+
+    def test_choose_encoding(self):
+        """Encodings are negotiated from Accept-Encoding q-values."""
+        self.assertEqual(choose_encoding('gzip'), 'gzip')
+        self.assertIsNone(choose_encoding(''))
+        self.assertIsNone(choose_encoding('identity'))
+        self.assertEqual(choose_encoding('br;q=0.5, gzip;q=0.8'), 'gzip')
+        if brotli is not None:
+            self.assertEqual(choose_encoding('gzip, br'), 'br')
+
+    def test_gzip_large_response(self):
+        """Responses above the threshold are gzipped when the client accepts it."""
+        response = self.client.get('/books/api/v1/books/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))), 20)
+
+    @override_settings(RESPONSE_COMPRESSION={'MIN_SIZE': 10 ** 6})
+    def test_small_response_not_compressed(self):
+        """Responses below the threshold are sent as-is."""
+        response = self.client.get('/books/api/v1/books/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    @unittest.skipIf(brotli is None, "brotli is not installed")
+    def test_brotli_response(self):
+        """Brotli is used when the client prefers it."""
+        response = self.client.get('/books/api/v1/books/', HTTP_ACCEPT_ENCODING='br, gzip')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(len(json.loads(brotli.decompress(response.content))), 20)
+
+
+@override_settings(STREAMING_LIST_THRESHOLD=5)
+class StreamingListTest(TestCase):
+    """Test cases for incremental JSON list rendering."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_authenticate(user=self.user)
+        Book.objects.bulk_create([
+            Book(title=f'Book {i}', author='Test Author', description='Test Description')
+            for i in range(12)
+        ])
+
+    def expected(self):
+        queryset = Book.objects.annotate(average_rating=Avg('reviews__rating'), review_count=Count('reviews'))
+        return JSONRenderer().render(BookSerializer(queryset, many=True).data)
+
+    def test_large_list_is_streamed(self):
+        """Lists above the threshold are streamed with identical JSON."""
+        response = self.client.get('/books/api/v1/books/')
+        self.assertTrue(response.streaming)
+        self.assertEqual(b''.join(response.streaming_content), self.expected())
+
+    def test_streamed_list_is_compressed_incrementally(self):
+        """Streaming responses are compressed chunk by chunk."""
+        response = self.client.get('/books/api/v1/books/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), self.expected())
+
+    @override_settings(STREAMING_LIST_THRESHOLD=100)
+    def test_small_list_not_streamed(self):
+        """Lists below the threshold are rendered in one piece."""
+        response = self.client.get('/books/api/v1/books/')
+        self.assertFalse(response.streaming)
+        self.assertEqual(len(response.data), 12)
@@ -0,0 +1,106 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from books.api.v1.model_lifecycle import ModelKeeper
+from books.api.v1.ollama_pool import OllamaPool, get_pool_settings
+from books.models import SummaryRouteSample
+from books.ollama_stub import OllamaStub
+from books.test_ollama_pool import unused_url
+
+KEEPER_CONF = {'CHECK_SECONDS': 30, 'PING_SECONDS': 600, 'WARMUP_TIMEOUT': 5, 'COLD_LOAD_MS': 500}
+MODELS = {'small:latest': '/api/generate', 'embed:latest': '/api/embeddings'}
+
+
+class ModelKeeperTest(SimpleTestCase):
+    """Test cases for loading models and keeping them resident."""
+
+    def serve(self, loaded=None):
+        stub = OllamaStub(models=['small', 'embed'], loaded=loaded).start()
+        self.addCleanup(stub.close)
+        return stub
+
+    def keeper(self, *urls, **conf):
+        pool = OllamaPool(urls, conf=get_pool_settings())
+        return ModelKeeper(pool, models=MODELS, conf={**KEEPER_CONF, **conf})
+
+    def test_loads_missing_models_on_every_backend(self):
+        first, second = self.serve(loaded=[]), self.serve(loaded=[])
+        keeper = self.keeper(first.url, second.url)
+
+        upkeep = keeper.check()
+        for stub in (first, second):
+            self.assertEqual((stub.stats.generate, stub.stats.embeddings), (1, 1))
+            self.assertEqual(upkeep[(stub.url, 'small:latest')].loads, 1)
+            self.assertIsNotNone(upkeep[(stub.url, 'small:latest')].last_load_ms)
+        self.assertTrue(keeper.pool.is_warm('small'))
+        self.assertTrue(all(backend.outstanding == 0 for backend in keeper.pool.backends))
+
+    def test_idle_models_are_pinged(self):
+        stub = self.serve()
+        keeper = self.keeper(stub.url)
+
+        # Loaded by someone else: renewed once with our keep_alive, then left alone while in use.
+        upkeep = keeper.check()
+        self.assertEqual((upkeep[(stub.url, 'small:latest')].pings, upkeep[(stub.url, 'small:latest')].loads), (1, 0))
+        keeper.check()
+        self.assertEqual(stub.stats.generate, 1)
+
+        keeper.conf['PING_SECONDS'] = 0
+        keeper.check()
+        self.assertEqual(stub.stats.generate, 2)
+        self.assertEqual(upkeep[(stub.url, 'embed:latest')].pings, 2)
+
+    def test_missing_model_is_not_warm(self):
+        stub = self.serve(loaded=[])
+        keeper = self.keeper(stub.url)
+        keeper.models = {'llama3:latest': '/api/generate'}
+
+        upkeep = keeper.check()
+        keeper.check()
+        # Retried on every check, and never reported as loaded.
+        self.assertEqual(upkeep[(stub.url, 'llama3:latest')].failures, 2)
+        self.assertEqual(upkeep[(stub.url, 'llama3:latest')].loads, 0)
+        self.assertFalse(keeper.pool.is_warm('llama3'))
+
+    def test_unreachable_backend_is_reported(self):
+        stub = self.serve(loaded=[])
+        keeper = self.keeper(stub.url, unused_url())
+
+        upkeep = keeper.check()
+        failed = [key for key, entry in upkeep.items() if entry.failures]
+        self.assertEqual(len(failed), len(MODELS))
+        self.assertEqual(upkeep[(stub.url, 'small:latest')].loads, 1)
+
+
+@override_settings(OLLAMA_LIFECYCLE={'MODELS': ['small'], 'WARMUP_TIMEOUT': 5}, EMBEDDINGS={'BACKEND': 'hashing'})
+class WarmModelsCommandTest(TestCase):
+    """Test cases for the model warmup and latency report commands."""
+
+    def test_warm_models(self):
+        stub = OllamaStub(models=['small'], loaded=[]).start()
+        self.addCleanup(stub.close)
+        out = StringIO()
+        with override_settings(OLLAMA_BACKENDS=[stub.url]):
+            call_command('warm_models', stdout=out)
+        self.assertIn('small:latest', out.getvalue())
+        self.assertIn('loaded', out.getvalue())
+        self.assertEqual(stub.stats.generate, 1)
+
+        with override_settings(OLLAMA_BACKENDS=[unused_url()]):
+            with self.assertRaises(CommandError):
+                call_command('warm_models', stdout=StringIO())
+
+    def test_report_separates_cold_starts(self):
+        for latency, load_ms in ((800, 5), (900, None), (12000, 11000)):
+            SummaryRouteSample.objects.create(
+                route='short', model='small', priority='interactive', input_chars=100,
+                num_predict=40, latency_ms=latency, load_ms=load_ms
+            )
+        out = StringIO()
+        call_command('summary_route_report', stdout=out)
+        row = out.getvalue().splitlines()[1].split()
+        # COUNT, ERR, P50 MS, P95 MS, COLD, COLD P50
+        self.assertEqual(row[2:8], ['3', '0', '900', '900', '1', '12000'])
@@ -0,0 +1,123 @@
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+from unittest.mock import patch
+
+from books.api.v1.views import BookViewSet
+from books.db_routers import PIN_COOKIE
+from books.models import Book, Review
+
+
+class BulkRetrieveTest(TestCase):
+    """Test cases for ``?ids=`` on list endpoints."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_authenticate(user=self.user)
+        self.books = [Book.objects.create(title=f'Book {i}', author='A', description='D') for i in range(5)]
+
+    def test_ids_filter_in_one_query(self):
+        wanted = [self.books[3].pk, self.books[1].pk, 999999]
+        with self.assertNumQueries(1):
+            response = self.client.get('/books/api/v1/books/', {'ids': ','.join(map(str, wanted))})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([book['id'] for book in response.data], [self.books[1].pk, self.books[3].pk])
+
+    def test_reviews_ids_filter(self):
+        review = Review.objects.create(book=self.books[0], user=self.user, rating=4, comment='Good')
+        Review.objects.create(book=self.books[1], user=self.user, rating=2, comment='Meh')
+        response = self.client.get('/books/api/v1/reviews/', {'ids': str(review.pk)})
+        self.assertEqual([item['id'] for item in response.data], [review.pk])
+
+    @override_settings(MAX_BULK_IDS=2)
+    def test_invalid_ids(self):
+        self.assertEqual(self.client.get('/books/api/v1/books/', {'ids': '1,x'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get('/books/api/v1/books/', {'ids': '1,2,3'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class MultiplexTest(TestCase):
+    """Test cases for running several API calls in one request."""
+
+    url = '/books/api/v1/multi/'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_authenticate(user=self.user)
+        self.book = Book.objects.create(title='Test Book', author='Author', description='Description', rating=4.0)
+
+    def post(self, *requests):
+        return self.client.post(self.url, {'requests': list(requests)}, format='json')
+
+    def test_book_page_in_one_round_trip(self):
+        response = self.post(
+            {'path': f'/books/api/v1/books/{self.book.pk}/'},
+            {'path': f'/books/api/v1/books/{self.book.pk}/summary/'},
+            {'path': f'/books/api/v1/books/{self.book.pk}/reviews/'},
+            {'path': '/books/api/v1/books/recommendations/'},
+            {'path': f'/books/api/v1/books/?ids={self.book.pk}'},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        responses = response.data['responses']
+        self.assertEqual([item['status'] for item in responses], [200] * 5)
+        self.assertEqual(responses[0]['body']['title'], 'Test Book')
+        self.assertEqual(responses[1]['body']['review_count'], 0)
+        self.assertEqual(responses[2]['body'], [])
+        self.assertEqual(responses[4]['body'][0]['id'], self.book.pk)
+
+    def test_writes_and_errors_are_reported_per_request(self):
+        response = self.post(
+            {'method': 'POST', 'path': f'/books/api/v1/books/{self.book.pk}/add_review/',
+             'body': {'rating': 5, 'comment': 'Great'}},
+            {'path': '/books/api/v1/books/999999/'},
+            {'path': '/nowhere/'},
+            {'method': 'POST', 'path': self.url, 'body': {'requests': []}},
+        )
+        statuses = [item['status'] for item in response.data['responses']]
+        self.assertEqual(statuses, [201, 404, 404, 400])
+        self.assertEqual(Review.objects.get().user, self.user)
+
+    def test_exceptions_are_reported_per_request(self):
+        with patch.object(BookViewSet, 'retrieve', side_effect=RuntimeError('boom')), \
+                self.assertLogs('books.api.v1.multiplex', 'ERROR'):
+            response = self.post(
+                {'path': f'/books/api/v1/books/{self.book.pk}/'},
+                {'path': f'/books/api/v1/books/{self.book.pk}/summary/'},
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        statuses = [item['status'] for item in response.data['responses']]
+        self.assertEqual(statuses, [500, 200])
+
+    def test_read_only_batch_is_not_a_write(self):
+        """Only batches containing a write pin the client to the primary."""
+        response = self.post({'path': f'/books/api/v1/books/{self.book.pk}/'}, {'path': '/books/api/v1/books/'})
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+        response = self.post(
+            {'method': 'POST', 'path': f'/books/api/v1/books/{self.book.pk}/add_review/',
+             'body': {'rating': 5, 'comment': 'Great'}},
+        )
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    def test_authenticates_once(self):
+        """With a JWT, the token is validated for the outer request only."""
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        with patch.object(JWTAuthentication, 'get_validated_token', wraps=JWTAuthentication().get_validated_token) as validate:
+            response = client.post(self.url, {'requests': [{'path': f'/books/api/v1/books/{self.book.pk}/'}] * 3}, format='json')
+        self.assertEqual([item['status'] for item in response.data['responses']], [200] * 3)
+        self.assertEqual(validate.call_count, 1)
+
+    def test_requires_authentication(self):
+        response = APIClient().post(self.url, {'requests': [{'path': '/books/api/v1/books/'}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(MAX_MULTIPLEX_REQUESTS=2)
+    def test_limits(self):
+        self.assertEqual(self.post(*[{'path': '/books/api/v1/books/'}] * 3).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.post({'path': 'books/'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.post().status_code, status.HTTP_400_BAD_REQUEST)
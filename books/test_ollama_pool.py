@@ -0,0 +1,118 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import requests
+from django.test import SimpleTestCase
+
+from books.api.v1.ollama_pool import OllamaPool
+from books.ollama_stub import OllamaStub
+
+
+def unused_url():
+    """A local URL nothing listens on."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), BaseHTTPRequestHandler)
+    url = f'http://127.0.0.1:{server.server_port}'
+    server.server_close()
+    return url
+
+
+POOL_CONF = {
+    'EJECT_AFTER_FAILURES': 2,
+    'EJECT_SECONDS': 60,
+    'MODEL_RESIDENCY_SECONDS': 300,
+    'PS_REFRESH_SECONDS': 30,
+    'PS_TIMEOUT': 1,
+    'MAX_WARM_IMBALANCE': 2,
+}
+
+
+class OllamaPoolTest(SimpleTestCase):
+    """Test cases for routing across several Ollama servers."""
+
+    def serve(self, **kwargs):
+        """A stub that answers every generation with its own URL."""
+        stub = OllamaStub(**kwargs).start()
+        stub.default_response = stub.url
+        self.addCleanup(stub.close)
+        return stub
+
+    def generate(self, pool, model=None):
+        return pool.post(
+            '/api/generate', model=model,
+            json={'model': model or 'mistral', 'prompt': 'Summarize', 'stream': False}, timeout=5
+        )
+
+    def test_least_outstanding_spreads_concurrent_requests(self):
+        """Concurrent requests are spread over the servers instead of queueing on one."""
+        a, b = self.serve(first_token=200), self.serve(first_token=200)
+        pool = OllamaPool([a.url, b.url], conf=POOL_CONF)
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda _: self.generate(pool), range(4)))
+
+        self.assertEqual((a.stats.generate, b.stats.generate), (2, 2))
+        self.assertEqual(max(a.stats.max_in_flight, b.stats.max_in_flight), 2)
+        self.assertTrue(all(backend.outstanding == 0 for backend in pool.backends))
+
+    def test_prefers_server_with_model_loaded(self):
+        """A request for a model goes to the server that already has it in memory."""
+        cold, warm = self.serve(loaded=[]), self.serve(loaded=['mistral:latest'])
+        pool = OllamaPool([cold.url, warm.url], conf=POOL_CONF)
+
+        for _ in range(5):
+            self.assertEqual(self.generate(pool, model='mistral').json()['response'], warm.url)
+        self.assertEqual(cold.stats.generate, 0)
+
+    def test_successful_generation_marks_model_resident(self):
+        """After serving a model, the server is preferred for it without asking /api/ps again."""
+        a, b = self.serve(loaded=[]), self.serve(loaded=[])
+        pool = OllamaPool([a.url, b.url], conf=POOL_CONF)
+
+        first = self.generate(pool, model='phi3:mini').json()['response']
+        for _ in range(3):
+            self.assertEqual(self.generate(pool, model='phi3:mini').json()['response'], first)
+
+    def test_unknown_model_is_not_resident(self):
+        """A 404 for a model that is not installed neither marks it loaded nor ejects the server."""
+        stub = self.serve(loaded=[])
+        pool = OllamaPool([stub.url], conf=POOL_CONF)
+
+        for _ in range(3):
+            self.assertEqual(self.generate(pool, model='llama3').status_code, 404)
+        backend = pool.backends[0]
+        now = time.monotonic()
+        self.assertFalse(backend.has_model('llama3', now))
+        self.assertFalse(backend.is_ejected(now))
+        self.assertEqual(backend.failures, 0)
+
+    def test_connection_errors_fail_over_and_eject(self):
+        """An unreachable server is retried elsewhere and ejected after repeated failures."""
+        healthy = self.serve()
+        pool = OllamaPool([unused_url(), healthy.url], conf=POOL_CONF)
+
+        # Break ties towards the dead server, listed first.
+        with patch('books.api.v1.ollama_pool.random.choice', side_effect=lambda backends: backends[0]):
+            for _ in range(3):
+                self.assertEqual(self.generate(pool).status_code, 200)
+
+        self.assertEqual(healthy.stats.generate, 3)
+        self.assertTrue(pool.backends[0].is_ejected(time.monotonic()))
+
+    def test_server_errors_fail_over(self):
+        """A 5xx answer is retried on another server."""
+        broken, healthy = self.serve(failures={'error': 1.0}), self.serve()
+        pool = OllamaPool([broken.url, healthy.url], conf=POOL_CONF)
+
+        for _ in range(4):
+            self.assertEqual(self.generate(pool).status_code, 200)
+        self.assertEqual(healthy.stats.generate, 4)
+
+    def test_all_down_raises_connection_error(self):
+        """With no reachable server the connection error reaches the caller."""
+        pool = OllamaPool([unused_url(), unused_url()], conf=POOL_CONF)
+
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            self.generate(pool)
+        self.assertTrue(all(backend.outstanding == 0 for backend in pool.backends))
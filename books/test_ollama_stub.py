@@ -0,0 +1,187 @@
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from io import StringIO
+
+import requests
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from books.ollama_stub import Cassette, LatencyModel, OllamaStub, parse_failures
+
+
+class LatencyModelTest(SimpleTestCase):
+    """Test cases for parsing and sampling latency distributions."""
+
+    def test_parse(self):
+        self.assertEqual(LatencyModel.parse(200).sample(random.Random(0)), 0.2)
+        self.assertEqual(LatencyModel.parse('150').sample(random.Random(0)), 0.15)
+        self.assertEqual(repr(LatencyModel.parse('lognormal:800:0.5')), 'lognormal:800:0.5')
+        for spec in ('gamma:1:2', 'uniform:100', 'constant:fast'):
+            with self.assertRaises(ValueError):
+                LatencyModel.parse(spec)
+
+    def test_samples_are_seeded_and_non_negative(self):
+        model = LatencyModel.parse('normal:10:50')
+        first = [model.sample(random.Random(7)) for _ in range(3)]
+        self.assertEqual(first, [model.sample(random.Random(7)) for _ in range(3)])
+        self.assertTrue(all(model.sample(random.Random(seed)) >= 0 for seed in range(50)))
+
+        lognormal = LatencyModel.parse('lognormal:800:0.5')
+        samples = sorted(lognormal.sample(random.Random(seed)) for seed in range(201))
+        self.assertAlmostEqual(samples[100], 0.8, delta=0.1)
+
+    def test_parse_failures(self):
+        self.assertEqual(parse_failures(['error=0.1', 'hang=0.05']), {'error': 0.1, 'hang': 0.05})
+        with self.assertRaises(ValueError):
+            parse_failures(['error'])
+
+
+class CassetteTest(SimpleTestCase):
+    """Test cases for looking up recorded generations."""
+
+    def test_exact_match_then_rotation(self):
+        cassette = Cassette()
+        cassette.record('mistral', 'first prompt', {'response': 'one', 'eval_count': 1})
+        cassette.record('mistral', 'second prompt', {'response': 'two', 'eval_count': 1})
+        cassette.record('phi3:mini', 'third prompt', {'response': 'three'})
+
+        self.assertEqual(cassette.find('mistral', 'second prompt')['response'], 'two')
+        self.assertEqual(
+            [cassette.find('mistral', 'unknown')['response'] for _ in range(3)], ['one', 'two', 'one']
+        )
+        self.assertEqual(cassette.find('llama3', 'unknown')['response'], 'one')
+        self.assertIsNone(cassette.find('mistral', 'unknown', exact=True))
+
+    def test_save_and_load(self):
+        cassette = Cassette()
+        cassette.record('mistral', 'prompt', {'response': 'answer', 'eval_count': 4, 'eval_duration': 4000})
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'cassette.json')
+            cassette.save(path)
+            loaded = Cassette.load(path)
+        self.assertEqual(loaded.find('mistral', 'prompt', exact=True), cassette.entries[0])
+
+
+class OllamaStubTest(SimpleTestCase):
+    """Test cases for the Ollama stand-in server."""
+
+    def serve(self, **kwargs):
+        cassette = Cassette()
+        cassette.record('mistral', 'Summarize', {'response': 'one two three four five six', 'eval_count': 6})
+        stub = OllamaStub(cassette=cassette, **kwargs).start()
+        self.addCleanup(stub.close)
+        return stub
+
+    def generate(self, stub, timeout=5, **body):
+        return requests.post(
+            f'{stub.url}/api/generate', json={'model': 'mistral', 'prompt': 'Summarize', **body},
+            timeout=timeout, stream=body.get('stream', False)
+        )
+
+    def test_models_and_embeddings(self):
+        stub = self.serve(models=['mistral'])
+        self.assertEqual(requests.get(f'{stub.url}/api/tags').json()['models'][0]['name'], 'mistral')
+        self.assertEqual(requests.get(f'{stub.url}/api/ps').json()['models'][0]['model'], 'mistral')
+        embedding = requests.post(f'{stub.url}/api/embeddings', json={'model': 'mistral', 'prompt': 'text'}).json()
+        self.assertEqual(len(embedding['embedding']), 256)
+
+    def test_unknown_models_and_loaded_models(self):
+        stub = self.serve(models=['mistral', 'phi3:mini'], loaded=[])
+        self.assertEqual(requests.get(f'{stub.url}/api/ps').json()['models'], [])
+        self.assertEqual(self.generate(stub, model='llama3').status_code, 404)
+        self.assertEqual(self.generate(stub, stream=False).status_code, 200)
+        self.assertEqual([m['model'] for m in requests.get(f'{stub.url}/api/ps').json()['models']], ['mistral'])
+
+    def test_replay_respects_num_predict(self):
+        stub = self.serve()
+        result = self.generate(stub, stream=False, options={'num_predict': 3}).json()
+        self.assertEqual(result['response'], 'one two three ')
+        self.assertEqual((result['eval_count'], result['done_reason']), (3, 'length'))
+        self.assertEqual(stub.stats.generate, 1)
+
+    def test_streaming_chunk_timing(self):
+        stub = self.serve(first_token=100, token_interval=20)
+        started = time.perf_counter()
+        response = self.generate(stub, stream=True)
+        arrivals = []
+        chunks = []
+        for line in response.iter_lines():
+            arrivals.append(time.perf_counter() - started)
+            chunks.append(json.loads(line))
+
+        self.assertEqual(''.join(chunk['response'] for chunk in chunks), 'one two three four five six')
+        self.assertTrue(chunks[-1]['done'])
+        self.assertEqual(chunks[-1]['eval_count'], 6)
+        self.assertGreaterEqual(arrivals[0], 0.1)
+        self.assertGreaterEqual(arrivals[-1] - arrivals[0], 0.1)
+
+    def test_injected_failures(self):
+        self.assertEqual(self.generate(self.serve(failures={'error': 1.0}), stream=False).status_code, 500)
+        self.assertEqual(self.generate(self.serve(failures={'overload': 1.0}), stream=False).status_code, 503)
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            self.generate(self.serve(failures={'disconnect': 1.0}), stream=False)
+        with self.assertRaises(requests.exceptions.Timeout):
+            self.generate(self.serve(failures={'hang': 1.0}, hang_seconds=5), timeout=0.2, stream=False)
+        with self.assertRaises(ValueError):
+            OllamaStub(failures={'error': 0.7, 'hang': 0.7})
+
+    def test_parallel_slots_and_queue_limit(self):
+        stub = self.serve(first_token=300, parallel=1, max_queue=1)
+        statuses = []
+        threads = [
+            threading.Thread(target=lambda: statuses.append(self.generate(stub, stream=False).status_code))
+            for _ in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.05)
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(statuses), [200, 200, 503])
+        stats = stub.stats.as_dict()
+        self.assertEqual((stats['max_in_flight'], stats['max_queued'], stats['rejected']), (1, 1, 1))
+
+    def test_record_mode_forwards_unknown_prompts(self):
+        upstream = self.serve()
+        recorder = OllamaStub(record_from=upstream.url).start()
+        self.addCleanup(recorder.close)
+
+        result = self.generate(recorder, stream=False).json()
+        self.assertEqual(result['response'], 'one two three four five six')
+        self.assertEqual(recorder.cassette.find('mistral', 'Summarize', exact=True)['eval_count'], 6)
+        self.generate(recorder, stream=False)
+        self.assertEqual(upstream.stats.generate, 1)
+
+
+class BenchmarkSummariesCommandTest(TestCase):
+    """Test cases for the summary benchmark command."""
+
+    def test_reports_throughput_latency_and_occupancy(self):
+        out = StringIO()
+        call_command(
+            'benchmark_summaries', '--requests', '8', '--concurrency', '2', '--chars', '300',
+            '--first-token', '20', '--token-interval', '1', '--fail', 'error=0.25', '--seed', '3', '--json',
+            stdout=out
+        )
+        report = json.loads(out.getvalue())
+
+        self.assertEqual(report['requests'], 8)
+        self.assertEqual(sum(report['outcomes'].values()), 8)
+        self.assertEqual(report['outcomes'].get('ok', 0) + report['outcomes'].get('http 500', 0), 8)
+        self.assertEqual(report['stub']['generate'], 8)
+        self.assertEqual(report['stub']['failures']['error'], report['outcomes'].get('http 500', 0))
+        self.assertGreater(report['latency_ms']['p50'], 20)
+        self.assertLessEqual(report['latency_ms']['p50'], report['latency_ms']['p99'])
+        self.assertTrue(0 < report['occupancy'] <= 1)
+        self.assertLessEqual(report['stub']['max_in_flight'], 2)
+
+    def test_text_report(self):
+        out = StringIO()
+        call_command('benchmark_summaries', '--requests', '3', '--concurrency', '1', '--rate', '50', stdout=out)
+        self.assertIn('open loop at 50 req/s', out.getvalue())
+        self.assertIn('Worker occupancy', out.getvalue())
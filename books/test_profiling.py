@@ -0,0 +1,84 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from books.models import Book
+from books.profiling import get_profile_store
+
+
+class ProfilingMiddlewareTest(TestCase):
+    """Test cases for on-demand request profiling."""
+
+    def setUp(self):
+        self.profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profile_dir)
+        overrides = override_settings(REQUEST_PROFILING={
+            'HEADER_TOKEN': 'secret', 'SAMPLE_RATE': 0, 'DIR': self.profile_dir, 'MAX_PROFILES': 3,
+        })
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_authenticate(user=self.user)
+        Book.objects.create(title='Test Book', author='Test Author', description='Test Description')
+
+    def test_header_triggers_profile(self):
+        """A request with the privileged header is profiled with its SQL."""
+        response = self.client.get('/books/api/v1/books/', HTTP_X_PROFILE_TOKEN='secret')
+        profile_id = response['X-Profile-Id']
+        record = get_profile_store().get(profile_id)
+        self.assertEqual(record['status'], 200)
+        self.assertEqual(record['view'], 'books:book-list')
+        self.assertGreaterEqual(record['query_count'], 1)
+        self.assertIn('books_book', record['queries'][-1]['sql'])
+        self.assertTrue(get_profile_store().stats_path(profile_id).exists())
+
+    def test_wrong_token_is_ignored(self):
+        """Requests without the right token are not profiled."""
+        response = self.client.get('/books/api/v1/books/', HTTP_X_PROFILE_TOKEN='guess')
+        self.assertFalse(response.has_header('X-Profile-Id'))
+        self.assertEqual(get_profile_store().list(), [])
+
+    def test_sampling_and_rotation(self):
+        """Sampled requests are stored, keeping only the newest profiles."""
+        with override_settings(REQUEST_PROFILING={
+            'SAMPLE_RATE': 1.0, 'DIR': self.profile_dir, 'MAX_PROFILES': 3,
+        }):
+            for _ in range(5):
+                self.client.get('/books/api/v1/books/')
+        records = get_profile_store().list()
+        self.assertEqual(len(records), 3)
+        self.assertEqual({record['trigger'] for record in records}, {'sample'})
+
+    def test_unwritable_directory_does_not_fail_request(self):
+        """A profile that cannot be stored is logged and the response still returned."""
+        blocker = f'{self.profile_dir}/file'
+        open(blocker, 'w').close()
+        with override_settings(REQUEST_PROFILING={'HEADER_TOKEN': 'secret', 'DIR': f'{blocker}/profiles'}):
+            with self.assertLogs('books.profiling', 'WARNING'):
+                response = self.client.get('/books/api/v1/books/', HTTP_X_PROFILE_TOKEN='secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('X-Profile-Id'))
+
+    def test_list_profiles_command(self):
+        """The management command lists, summarizes and shows profiles."""
+        response = self.client.get('/books/api/v1/books/', HTTP_X_PROFILE_TOKEN='secret')
+        profile_id = response['X-Profile-Id']
+
+        out = StringIO()
+        call_command('list_profiles', stdout=out)
+        self.assertIn(profile_id, out.getvalue())
+
+        out = StringIO()
+        call_command('list_profiles', '--summary', stdout=out)
+        self.assertIn('book-list', out.getvalue())
+
+        out = StringIO()
+        call_command('list_profiles', '--show', profile_id, stdout=out)
+        self.assertIn('Slowest queries:', out.getvalue())
@@ -0,0 +1,226 @@
+"""
+Query-count and query-plan regression tests for the read endpoints.
+
+Each endpoint is called against catalogs of several sizes. The number of
+queries must not grow with the data (an N+1) nor exceed the baseline
+recorded in ``query_baselines.json``. On PostgreSQL the plan of every
+SELECT is captured with ``EXPLAIN`` and the access path of each table
+(sequential, index or bitmap scan) is compared with the baseline, so an
+index scan turning into a sequential scan fails the build.
+
+Sequential scans are disabled while explaining: on test-sized tables the
+planner would otherwise prefer them everywhere, whereas with them disabled
+a ``Seq Scan`` only remains where no index can serve the query.
+
+After an intended change, re-record the baselines with::
+
+    UPDATE_QUERY_BASELINES=1 python manage.py test books.test_query_budgets
+
+(against PostgreSQL to record plans as well) and commit the JSON file. On
+PostgreSQL an endpoint without a plan baseline fails, as one without a
+query baseline does everywhere.
+"""
+
+import json
+import os
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from books.api.v1.catalog import get_catalog_snapshot, reset_catalog_snapshot
+from books.models import Book, Review
+
+BASELINE_FILE = Path(__file__).with_name('query_baselines.json')
+UPDATE_BASELINES = os.environ.get('UPDATE_QUERY_BASELINES') == '1'
+SIZES = (2, 12)
+SCAN_NODES = ('Seq Scan', 'Index Scan', 'Index Only Scan', 'Bitmap Heap Scan')
+
+ENDPOINTS = {
+    'book-list': lambda data: '/books/api/v1/books/',
+    'book-list-ids': lambda data: '/books/api/v1/books/?ids=' + ','.join(str(book.pk) for book in data['books']),
+    'book-detail': lambda data: f"/books/api/v1/books/{data['book'].pk}/",
+    'book-reviews': lambda data: f"/books/api/v1/books/{data['book'].pk}/reviews/",
+    'book-summary': lambda data: f"/books/api/v1/books/{data['book'].pk}/summary/",
+    'book-recommendations': lambda data: '/books/api/v1/books/recommendations/',
+    'book-recommendations-new-user': lambda data: '/books/api/v1/books/recommendations/',
+    'book-trending': lambda data: '/books/api/v1/books/trending/',
+    'book-leaderboard': lambda data: '/books/api/v1/books/leaderboard/?order=review_count',
+    'review-list': lambda data: '/books/api/v1/reviews/',
+    'review-detail': lambda data: f"/books/api/v1/reviews/{data['review'].pk}/",
+    'change-feed': lambda data: '/books/api/v1/changes/',
+}
+
+
+def load_baselines():
+    if BASELINE_FILE.exists():
+        return json.loads(BASELINE_FILE.read_text())
+    return {'queries': {}, 'plans': {}}
+
+
+def save_baselines(baselines):
+    BASELINE_FILE.write_text(json.dumps(baselines, indent=2, sort_keys=True) + '\n')
+
+
+def scan_paths(plan):
+    """``{table: access path}`` for every scan node of an ``EXPLAIN (FORMAT JSON)`` plan."""
+    paths = {}
+    nodes = [plan]
+    while nodes:
+        node = nodes.pop()
+        if node.get('Node Type') in SCAN_NODES and 'Relation Name' in node:
+            path = node['Node Type']
+            if node.get('Index Name'):
+                path += f" using {node['Index Name']}"
+            paths.setdefault(node['Relation Name'], set()).add(path)
+        nodes.extend(node.get('Plans', ()))
+    return {table: sorted(found) for table, found in sorted(paths.items())}
+
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql)
+        result = cursor.fetchone()[0]
+    return json.loads(result) if isinstance(result, str) else result
+
+
+@override_settings(CATALOG_SNAPSHOT={'REFRESH_SECONDS': 3600})
+class QueryBudgetTest(TestCase):
+    """Query counts and plans of the read endpoints must not regress."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.baselines = load_baselines()
+        cls.recorded = {'queries': {}, 'plans': {}}
+
+    @classmethod
+    def tearDownClass(cls):
+        reset_catalog_snapshot()
+        if UPDATE_BASELINES:
+            baselines = load_baselines()
+            baselines['queries'].update(cls.recorded['queries'])
+            baselines['plans'].update(cls.recorded['plans'])
+            save_baselines(baselines)
+        super().tearDownClass()
+
+    def populate(self, size):
+        """
+        ``size`` books reviewed by ``size`` readers. The first reader, who
+        makes the requests, only rated the first half, so recommendations
+        have the other half to offer.
+        """
+        readers = [User.objects.create_user(username=f'reader{size}-{i}') for i in range(size)]
+        books = [
+            Book.objects.create(title=f'Book {i}', author=f'Author {i}', description='Description', rating=4.0)
+            for i in range(size)
+        ]
+        reviews = [
+            Review.objects.create(book=book, user=reader, rating=4 + (i + j) % 2, comment='Comment')
+            for i, book in enumerate(books)
+            for j, reader in enumerate(readers)
+            if j > 0 or i < size // 2
+        ]
+        return {'readers': readers, 'books': books, 'book': books[0], 'review': reviews[0]}
+
+    def measure(self, name, size):
+        """Call the endpoint against a catalog of ``size``; return the SQL it ran and its plans."""
+        cache.clear()
+        with transaction.atomic():
+            data = self.populate(size)
+            client = APIClient()
+            if name.endswith('-new-user'):
+                client.force_authenticate(user=User.objects.create_user(username=f'new{size}'))
+            else:
+                client.force_authenticate(user=data['readers'][0])
+
+            # Per-worker caches are warm in steady state; count only what a request costs then.
+            reset_catalog_snapshot()
+            get_catalog_snapshot()
+
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(ENDPOINTS[name](data))
+            self.assertEqual(response.status_code, status.HTTP_200_OK, f"{name}: {response.status_code}")
+            if name.startswith('book-recommendations'):
+                self.assertTrue(response.data, f"{name} returned no books at size {size}")
+            statements = [query['sql'] for query in queries.captured_queries]
+
+            plans = None
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+                plans = [
+                    scan_paths(explain(sql)[0]['Plan'])
+                    for sql in statements if sql.lstrip().upper().startswith('SELECT')
+                ]
+            transaction.set_rollback(True)
+        return statements, plans
+
+    def test_endpoints(self):
+        for name in ENDPOINTS:
+            with self.subTest(endpoint=name):
+                self.check_endpoint(name)
+
+    def check_endpoint(self, name):
+        results = {size: self.measure(name, size) for size in SIZES}
+        counts = {str(size): len(statements) for size, (statements, _) in results.items()}
+        smallest, largest = results[SIZES[0]][0], results[SIZES[-1]][0]
+        self.assertEqual(
+            len(smallest), len(largest),
+            f"{name} runs {len(smallest)} queries with {SIZES[0]} books but {len(largest)} with {SIZES[-1]}; "
+            f"probably an N+1:\n" + "\n".join(largest)
+        )
+        self.recorded['queries'][name] = counts
+
+        baseline = self.baselines['queries'].get(name)
+        if baseline is not None and not UPDATE_BASELINES:
+            for size, count in counts.items():
+                self.assertLessEqual(
+                    count, baseline.get(size, count),
+                    f"{name} now runs {count} queries at size {size}, baseline is {baseline.get(size)}:\n"
+                    + "\n".join(results[int(size)][0])
+                )
+        elif baseline is None and not UPDATE_BASELINES:
+            self.fail(f"No query baseline for {name}; record one with UPDATE_QUERY_BASELINES=1.")
+
+        plans = results[SIZES[-1]][1]
+        if plans is None:
+            return
+        self.recorded['plans'][name] = plans
+        if UPDATE_BASELINES:
+            return
+        expected = self.baselines['plans'].get(name)
+        if expected is None:
+            self.fail(f"No plan baseline for {name}; record one against PostgreSQL with UPDATE_QUERY_BASELINES=1.")
+        self.assertEqual(len(plans), len(expected), f"{name} now runs {len(plans)} SELECTs, baseline has {len(expected)}")
+        for index, (actual, before) in enumerate(zip(plans, expected)):
+            regressions = [
+                f"{table}: {before.get(table)} -> {paths}"
+                for table, paths in actual.items()
+                if any(path.startswith('Seq Scan') for path in paths)
+                and not any(path.startswith('Seq Scan') for path in before.get(table, ()))
+            ]
+            self.assertFalse(regressions, f"{name} query {index + 1} lost its index: " + "; ".join(regressions))
+            self.assertEqual(actual, before, f"{name} query {index + 1} changed access paths")
+
+
+class ScanPathsTest(SimpleTestCase):
+    """Test cases for reading access paths out of EXPLAIN output."""
+
+    def test_scan_paths(self):
+        plan = {
+            'Node Type': 'Nested Loop',
+            'Plans': [
+                {'Node Type': 'Index Scan', 'Relation Name': 'books_book', 'Index Name': 'books_book_pkey'},
+                {'Node Type': 'Hash', 'Plans': [{'Node Type': 'Seq Scan', 'Relation Name': 'books_review'}]},
+            ],
+        }
+        self.assertEqual(scan_paths(plan), {
+            'books_book': ['Index Scan using books_book_pkey'],
+            'books_review': ['Seq Scan'],
+        })
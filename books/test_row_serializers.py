@@ -0,0 +1,73 @@
+from django.contrib.auth.models import User
+from django.db.models import Avg, Count
+from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from books.api.v1.renderers import ORJSONRenderer
+from books.api.v1.row_serializers import BookRowSerializer, ReviewRowSerializer
+from books.api.v1.serializers import BookSerializer, ReviewSerializer
+from books.models import Book, Review
+
+
+class ORJSONRendererTest(TestCase):
+    """Test cases for the orjson-backed renderer."""
+
+    def test_matches_json_renderer(self):
+        """Compact output is byte-for-byte identical to DRF's JSONRenderer."""
+        data = [{'title': 'Café \u2028 line', 'rating': 4.5, 'count': 3, 'none': None, 'nested': {'a': [1, 2]}}]
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_indent_falls_back(self):
+        """Indented output is delegated to the stock renderer."""
+        data = {'a': 1}
+        self.assertEqual(
+            ORJSONRenderer().render(data, 'application/json; indent=4'),
+            JSONRenderer().render(data, 'application/json; indent=4')
+        )
+
+
+class RowSerializerTest(TestCase):
+    """Test cases for values()-backed read serializers."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass', email='t@example.com')
+        self.client.force_authenticate(user=self.user)
+        self.book = Book.objects.create(title='Café Book', author='Test Author', description='Test Description')
+        Book.objects.create(title='Unreviewed', author='Other Author', description='Other Description', rating=3.0)
+        Review.objects.create(book=self.book, user=self.user, rating=4, comment='Great book!')
+
+    def annotated_books(self):
+        return Book.objects.annotate(
+            average_rating=Avg('reviews__rating'),
+            review_count=Count('reviews')
+        ).order_by('id')
+
+    def test_book_rows_match_model_serializer(self):
+        """BookRowSerializer renders exactly like BookSerializer."""
+        queryset = self.annotated_books()
+        expected = JSONRenderer().render(BookSerializer(queryset, many=True).data)
+        actual = ORJSONRenderer().render(BookRowSerializer().serialize(queryset))
+        self.assertEqual(actual, expected)
+
+    def test_review_rows_match_model_serializer(self):
+        """ReviewRowSerializer renders exactly like ReviewSerializer."""
+        queryset = Review.objects.order_by('id')
+        expected = JSONRenderer().render(ReviewSerializer(queryset, many=True).data)
+        actual = ORJSONRenderer().render(ReviewRowSerializer().serialize(queryset))
+        self.assertEqual(actual, expected)
+
+    def test_list_endpoints_use_fast_path(self):
+        """List endpoints return the same JSON as the model serializers."""
+        response = self.client.get('/books/api/v1/reviews/')
+        expected = JSONRenderer().render(ReviewSerializer(Review.objects.all(), many=True).data)
+        self.assertEqual(response.content, expected)
+
+        response = self.client.get(f'/books/api/v1/books/{self.book.pk}/reviews/')
+        self.assertEqual(response.content, expected)
+
+    def test_list_without_instantiating_models(self):
+        """The fast path runs a single query regardless of related objects."""
+        with self.assertNumQueries(1):
+            self.client.get('/books/api/v1/reviews/')
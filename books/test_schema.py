@@ -0,0 +1,86 @@
+import gzip
+import json
+import shutil
+import tempfile
+
+from django.test import TestCase, override_settings
+
+from books.schema import build_schema_artifacts
+
+
+class SchemaArtifactViewTest(TestCase):
+    """Test cases for the prebuilt OpenAPI schema."""
+
+    def setUp(self):
+        self.schema_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.schema_dir)
+        overrides = override_settings(OPENAPI_SCHEMA_DIR=self.schema_dir, OPENAPI_SCHEMA_LIVE_FALLBACK=False)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def test_serves_artifact_with_strong_etag(self):
+        """The schema is served from the artifact with an ETag and revalidates to 304."""
+        manifest = build_schema_artifacts()
+        response = self.client.get('/api/schema/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], manifest['formats']['yaml']['etag'])
+        self.assertIn(b'openapi:', response.content)
+
+        response = self.client.get('/api/schema/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_json_format_and_precompressed_variant(self):
+        """JSON is selectable and precompressed bodies are served as-is."""
+        build_schema_artifacts()
+        response = self.client.get('/api/schema/', {'format': 'json'}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        schema = json.loads(gzip.decompress(response.content))
+        self.assertIn('/books/api/v1/books/', schema['paths'])
+
+    def test_each_encoding_has_its_own_etag(self):
+        """Revalidations only match the representation the client would get."""
+        manifest = build_schema_artifacts()
+        identity = manifest['formats']['yaml']['etag']
+        response = self.client.get('/api/schema/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['ETag'], f'{identity[:-1]}-gzip"')
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+        # A cached gzip body does not validate an uncompressed request, and vice versa.
+        self.assertEqual(self.client.get('/api/schema/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+        self.assertEqual(
+            self.client.get('/api/schema/', HTTP_IF_NONE_MATCH=identity, HTTP_ACCEPT_ENCODING='gzip').status_code, 200
+        )
+
+    def test_if_none_match_lists_and_wildcard(self):
+        """If-None-Match may list several ETags, weak or strong, or be ``*``."""
+        manifest = build_schema_artifacts()
+        identity = manifest['formats']['yaml']['etag']
+        for header in (f'"other", W/{identity}', f'{identity[:-1]}-gzip", {identity}', '*'):
+            response = self.client.get('/api/schema/', HTTP_IF_NONE_MATCH=header)
+            self.assertEqual(response.status_code, 304, header)
+            self.assertEqual(response['ETag'], identity)
+        self.assertEqual(self.client.get('/api/schema/', HTTP_IF_NONE_MATCH='"other", "more"').status_code, 200)
+
+    def test_versioned_url_is_immutable(self):
+        """Versioned URLs carry long-lived cache headers."""
+        manifest = build_schema_artifacts()
+        etag = manifest['formats']['yaml']['etag'].strip('"')
+        response = self.client.get(f'/api/schema/{etag}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(self.client.get('/api/schema/0000/').status_code, 404)
+
+    def test_rebuild_is_deterministic(self):
+        """Rebuilding an unchanged API yields the same ETags."""
+        first = build_schema_artifacts()
+        second = build_schema_artifacts()
+        self.assertEqual(first, second)
+
+    def test_missing_artifact_is_not_generated_in_production(self):
+        """Without an artifact, production workers answer 503 instead of generating."""
+        self.assertEqual(self.client.get('/api/schema/').status_code, 503)
+
+    @override_settings(OPENAPI_SCHEMA_LIVE_FALLBACK=True)
+    def test_missing_artifact_generated_locally(self):
+        """Local development falls back to live generation."""
+        self.assertEqual(self.client.get('/api/schema/').status_code, 200)
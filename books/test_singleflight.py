@@ -0,0 +1,146 @@
+import threading
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from unittest.mock import patch
+
+from books.api.v1.singleflight import SingleFlight
+from books.deadlines import DeadlineExceeded, deadline_scope
+from books.models import Book, SummaryLease
+
+
+class SingleFlightTest(TestCase):
+    """Test cases for single-flight coalescing."""
+
+    def setUp(self):
+        self.flight = SingleFlight('test')
+
+    def test_concurrent_threads_share_one_call(self):
+        """Threads asking for the same key attach to the running call."""
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 'shared result'
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(self.flight.do('k', slow)))
+        with patch.object(SingleFlight, '_do_shared', lambda self, key, fn: fn()):
+            leader.start()
+            started.wait(5)
+            followers = [
+                threading.Thread(target=lambda: results.append(self.flight.do('k', slow)))
+                for _ in range(3)
+            ]
+            for follower in followers:
+                follower.start()
+            release.set()
+            for thread in [leader] + followers:
+                thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['shared result'] * 4)
+
+    def test_waiter_takes_over_when_leader_runs_out_of_time(self):
+        """The leader's deadline fails only the leader; a waiter with time left runs the call."""
+        started = threading.Event()
+        release = threading.Event()
+        outcomes = {}
+
+        def leader_fn():
+            started.set()
+            release.wait(5)
+            raise DeadlineExceeded()
+
+        def run(name, fn):
+            with deadline_scope(5):
+                try:
+                    outcomes[name] = self.flight.do('k', fn)
+                except DeadlineExceeded as e:
+                    outcomes[name] = e
+
+        with patch.object(SingleFlight, '_do_shared', lambda self, key, fn: fn()):
+            leader = threading.Thread(target=run, args=('leader', leader_fn))
+            leader.start()
+            started.wait(5)
+            waiter = threading.Thread(target=run, args=('waiter', lambda: 'fresh'))
+            waiter.start()
+            time.sleep(0.1)
+            release.set()
+            for thread in (leader, waiter):
+                thread.join()
+
+        self.assertIsInstance(outcomes['leader'], DeadlineExceeded)
+        self.assertEqual(outcomes['waiter'], 'fresh')
+
+    def test_waiter_gives_up_at_its_own_deadline(self):
+        """Polling another worker's lease stops at the request deadline, not the lease TTL."""
+        SummaryLease.objects.create(key='test:k', owner='other', expires_at=timezone.now() + timedelta(seconds=300))
+        started = time.monotonic()
+        with deadline_scope(0.3), self.assertRaises(DeadlineExceeded):
+            self.flight.do('k', lambda: self.fail("fn must not run"))
+        self.assertLess(time.monotonic() - started, 1)
+
+    def test_completed_lease_result_is_shared(self):
+        """A result published by another process is returned without calling fn."""
+        SummaryLease.objects.create(
+            key='test:k', owner='other', expires_at=timezone.now() + timedelta(seconds=10),
+            result='from another worker', completed_at=timezone.now()
+        )
+        fn = lambda: self.fail("fn must not run")  # noqa: E731
+        self.assertEqual(self.flight.do('k', fn), 'from another worker')
+
+    def test_expired_lease_is_taken_over(self):
+        """A lease left behind by a crashed owner is taken over once expired."""
+        SummaryLease.objects.create(
+            key='test:k', owner='crashed', expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertEqual(self.flight.do('k', lambda: 'fresh'), 'fresh')
+        lease = SummaryLease.objects.get(key='test:k')
+        self.assertEqual(lease.result, 'fresh')
+        self.assertNotEqual(lease.owner, 'crashed')
+
+    def test_failure_releases_lease(self):
+        """An exception in fn propagates and frees the key for the next caller."""
+        def boom():
+            raise RuntimeError('boom')
+
+        with self.assertRaises(RuntimeError):
+            self.flight.do('k', boom)
+        self.assertFalse(SummaryLease.objects.filter(key='test:k').exists())
+        self.assertEqual(self.flight.do('k', lambda: 'ok'), 'ok')
+
+
+class GenerateSummarySingleFlightTest(TestCase):
+    """Test cases for single-flight summary generation through the API."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_authenticate(user=self.user)
+        self.book = Book.objects.create(
+            title='Test Book', author='Test Author', description='Test Description'
+        )
+
+    @patch('books.api.v1.summary_jobs.generate_summary', return_value='Test summary')
+    def test_recent_generation_is_reused(self, mock_generate):
+        """A duplicate request right after a generation gets the same result."""
+        url = f'/books/api/v1/books/{self.book.pk}/generate_summary/'
+        first = self.client.post(url)
+        second = self.client.post(url)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data['summary'], 'Test summary')
+        mock_generate.assert_called_once()
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.summary, 'Test summary')
@@ -0,0 +1,228 @@
+from datetime import timedelta
+from io import StringIO
+
+import requests
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from unittest.mock import patch
+
+from books.api.v1.summary_jobs import (
+    JOB_DONE,
+    JOB_RETRY,
+    claim_due_jobs,
+    run_summary_job,
+    store_summary,
+)
+from books.api.v1.utils import content_hash
+from books.models import Book, Review, SummaryJob
+
+PRECOMPUTE = {'DEBOUNCE_SECONDS': 30, 'MAX_DELAY_SECONDS': 300, 'RETRY_SECONDS': 60}
+
+
+class FakeLLM:
+    """Stands in for generate_summary, recording each text it summarizes."""
+
+    def __init__(self, side_effect=None):
+        self.calls = []
+        self.side_effect = side_effect
+
+    def __call__(self, text, priority=None, instruction=None, raise_errors=False):
+        self.calls.append(text)
+        if self.side_effect is not None:
+            self.side_effect()
+        return f"Summary of {text}"
+
+
+@override_settings(SUMMARY_PRECOMPUTE=PRECOMPUTE)
+class SummaryJobTest(TestCase):
+    """Test cases for change-driven background summaries."""
+
+    def setUp(self):
+        self.book = Book.objects.create(title='Book', author='Author', description='First description')
+
+    def make_due(self):
+        SummaryJob.objects.update(run_after=timezone.now() - timedelta(seconds=1))
+
+    def run_jobs(self, llm):
+        with patch('books.api.v1.summary_jobs.generate_summary', llm):
+            return [run_summary_job(job) for job in claim_due_jobs(10)]
+
+    def test_new_book_schedules_debounced_job(self):
+        job = SummaryJob.objects.get(book=self.book)
+        self.assertEqual(job.content_hash, content_hash('First description'))
+        self.assertAlmostEqual(
+            (job.run_after - timezone.now()).total_seconds(), PRECOMPUTE['DEBOUNCE_SECONDS'], delta=5
+        )
+        self.assertEqual(claim_due_jobs(10), [])
+
+    def test_rapid_edits_coalesce_into_one_job(self):
+        SummaryJob.objects.update(requested_at=timezone.now() - timedelta(seconds=290))
+        for text in ('Second description', 'Third description'):
+            self.book.description = text
+            self.book.save()
+
+        job = SummaryJob.objects.get()
+        self.assertEqual(job.content_hash, content_hash('Third description'))
+        # Pushed back by the debounce, but capped at MAX_DELAY_SECONDS after the first edit.
+        self.assertLess(job.run_after, timezone.now() + timedelta(seconds=15))
+
+        self.make_due()
+        llm = FakeLLM()
+        self.assertEqual(self.run_jobs(llm), [JOB_DONE])
+        self.assertEqual(llm.calls, ['Third description'])
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.summary, 'Summary of Third description')
+        self.assertEqual(self.book.summary_source_hash, content_hash('Third description'))
+        self.assertFalse(SummaryJob.objects.exists())
+
+    def test_unchanged_description_is_never_resummarized(self):
+        store_summary(self.book.pk, self.book.description, 'Stored summary')
+        self.assertFalse(SummaryJob.objects.exists())
+
+        self.book.refresh_from_db()
+        self.book.rating = 3.0
+        self.book.save()
+        Review.objects.create(book=self.book, user=User.objects.create_user(username='reader'), rating=4, comment='Good')
+        self.book.title = 'Renamed'
+        self.book.save()
+        self.assertFalse(SummaryJob.objects.exists())
+
+        self.book.description = 'Edited description'
+        self.book.save()
+        self.assertTrue(SummaryJob.objects.filter(book=self.book).exists())
+
+    def test_unrelated_saves_do_not_push_back_pending_job(self):
+        before = SummaryJob.objects.get().run_after
+        with self.assertNumQueries(2):
+            self.book.rating = 2.0
+            self.book.save()
+        self.assertEqual(SummaryJob.objects.get().run_after, before)
+
+    def test_edit_during_generation_keeps_job(self):
+        def edit():
+            Book.objects.filter(pk=self.book.pk).update(description='Edited meanwhile')
+            SummaryJob.objects.filter(book=self.book).update(content_hash=content_hash('Edited meanwhile'))
+
+        self.make_due()
+        self.run_jobs(FakeLLM(side_effect=edit))
+
+        self.book.refresh_from_db()
+        self.assertIsNone(self.book.summary)
+        job = SummaryJob.objects.get()
+        self.assertEqual(job.content_hash, content_hash('Edited meanwhile'))
+        self.assertIsNone(job.locked_until)
+
+    def test_failure_backs_off_without_storing(self):
+        def fail():
+            raise requests.exceptions.ConnectionError("down")
+
+        self.make_due()
+        self.assertEqual(self.run_jobs(FakeLLM(side_effect=fail)), [JOB_RETRY])
+
+        job = SummaryJob.objects.get()
+        self.assertEqual((job.attempts, job.last_error, job.locked_until), (1, 'down', None))
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=50))
+        self.book.refresh_from_db()
+        self.assertIsNone(self.book.summary)
+
+    def test_claimed_job_is_not_claimed_twice(self):
+        self.make_due()
+        self.assertEqual(len(claim_due_jobs(10)), 1)
+        self.assertEqual(claim_due_jobs(10), [])
+
+    def test_command_schedules_stale_and_runs_due_jobs(self):
+        SummaryJob.objects.all().delete()
+        out = StringIO()
+        llm = FakeLLM()
+        with patch('books.api.v1.summary_jobs.generate_summary', llm):
+            call_command('run_summary_jobs', '--once', '--schedule-stale', stdout=out)
+        self.assertIn('1 done', out.getvalue())
+        self.assertEqual(llm.calls, ['First description'])
+
+        with patch('books.api.v1.summary_jobs.generate_summary', llm):
+            call_command('run_summary_jobs', '--once', '--schedule-stale', stdout=StringIO())
+        self.assertEqual(len(llm.calls), 1)
+
+
+@override_settings(SUMMARY_PRECOMPUTE=PRECOMPUTE)
+class SummaryEndpointTest(TestCase):
+    """Test cases for how the API reads and triggers precomputed summaries."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.create_user(username='testuser'))
+        self.book = Book.objects.create(title='Book', author='Author', description='Description')
+
+    def test_generate_summary_reuses_current_summary(self):
+        llm = FakeLLM()
+        url = f'/books/api/v1/books/{self.book.pk}/generate_summary/'
+        with patch('books.api.v1.summary_jobs.generate_summary', llm):
+            first = self.client.post(url)
+            second = self.client.post(url)
+
+        self.assertEqual(first.data['summary'], 'Summary of Description')
+        self.assertEqual(second.data['summary'], 'Summary of Description')
+        self.assertEqual(len(llm.calls), 1)
+        self.assertFalse(SummaryJob.objects.exists())
+        response = self.client.get(f'/books/api/v1/books/{self.book.pk}/summary/')
+        self.assertEqual(response.data['summary'], 'Summary of Description')
+
+    def test_generate_summary_failure_is_not_stored(self):
+        def fail():
+            raise requests.exceptions.Timeout("slow")
+
+        with patch('books.api.v1.summary_jobs.generate_summary', FakeLLM(side_effect=fail)):
+            response = self.client.post(f'/books/api/v1/books/{self.book.pk}/generate_summary/')
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.book.refresh_from_db()
+        self.assertIsNone(self.book.summary)
+        self.assertTrue(SummaryJob.objects.filter(book=self.book).exists())
+
+    def test_batch_schedules_created_and_edited_books(self):
+        store_summary(self.book.pk, self.book.description, 'Stored summary')
+        operations = [
+            {'op': 'create', 'data': {'title': 'New', 'author': 'A', 'description': 'Fresh'}},
+            {'op': 'update', 'id': self.book.pk, 'data': {'description': 'Rewritten'}},
+        ]
+        response = self.client.post('/books/api/v1/books/batch/', {'operations': operations}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(SummaryJob.objects.values_list('content_hash', flat=True)),
+            {content_hash('Fresh'), content_hash('Rewritten')}
+        )
+
+
+class MarkExistingSummariesMigrationTest(TransactionTestCase):
+    """Test cases for treating summaries stored before precomputation as current."""
+
+    migrate_from = [('books', '0010_trending_scores')]
+    migrate_to = [('books', '0011_summary_jobs')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_stored_failure_messages_are_not_current(self):
+        old_apps = self.migrate(self.migrate_from)
+        OldBook = old_apps.get_model('books', 'Book')
+        summarized = OldBook.objects.create(title='A', author='A', description='Kept', summary='A real summary.')
+        failed = OldBook.objects.create(
+            title='B', author='B', description='Lost',
+            summary="Failed to connect to Ollama service. Please ensure the service is running."
+        )
+
+        Book = self.migrate(self.migrate_to).get_model('books', 'Book')
+        self.assertEqual(Book.objects.get(pk=summarized.pk).summary_source_hash, content_hash('Kept'))
+        self.assertEqual(Book.objects.get(pk=failed.pk).summary_source_hash, '')
@@ -0,0 +1,198 @@
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.cache.backends import locmem
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+from unittest.mock import patch
+
+from books.api.v1.throttling import AdmissionController, LLMOverloaded, LLMUserRateThrottle
+from books.deadlines import deadline_scope
+from books.models import Book
+
+# Threads each open their own SQLite connection, which cannot write to the database cache while the
+# test's transaction holds it; tests of the locking itself use an in-memory cache instead.
+THREAD_SAFE_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def other_process_cache(alias='default'):
+    """A client of the ``alias`` cache as another worker process builds it, without this process's memory."""
+    with patch.object(locmem, '_caches', {}), patch.object(locmem, '_expire_info', {}), \
+            patch.object(locmem, '_locks', {}):
+        return caches.create_connection(alias)
+
+
+class LLMUserRateThrottleTest(TestCase):
+    """Test cases for the per-user token bucket on LLM actions."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_authenticate(user=self.user)
+
+    @override_settings(LLM_ADMISSION={'USER_BURST': 2, 'USER_RATE_PER_MINUTE': 1})
+    @patch('books.api.v1.views.generate_summary', return_value='Test summary')
+    def test_burst_then_throttled(self, _mock_summary):
+        """Requests beyond the burst are rejected with 429 and Retry-After."""
+        url = '/books/api/v1/books/generate_content_summary/'
+        for _ in range(2):
+            response = self.client.post(url, {'content': 'Some text'})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.post(url, {'content': 'Some text'})
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+
+    @override_settings(LLM_ADMISSION={'USER_BURST': 1, 'USER_RATE_PER_MINUTE': 1})
+    @patch('books.api.v1.views.generate_summary', return_value='Test summary')
+    def test_quota_is_per_user(self, _mock_summary):
+        """One user's exhausted quota does not affect another user."""
+        url = '/books/api/v1/books/generate_content_summary/'
+        self.client.post(url, {'content': 'Some text'})
+        self.assertEqual(
+            self.client.post(url, {'content': 'Some text'}).status_code,
+            status.HTTP_429_TOO_MANY_REQUESTS
+        )
+
+        other = User.objects.create_user(username='otheruser', password='testpass')
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.client.post(url, {'content': 'Some text'}).status_code, status.HTTP_200_OK)
+
+    @override_settings(LLM_ADMISSION={'USER_BURST': 3, 'USER_RATE_PER_MINUTE': 1}, CACHES=THREAD_SAFE_CACHES)
+    def test_concurrent_requests_spend_each_token_once(self):
+        """Simultaneous requests of one user cannot overdraw the bucket."""
+        request = RequestFactory().post('/books/api/v1/books/generate_content_summary/')
+        request.user = self.user
+        # Each thread has its own cache connection, so the backend class is patched.
+        backend = type(caches['default'])
+        get = backend.get
+
+        def slow_get(self, *args, **kwargs):
+            value = get(self, *args, **kwargs)
+            # Widen the window between reading and writing the bucket.
+            time.sleep(0.01)
+            return value
+
+        allowed = []
+        start = threading.Barrier(8)
+
+        def attempt():
+            throttle = LLMUserRateThrottle()
+            start.wait(5)
+            allowed.append(throttle.allow_request(request, None))
+
+        with patch.object(backend, 'get', slow_get):
+            threads = [threading.Thread(target=attempt) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(allowed.count(True), 3)
+
+    @override_settings(LLM_ADMISSION={'USER_BURST': 1, 'USER_RATE_PER_MINUTE': 1})
+    def test_quota_is_shared_between_processes(self):
+        """A user's spent tokens are spent in every worker process."""
+        request = RequestFactory().post('/books/api/v1/books/generate_content_summary/')
+        request.user = self.user
+        self.assertTrue(LLMUserRateThrottle().allow_request(request, None))
+        throttle = LLMUserRateThrottle()
+        throttle.cache = other_process_cache()
+        self.assertFalse(throttle.allow_request(request, None))
+
+    @override_settings(LLM_ADMISSION={'USER_BURST': 1, 'USER_RATE_PER_MINUTE': 1})
+    def test_crud_not_throttled(self):
+        """CRUD endpoints are not subject to the LLM quota."""
+        Book.objects.create(title='Test Book', author='Test Author', description='Test Description')
+        for _ in range(3):
+            response = self.client.get('/books/api/v1/books/')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class AdmissionControllerTest(TestCase):
+    """Test cases for the global LLM concurrency cap."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_authenticate(user=self.user)
+
+    def controller(self, **overrides):
+        conf = {
+            'MAX_CONCURRENT': 1, 'MAX_QUEUE': 1, 'QUEUE_TIMEOUT': 1, 'QUEUE_BUDGET_SHARE': 0.25, 'SLOT_TTL': 60,
+            'POLL_INTERVAL': 0.01, 'RETRY_AFTER': 7, 'CACHE_ALIAS': 'default',
+        }
+        conf.update(overrides)
+        return AdmissionController(conf=conf)
+
+    def test_rejects_when_queue_full(self):
+        """With every slot busy and no queue, callers are rejected immediately."""
+        controller = self.controller(MAX_QUEUE=0)
+        with controller.slot():
+            with self.assertRaises(LLMOverloaded) as ctx:
+                with controller.slot():
+                    pass
+        self.assertEqual(ctx.exception.wait, 7)
+
+    @override_settings(CACHES=THREAD_SAFE_CACHES)
+    def test_queued_request_gets_released_slot(self):
+        """A queued caller proceeds once the running call releases its slot."""
+        controller = self.controller(QUEUE_TIMEOUT=5)
+        release = threading.Event()
+        holding = threading.Event()
+
+        def hold():
+            with controller.slot():
+                holding.set()
+                release.wait(5)
+
+        worker = threading.Thread(target=hold)
+        worker.start()
+        holding.wait(5)
+        threading.Timer(0.05, release.set).start()
+        with controller.slot():
+            pass
+        worker.join()
+
+    def test_queue_timeout(self):
+        """A queued caller gives up once the queue timeout elapses."""
+        controller = self.controller(QUEUE_TIMEOUT=0.05)
+        with controller.slot():
+            with self.assertRaises(LLMOverloaded):
+                with controller.slot():
+                    pass
+
+    def test_queue_wait_is_a_share_of_the_deadline(self):
+        """A queued caller gives up long before its request deadline."""
+        controller = self.controller(QUEUE_TIMEOUT=5)
+        with controller.slot():
+            started = time.monotonic()
+            with deadline_scope(0.4), self.assertRaises(LLMOverloaded):
+                with controller.slot():
+                    pass
+            self.assertLess(time.monotonic() - started, 0.3)
+
+    def test_slots_are_shared_between_processes(self):
+        """Every worker process counts the same slots, so the cap is global."""
+        controller = self.controller(MAX_QUEUE=0)
+        other = self.controller(MAX_QUEUE=0)
+        other.cache = other_process_cache()
+        with controller.slot():
+            with self.assertRaises(LLMOverloaded):
+                with other.slot():
+                    pass
+        with other.slot():
+            pass
+
+    @override_settings(LLM_ADMISSION={'MAX_CONCURRENT': 0, 'MAX_QUEUE': 0, 'RETRY_AFTER': 3})
+    def test_view_returns_503_with_retry_after(self):
+        """The API answers 503 with Retry-After when the LLM is saturated."""
+        response = self.client.post(
+            '/books/api/v1/books/generate_content_summary/', {'content': 'Some text'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '3')
@@ -0,0 +1,129 @@
+import math
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from books.api.v1.trending import (
+    LANDMARK,
+    backfill_scores,
+    decayed_score,
+    log_weight,
+    record_review,
+    top_trending,
+)
+from books.models import Book, BookTrendingScore, Review
+
+
+@override_settings(TRENDING={'HALF_LIFE_HOURS': 24})
+class TrendingScoreTest(TestCase):
+    """Test cases for forward-decayed trending scores."""
+
+    def setUp(self):
+        self.users = [User.objects.create_user(username=f'reader{i}', password='testpass') for i in range(4)]
+        self.old_hit = Book.objects.create(title='Old Hit', author='A', description='D')
+        self.new_hit = Book.objects.create(title='New Hit', author='B', description='D')
+        self.quiet = Book.objects.create(title='Quiet', author='C', description='D')
+
+    def review(self, book, user, age):
+        review = Review(book=book, user=user, rating=4, comment='Good', created_at=timezone.now() - age)
+        review.save()
+        return review
+
+    def test_score_halves_every_half_life(self):
+        now = timezone.now()
+        record_review(self.quiet.pk, now - timedelta(hours=24))
+        record_review(self.quiet.pk, now - timedelta(hours=48))
+        score = BookTrendingScore.objects.get(book=self.quiet)
+        self.assertAlmostEqual(decayed_score(score.log_score, now), 0.5 + 0.25, places=6)
+
+    def test_recent_activity_outranks_older_activity(self):
+        """Three reviews a week ago weigh less than two reviews today."""
+        for user in self.users[:3]:
+            self.review(self.old_hit, user, timedelta(days=7))
+        for user in self.users[:2]:
+            self.review(self.new_hit, user, timedelta(hours=1))
+        self.review(self.quiet, self.users[0], timedelta(days=2))
+
+        self.assertEqual(
+            [book_id for book_id, _ in top_trending(3)],
+            [self.new_hit.pk, self.quiet.pk, self.old_hit.pk]
+        )
+
+    def test_each_review_is_one_update(self):
+        self.review(self.quiet, self.users[0], timedelta(hours=1))
+        with self.assertNumQueries(1):
+            record_review(self.quiet.pk, timezone.now())
+
+    def test_no_overflow_far_from_landmark(self):
+        far = LANDMARK + timedelta(days=365 * 50)
+        record_review(self.quiet.pk, far)
+        record_review(self.quiet.pk, far)
+        score = BookTrendingScore.objects.get(book=self.quiet)
+        self.assertTrue(math.isfinite(score.log_score))
+        self.assertAlmostEqual(score.log_score, log_weight(far) + math.log(2), places=6)
+        self.assertEqual(score.last_review_at, far)
+
+    def test_backfill_matches_incremental_scores(self):
+        for i, user in enumerate(self.users):
+            self.review(self.old_hit, user, timedelta(hours=10 * i))
+        self.review(self.new_hit, self.users[0], timedelta(hours=3))
+        incremental = dict(BookTrendingScore.objects.values_list('book_id', 'log_score'))
+
+        BookTrendingScore.objects.all().delete()
+        out = StringIO()
+        call_command('backfill_trending_scores', stdout=out)
+        self.assertIn('Scored 2 book(s).', out.getvalue())
+        backfilled = dict(BookTrendingScore.objects.values_list('book_id', 'log_score'))
+        self.assertEqual(backfilled.keys(), incremental.keys())
+        for book_id, log_score in incremental.items():
+            self.assertAlmostEqual(backfilled[book_id], log_score, places=6)
+
+    def assertMatchesBackfill(self):
+        incremental = dict(BookTrendingScore.objects.values_list('book_id', 'log_score'))
+        backfill_scores()
+        backfilled = dict(BookTrendingScore.objects.values_list('book_id', 'log_score'))
+        self.assertEqual(incremental.keys(), backfilled.keys())
+        for book_id, log_score in backfilled.items():
+            self.assertAlmostEqual(incremental[book_id], log_score, places=6)
+
+    def test_deleted_reviews_leave_the_score(self):
+        reviews = [self.review(self.old_hit, user, timedelta(hours=5 * i)) for i, user in enumerate(self.users)]
+        self.review(self.quiet, self.users[0], timedelta(hours=1))
+        reviews[0].delete()
+        reviews[2].delete()
+        self.assertMatchesBackfill()
+
+        # The last review takes the score with it, as does deleting the book.
+        for review in (reviews[1], reviews[3]):
+            review.delete()
+        self.assertFalse(BookTrendingScore.objects.filter(book=self.old_hit).exists())
+        self.quiet.delete()
+        self.assertFalse(BookTrendingScore.objects.exists())
+
+    def test_moved_review_counts_for_its_new_book(self):
+        review = self.review(self.old_hit, self.users[0], timedelta(hours=2))
+        self.review(self.old_hit, self.users[1], timedelta(hours=30))
+        client = APIClient()
+        client.force_authenticate(user=self.users[0])
+        response = client.patch(f'/books/api/v1/reviews/{review.pk}/', {'book': self.new_hit.pk}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertMatchesBackfill()
+
+    def test_trending_endpoint(self):
+        self.review(self.new_hit, self.users[0], timedelta(hours=1))
+        self.review(self.old_hit, self.users[1], timedelta(days=3))
+        client = APIClient()
+        client.force_authenticate(user=self.users[0])
+
+        response = client.get('/books/api/v1/books/trending/', {'k': 5})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([book['title'] for book in response.data], ['New Hit', 'Old Hit'])
+        self.assertAlmostEqual(response.data[1]['score'], 0.125, places=2)
+        self.assertEqual(response.data[0]['review_count'], 1)
+        self.assertEqual(client.get('/books/api/v1/books/trending/', {'k': 'x'}).status_code, status.HTTP_400_BAD_REQUEST)
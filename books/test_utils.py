@@ -1,6 +1,14 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from unittest.mock import patch, Mock
-from books.api.v1.utils import generate_summary
+from books.api.v1.utils import (
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    SUMMARY_INSTRUCTION,
+    generate_summary,
+    route_summary_request,
+)
+from books.models import SummaryRouteSample
+from books.ollama_stub import Cassette, OllamaStub
 import requests
 
 class GenerateSummaryTest(TestCase):
@@ -100,3 +108,122 @@ class GenerateSummaryTest(TestCase):
         self.assertTrue(self.test_text in kwargs['json']['prompt'])
         self.assertEqual(kwargs['json']['stream'], False)
         self.assertEqual(kwargs['timeout'], 120)  # Updated timeout value
+
+
+SUMMARY_ROUTES = [
+    {'name': 'short', 'model': 'small', 'max_input_chars': 100, 'min_tokens': 20,
+     'max_tokens': 60, 'tokens_per_1k_chars': 400, 'temperature': 0.2, 'timeout': 30},
+    {'name': 'long-interactive', 'model': 'large', 'max_input_chars': None, 'priorities': ['interactive'],
+     'min_tokens': 100, 'max_tokens': 200, 'tokens_per_1k_chars': 10, 'timeout': 90},
+    {'name': 'long', 'model': 'large', 'max_input_chars': None,
+     'min_tokens': 100, 'max_tokens': 500, 'tokens_per_1k_chars': 10, 'timeout': 180},
+]
+
+
+@override_settings(SUMMARY_ROUTES=SUMMARY_ROUTES)
+class SummaryRoutingTest(TestCase):
+    """Test cases for adaptive model routing and token budgeting."""
+
+    def test_short_input_uses_small_model(self):
+        """Short inputs go to the small, fast model with a small budget."""
+        route = route_summary_request("x" * 50)
+        self.assertEqual((route.name, route.model, route.num_predict), ('short', 'small', 40))
+
+    def test_budget_scales_with_input(self):
+        """The output budget grows with input length, within the route's bounds."""
+        self.assertEqual(route_summary_request("x" * 1000, PRIORITY_BATCH).num_predict, 110)
+        self.assertEqual(route_summary_request("x" * 100000, PRIORITY_BATCH).num_predict, 500)
+
+    def test_priority_selects_route(self):
+        """Interactive callers get a tighter budget than batch callers."""
+        interactive = route_summary_request("x" * 50000, PRIORITY_INTERACTIVE)
+        batch = route_summary_request("x" * 50000, PRIORITY_BATCH)
+        self.assertEqual((interactive.name, interactive.num_predict), ('long-interactive', 200))
+        self.assertEqual((batch.name, batch.num_predict), ('long', 500))
+
+    @patch('books.api.v1.utils.get_ollama_pool')
+    def test_request_uses_route_and_records_latency(self, mock_get_pool):
+        """The Ollama request follows the route and its latency is recorded."""
+        mock_http = mock_get_pool.return_value
+        mock_http.get.return_value = Mock(status_code=200)
+        mock_response = Mock(status_code=200)
+        mock_response.json.return_value = {"response": "Short summary", "eval_count": 12, "load_duration": 2_500_000_000}
+        mock_http.post.return_value = mock_response
+
+        self.assertEqual(generate_summary("A short text."), "Short summary")
+
+        _, kwargs = mock_http.post.call_args
+        self.assertEqual(kwargs['model'], 'small')
+        self.assertEqual(kwargs['json']['model'], 'small')
+        self.assertEqual(kwargs['json']['options']['num_predict'], 25)
+        self.assertEqual(kwargs['json']['keep_alive'], 1800)
+        self.assertEqual(kwargs['timeout'], 30)
+        sample = SummaryRouteSample.objects.get()
+        self.assertEqual((sample.route, sample.output_tokens, sample.success), ('short', 12, True))
+        self.assertEqual(sample.load_ms, 2500)
+
+    @patch('books.api.v1.utils.get_ollama_pool')
+    def test_health_check_only_for_cold_models(self, mock_get_pool):
+        """The health check is skipped while the pool knows the model is loaded."""
+        mock_http = mock_get_pool.return_value
+        mock_http.get.return_value = Mock(status_code=200)
+        mock_http.post.return_value = Mock(status_code=200, json=Mock(return_value={"response": "Summary"}))
+
+        mock_http.is_warm.return_value = True
+        generate_summary("A short text.")
+        mock_http.get.assert_not_called()
+        mock_http.is_warm.assert_called_with('small')
+
+        mock_http.is_warm.return_value = False
+        generate_summary("A short text.")
+        mock_http.get.assert_called_once()
+
+    @patch('books.api.v1.utils.get_ollama_pool')
+    def test_custom_instruction_and_raised_errors(self, mock_get_pool):
+        """Callers storing the result choose the prompt and get failures as exceptions."""
+        mock_http = mock_get_pool.return_value
+        mock_http.get.return_value = Mock(status_code=200)
+        mock_http.post.return_value = Mock(status_code=200, json=Mock(return_value={"response": "Digest"}))
+
+        self.assertEqual(generate_summary("Reviews", instruction="Digest these reviews:"), "Digest")
+        self.assertEqual(mock_http.post.call_args.kwargs['json']['prompt'], "Digest these reviews:\n\nReviews")
+
+        mock_http.post.side_effect = requests.exceptions.ConnectionError("down")
+        self.assertIn("Failed to connect", generate_summary("Reviews"))
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            generate_summary("Reviews", raise_errors=True)
+
+
+@override_settings(SUMMARY_ROUTES=SUMMARY_ROUTES)
+class StubbedSummaryTest(TestCase):
+    """Test cases for the summary path against a local Ollama stand-in."""
+
+    def serve(self, **kwargs):
+        cassette = Cassette()
+        cassette.record('small', f"{SUMMARY_INSTRUCTION}\n\nA short text.", {"response": "A recorded summary.", "eval_count": 3})
+        stub = OllamaStub(cassette=cassette, models=['small', 'large'], **kwargs).start()
+        self.addCleanup(stub.close)
+        settings_override = override_settings(OLLAMA_BACKENDS=[stub.url])
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        return stub
+
+    def test_replays_recorded_summary(self):
+        """The recorded answer for the prompt comes back through the pool."""
+        stub = self.serve()
+        self.assertEqual(generate_summary("A short text."), "A recorded summary.")
+        self.assertEqual(stub.stats.generate, 1)
+        self.assertTrue(SummaryRouteSample.objects.get().success)
+
+    def test_injected_server_error(self):
+        """A failing server yields the generic error message and a failed sample."""
+        self.serve(failures={'error': 1.0})
+        self.assertIn("An error occurred", generate_summary("A short text."))
+        self.assertFalse(SummaryRouteSample.objects.get().success)
+
+    @override_settings(SUMMARY_ROUTES=[{**route, 'timeout': 0.2} for route in SUMMARY_ROUTES])
+    def test_injected_hang_times_out(self):
+        """A server that stops answering hits the route timeout."""
+        self.serve(failures={'hang': 1.0}, hang_seconds=5)
+        with self.assertRaises(requests.exceptions.Timeout):
+            generate_summary("A short text.", raise_errors=True)
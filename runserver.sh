@@ -12,6 +12,15 @@ if [ -z "$ENVIRONMENT" ]; then
     #python manage.py loaddata fixtures/data_dump.json
 fi
 
+# The workers share the LLM limits and read-your-writes pins through the database cache
+python3 manage.py createcachetable
+
+# Build the OpenAPI schema once, before the workers start
+python3 manage.py build_openapi_schema
+
+# Load the Ollama models before the workers take traffic; each worker then keeps them loaded
+python3 manage.py warm_models || echo "Ollama models not loaded yet; the workers will keep trying"
+
 gunicorn --workers 2 --timeout 600 --bind 0.0.0.0:8000 book_management.wsgi:application
 #gunicorn --workers 2 --timeout 600 --bind 0.0.0.0:8000 --env DJANGO_SETTINGS_MODULE=book_management.settings book_management.wsgi:application --log-level=debug
 